@@ -14,8 +14,9 @@
 """
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 
 # ============================================================================
 # 用户应用模型 (user_app/models.py)
@@ -37,6 +38,7 @@ class User(AbstractUser):
     comment_count = models.IntegerField(default=0, verbose_name='评论数')
     follower_count = models.IntegerField(default=0, verbose_name='粉丝数')
     following_count = models.IntegerField(default=0, verbose_name='关注数')
+    unread_notification_count = models.IntegerField(default=0, verbose_name='未读通知数')  # 随通知写入/已读维护
     
     # 状态字段
     is_verified = models.BooleanField(default=False, verbose_name='是否认证')
@@ -82,6 +84,11 @@ class FollowRelation(models.Model):
         unique_together = ('follower', 'following')
         verbose_name = '关注关系'
         verbose_name_plural = '关注关系'
+        indexes = [
+            # 粉丝列表 / 关注列表按关注时间倒序的游标分页
+            models.Index(fields=['following', 'created_at', 'id']),
+            models.Index(fields=['follower', 'created_at', 'id']),
+        ]
 
 class UserNotification(models.Model):
     """用户通知"""
@@ -89,6 +96,7 @@ class UserNotification(models.Model):
         ('post_like', '帖子点赞'),
         ('post_comment', '帖子评论'),
         ('comment_reply', '评论回复'),
+        ('comment_mention', '评论提及'),
         ('follow', '关注'),
         ('system', '系统通知'),
     ]
@@ -101,11 +109,22 @@ class UserNotification(models.Model):
     related_url = models.URLField(blank=True, verbose_name='相关链接')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     
+    # 聚合：同一窗口内对同一目标的同类事件合并成一条通知
+    target_key = models.CharField(max_length=64, blank=True, verbose_name='通知目标')  # 例如 "post:123"
+    actor_count = models.IntegerField(default=1, verbose_name='触发人数')
+    sample_actors = models.JSONField(default=list, blank=True, verbose_name='触发者样本')  # 最近几个触发者的用户ID
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='更新时间')  # 最近一次事件的时间
+    
     class Meta:
         db_table = 'user_notification'
         verbose_name = '用户通知'
         verbose_name_plural = '用户通知'
-        ordering = ['-created_at']
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+            # 查找窗口内可合并的未读通知
+            models.Index(fields=['user', 'target_key', 'notification_type', 'is_read']),
+        ]
 
 # ============================================================================
 # 贴吧应用模型 (tieba_app/models.py)
@@ -171,7 +190,8 @@ class Tieba(models.Model):
         verbose_name_plural = '贴吧'
         indexes = [
             models.Index(fields=['name']),
-            models.Index(fields=['category']),
+            # 分类贴吧列表按成员数排序，索引同时覆盖按分类过滤
+            models.Index(fields=['category', 'status', 'member_count', 'id']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
         ]
@@ -323,8 +343,10 @@ class Post(models.Model):
         db_table = 'post'
         verbose_name = '帖子'
         verbose_name_plural = '帖子'
-        ordering = ['-last_reply_at', '-created_at']
+        # id 随创建时间递增，作为最后的排序键保证顺序唯一，便于游标分页
+        ordering = ['-last_reply_at', '-id']
         indexes = [
+            models.Index(fields=['tieba', 'status', 'last_reply_at', 'id']),
             models.Index(fields=['tieba', 'post_type']),
             models.Index(fields=['author', 'created_at']),
             models.Index(fields=['status', 'created_at']),
@@ -333,11 +355,19 @@ class Post(models.Model):
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        # 新帖的最后回复时间即发帖时间，保证排序键不为空
+        if self.last_reply_at is None:
+            self.last_reply_at = timezone.now()
+        super().save(*args, **kwargs)
 
 class PostImage(models.Model):
     """帖子图片"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images', verbose_name='帖子')
-    image = models.ImageField(upload_to='post_images/', verbose_name='图片')
+    image = models.ImageField(upload_to='post_images/', max_length=200, verbose_name='图片')
+    asset = models.ForeignKey('media_app.ImageAsset', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='post_images', verbose_name='图片原件')
     caption = models.CharField(max_length=200, blank=True, verbose_name='图片说明')
     sort_order = models.IntegerField(default=0, verbose_name='排序')
     
@@ -346,6 +376,14 @@ class PostImage(models.Model):
         verbose_name = '帖子图片'
         verbose_name_plural = '帖子图片'
         ordering = ['sort_order', 'id']
+    
+    @classmethod
+    def from_upload(cls, post, upload, **kwargs):
+        """保存上传的帖子图片：原图按内容哈希去重，各规格在后台生成"""
+        from media_app.pipeline import ingest
+        
+        asset = ingest(upload)
+        return cls.objects.create(post=post, image=asset.file.name, asset=asset, **kwargs)
 
 class PostLike(models.Model):
     """帖子点赞"""
@@ -379,14 +417,57 @@ class PostCollect(models.Model):
             models.Index(fields=['user', 'created_at']),
         ]
 
+class PostHotScore(models.Model):
+    """帖子热度（按贴吧预先排好序，首页"热门"直接按索引取前N条）"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True,
+                                related_name='hot_score', verbose_name='帖子')
+    tieba = models.ForeignKey(Tieba, on_delete=models.CASCADE, related_name='+', verbose_name='所属贴吧')
+    engagement = models.FloatField(default=0, verbose_name='互动量')
+    score = models.FloatField(default=0, verbose_name='热度')
+    post_created_at = models.DateTimeField(verbose_name='发帖时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'post_hot_score'
+        verbose_name = '帖子热度'
+        verbose_name_plural = '帖子热度'
+        indexes = [
+            models.Index(fields=['tieba', '-score']),
+        ]
+
+class TimelineEntry(models.Model):
+    """首页动态收件箱（发帖时推送给关注者和吧成员，每人只保留最近的若干条）"""
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                              related_name='timeline_entries', verbose_name='接收者')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+', verbose_name='帖子')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='推送时间')
+    
+    class Meta:
+        db_table = 'timeline_entry'
+        verbose_name = '首页动态'
+        verbose_name_plural = '首页动态'
+        # 唯一约束即 (owner, post) 索引，按 post 倒序读取就是一次范围扫描
+        unique_together = ('owner', 'post')
+
+class UserAgent(models.Model):
+    """用户代理字符串字典（浏览记录只保存引用，避免重复存储长文本）"""
+    ua_hash = models.CharField(max_length=40, unique=True, verbose_name='摘要')
+    value = models.TextField(verbose_name='用户代理')
+    
+    class Meta:
+        db_table = 'user_agent'
+        verbose_name = '用户代理'
+        verbose_name_plural = '用户代理'
+
 class PostViewHistory(models.Model):
     """帖子浏览历史"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_history', verbose_name='帖子')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
                             related_name='post_view_history', verbose_name='用户')
     ip_address = models.GenericIPAddressField(verbose_name='IP地址')
-    user_agent = models.TextField(blank=True, verbose_name='用户代理')
-    viewed_at = models.DateTimeField(auto_now_add=True, verbose_name='浏览时间')
+    user_agent = models.ForeignKey(UserAgent, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', verbose_name='用户代理')
+    viewed_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='浏览时间')
     
     class Meta:
         db_table = 'post_view_history'
@@ -397,6 +478,19 @@ class PostViewHistory(models.Model):
             models.Index(fields=['post', 'viewed_at']),
         ]
 
+class PostViewDaily(models.Model):
+    """帖子每日浏览汇总（由过期的浏览历史压缩而来）"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_views', verbose_name='帖子')
+    date = models.DateField(verbose_name='日期')
+    view_count = models.IntegerField(default=0, verbose_name='浏览数')
+    visitor_count = models.IntegerField(default=0, verbose_name='访客数')
+    
+    class Meta:
+        db_table = 'post_view_daily'
+        verbose_name = '帖子每日浏览'
+        verbose_name_plural = '帖子每日浏览'
+        unique_together = ('post', 'date')
+
 class PostReport(models.Model):
     """帖子举报"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reports', verbose_name='帖子')
@@ -465,12 +559,19 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, 
                              related_name='replies', verbose_name='父评论')
     
-    # 楼层号
-    floor_number = models.IntegerField(default=0, verbose_name='楼层号')
+    # 楼中楼的树结构（物化路径）：path 是所有祖先ID，形如 "12/57/"，不含自身；
+    # root 是所在楼层的顶层评论，顶层评论的 root 为空、depth 为 0
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='descendants', verbose_name='所在楼层')
+    path = models.CharField(max_length=255, blank=True, default='', verbose_name='祖先路径')
+    depth = models.SmallIntegerField(default=0, verbose_name='层级')
+    
+    # 楼层号：只有顶层评论占楼层，楼中楼回复为空（NULL 不受唯一约束限制）
+    floor_number = models.IntegerField(null=True, blank=True, verbose_name='楼层号')
     
     # 统计字段
     like_count = models.IntegerField(default=0, verbose_name='点赞数')
-    reply_count = models.IntegerField(default=0, verbose_name='回复数')
+    reply_count = models.IntegerField(default=0, verbose_name='回复数')  # 整棵子树的回复数
     
     # 状态字段
     STATUS_CHOICES = [
@@ -490,15 +591,47 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['floor_number']
+        # 唯一约束同时充当 (post, floor_number) 索引
+        unique_together = ('post', 'floor_number')
         indexes = [
-            models.Index(fields=['post', 'floor_number']),
             models.Index(fields=['author', 'created_at']),
             models.Index(fields=['parent', 'created_at']),
             models.Index(fields=['status', 'created_at']),
+            # 按层级分页加载整个楼层的回复
+            models.Index(fields=['root', 'depth', 'id']),
         ]
     
     def __str__(self):
         return f"{self.author.username}的评论"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        if self.parent_id is None:
+            # 新的顶层评论自动分配楼层号（在写入事务之外分配，见 comment_app.floors）
+            if not self.floor_number:
+                from comment_app.floors import allocate_floor
+                self.floor_number = allocate_floor(self.post_id)
+            # 评论和后台任务记录（post_save 信号中写入）在同一事务中
+            with transaction.atomic():
+                return super().save(*args, **kwargs)
+        # 楼中楼回复不占楼层：填充树结构，插入和祖先 reply_count 的更新在同一事务中
+        from comment_app import threads
+        with transaction.atomic():
+            threads.attach(self)
+            super().save(*args, **kwargs)
+            threads.add_to_ancestors(self, 1)
+
+class CommentFloorCounter(models.Model):
+    """帖子楼层计数器（每个帖子一行，只记录已分配的最大楼层号）"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True,
+                                related_name='floor_counter', verbose_name='帖子')
+    last_floor = models.IntegerField(default=1, verbose_name='已分配楼层')
+    
+    class Meta:
+        db_table = 'comment_floor_counter'
+        verbose_name = '楼层计数器'
+        verbose_name_plural = '楼层计数器'
 
 class CommentLike(models.Model):
     """评论点赞"""
@@ -642,9 +775,10 @@ class MessageAttachment(models.Model):
     attachment_type = models.SmallIntegerField(choices=ATTACHMENT_TYPE_CHOICES, verbose_name='附件类型')
     
     # 附件文件
-    file = models.FileField(upload_to='message_attachments/', verbose_name='附件文件')
+    file = models.FileField(upload_to='message_attachments/', max_length=255, verbose_name='附件文件')
     file_name = models.CharField(max_length=255, verbose_name='文件名')
-    file_size = models.IntegerField(default=0, verbose_name='文件大小')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='校验和')
     
     # 缩略图（用于图片/视频）
     thumbnail = models.ImageField(upload_to='message_thumbnails/', null=True, blank=True, verbose_name='缩略图')
@@ -657,6 +791,54 @@ class MessageAttachment(models.Model):
         verbose_name = '消息附件'
         verbose_name_plural = '消息附件'
 
+class UploadSession(models.Model):
+    """分片上传会话（大附件断点续传，分片直接写入磁盘上的临时文件）"""
+    STATUS_CHOICES = [
+        (1, '上传中'),
+        (2, '已完成'),
+        (3, '已取消'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+                             related_name='upload_sessions', verbose_name='上传者')
+    file_name = models.CharField(max_length=255, verbose_name='文件名')
+    total_size = models.BigIntegerField(verbose_name='文件大小')
+    chunk_size = models.IntegerField(verbose_name='分片大小')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='状态')
+    
+    # 完成后的文件路径和校验和（各分片 SHA-256 依次拼接后再做一次 SHA-256）
+    file = models.FileField(upload_to='message_attachments/', max_length=255, blank=True, verbose_name='文件')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='校验和')
+    
+    # 时间字段
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    expires_at = models.DateTimeField(verbose_name='过期时间')
+    
+    class Meta:
+        db_table = 'upload_session'
+        verbose_name = '分片上传会话'
+        verbose_name_plural = '分片上传会话'
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+class UploadChunk(models.Model):
+    """已收到的分片（用于断点续传和最终校验）"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, 
+                                related_name='chunks', verbose_name='上传会话')
+    index = models.IntegerField(verbose_name='分片序号')
+    size = models.IntegerField(verbose_name='分片大小')
+    sha256 = models.CharField(max_length=64, verbose_name='分片哈希')
+    
+    class Meta:
+        db_table = 'upload_chunk'
+        verbose_name = '上传分片'
+        verbose_name_plural = '上传分片'
+        unique_together = ('session', 'index')
+
 class Conversation(models.Model):
     """会话（用于私信对话）"""
     user1 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
@@ -703,8 +885,9 @@ class SystemMessage(models.Model):
     ]
     message_type = models.SmallIntegerField(choices=MESSAGE_TYPE_CHOICES, default=1, verbose_name='消息类型')
     
-    # 目标用户
+    # 目标用户（仅定向消息；广播消息不写入关联行，按用户水位线在读取时匹配）
     target_users = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, 
+                                         through='SystemMessageRecipient',
                                          related_name='system_messages', verbose_name='目标用户')
     
     # 发送设置
@@ -724,11 +907,42 @@ class SystemMessage(models.Model):
         indexes = [
             models.Index(fields=['message_type', 'created_at']),
             models.Index(fields=['is_broadcast', 'created_at']),
+            models.Index(fields=['is_broadcast', 'id']),
         ]
     
     def __str__(self):
         return self.title
 
+class SystemMessageRecipient(models.Model):
+    """定向系统消息的接收记录"""
+    message = models.ForeignKey(SystemMessage, on_delete=models.CASCADE, 
+                                related_name='recipients', verbose_name='系统消息')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+                             related_name='system_message_receipts', verbose_name='用户')
+    is_read = models.BooleanField(default=False, verbose_name='是否已读')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='发送时间')
+    
+    class Meta:
+        db_table = 'system_message_recipient'
+        verbose_name = '系统消息接收记录'
+        verbose_name_plural = '系统消息接收记录'
+        unique_together = ('message', 'user')
+        indexes = [
+            models.Index(fields=['user', 'is_read']),
+        ]
+
+class SystemMessageCursor(models.Model):
+    """用户已读广播水位线（已读到的最大广播消息ID）"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='system_message_cursor', verbose_name='用户')
+    last_broadcast_id = models.BigIntegerField(default=0, verbose_name='已读广播ID')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'system_message_cursor'
+        verbose_name = '系统消息水位线'
+        verbose_name_plural = '系统消息水位线'
+
 class UserMessageSetting(models.Model):
     """用户消息设置"""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
@@ -776,6 +990,115 @@ class MessageBlacklist(models.Model):
             models.Index(fields=['user', 'created_at']),
         ]
 
+# ============================================================================
+# 搜索应用模型 (search_app/models.py)
+# ============================================================================
+
+class SearchToken(models.Model):
+    """倒排索引（非SQLite数据库使用，SQLite下使用FTS5虚拟表）"""
+    DOC_TYPE_CHOICES = [
+        (1, '帖子'),
+        (2, '评论'),
+    ]
+    token = models.CharField(max_length=32, verbose_name='词')
+    doc_type = models.SmallIntegerField(choices=DOC_TYPE_CHOICES, verbose_name='文档类型')
+    doc_id = models.BigIntegerField(verbose_name='文档ID')
+    tieba_id = models.BigIntegerField(verbose_name='所属贴吧')
+    weight = models.FloatField(default=1, verbose_name='词频权重')
+    
+    class Meta:
+        db_table = 'search_token'
+        verbose_name = '搜索索引'
+        verbose_name_plural = '搜索索引'
+        indexes = [
+            models.Index(fields=['token', 'doc_type', 'tieba_id']),
+            models.Index(fields=['doc_type', 'doc_id']),
+        ]
+
+# ============================================================================
+# 图片应用模型 (media_app/models.py)
+# ============================================================================
+
+class ImageAsset(models.Model):
+    """图片原件（按内容哈希去重，同一张图片无论上传多少次只存一份）"""
+    STATUS_CHOICES = [
+        (1, '待处理'),
+        (2, '已生成'),
+        (3, '处理失败'),
+    ]
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='内容哈希')
+    file = models.ImageField(upload_to='images/', max_length=200, verbose_name='原图')
+    format = models.CharField(max_length=10, verbose_name='格式')
+    width = models.IntegerField(verbose_name='宽')
+    height = models.IntegerField(verbose_name='高')
+    file_size = models.IntegerField(verbose_name='文件大小')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='处理状态')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    
+    class Meta:
+        db_table = 'image_asset'
+        verbose_name = '图片'
+        verbose_name_plural = '图片'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return self.sha256
+
+class ImageVariant(models.Model):
+    """图片的固定尺寸版本（缩略图、列表图等）"""
+    asset = models.ForeignKey(ImageAsset, on_delete=models.CASCADE, related_name='variants', verbose_name='原图')
+    name = models.CharField(max_length=20, verbose_name='规格')
+    file = models.ImageField(upload_to='images/variants/', max_length=200, verbose_name='文件')
+    width = models.IntegerField(verbose_name='宽')
+    height = models.IntegerField(verbose_name='高')
+    file_size = models.IntegerField(verbose_name='文件大小')
+    
+    class Meta:
+        db_table = 'image_variant'
+        verbose_name = '图片规格'
+        verbose_name_plural = '图片规格'
+        unique_together = ('asset', 'name')
+
+# ============================================================================
+# 后台任务应用模型 (outbox_app/models.py)
+# ============================================================================
+
+class OutboxJob(models.Model):
+    """待执行的后台任务（和产生它的业务数据在同一事务中写入）"""
+    STATUS_CHOICES = [
+        (1, '待执行'),
+        (2, '执行中'),
+        (3, '已完成'),
+        (4, '已放弃'),
+    ]
+    kind = models.CharField(max_length=50, verbose_name='任务类型')
+    payload = models.JSONField(default=dict, verbose_name='参数')
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='幂等键')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='状态')
+    attempts = models.SmallIntegerField(default=0, verbose_name='已执行次数')
+    # 待执行时为最早执行时间（重试退避），执行中时为租约到期时间
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    locked_by = models.CharField(max_length=64, blank=True, default='', verbose_name='领取批次')
+    last_error = models.TextField(blank=True, default='', verbose_name='最近错误')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        db_table = 'outbox_job'
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        indexes = [
+            # 领取到期任务
+            models.Index(fields=['status', 'run_after', 'id']),
+            # 清理已完成任务
+            models.Index(fields=['status', 'finished_at']),
+        ]
+    
+    def __str__(self):
+        return '%s#%s' % (self.kind, self.pk)
+
 # ============================================================================
 # 模型关系总结
 # ============================================================================
@@ -801,11 +1124,16 @@ class MessageBlacklist(models.Model):
    - PostImage (帖子图片，一对多)
    - PostLike (帖子点赞，多对多)
    - PostCollect (帖子收藏，多对多)
+   - PostHotScore (帖子热度，一对一)
+   - TimelineEntry (首页动态收件箱，关联用户和帖子)
+   - UserAgent (用户代理字典)
    - PostViewHistory (帖子浏览历史，一对多)
+   - PostViewDaily (帖子每日浏览汇总，一对多)
    - PostReport (帖子举报，一对多)
 
 4. 评论相关模型：
    - Comment (评论主表，关联帖子和用户)
+   - CommentFloorCounter (帖子楼层计数器，一对一)
    - CommentLike (评论点赞，多对多)
    - CommentReport (评论举报，一对多)
    - CommentMention (评论提及，多对多)
@@ -813,10 +1141,24 @@ class MessageBlacklist(models.Model):
 5. 消息相关模型：
    - PrivateMessage (私信消息，关联发送者和接收者)
    - MessageAttachment (消息附件，一对多)
+   - UploadSession (分片上传会话，关联上传者)
+   - UploadChunk (已上传分片，一对多)
    - Conversation (会话，关联两个用户)
-   - SystemMessage (系统消息，多对多)
+   - SystemMessage (系统消息，定向消息多对多，广播消息只存一行)
+   - SystemMessageRecipient (定向系统消息接收记录)
+   - SystemMessageCursor (用户已读广播水位线，一对一)
    - UserMessageSetting (用户消息设置，一对一)
    - MessageBlacklist (消息黑名单，多对多)
 
+6. 搜索相关模型：
+   - SearchToken (倒排索引，SQLite下由FTS5虚拟表代替)
+
+7. 图片相关模型：
+   - ImageAsset (图片原件，按内容哈希去重，被帖子图片引用)
+   - ImageVariant (图片规格，一对多)
+
+8. 后台任务相关模型：
+   - OutboxJob (事务性 outbox 任务，和业务数据同一事务写入，由 run_outbox 执行)
+
 所有模型都包含完整的字段定义、外键约束、索引和元数据配置。
 """
\ No newline at end of file
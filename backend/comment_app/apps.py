@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class CommentAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'comment_app'
+    verbose_name = '评论'
+
+    def ready(self):
+        from . import jobs, signals  # noqa: F401
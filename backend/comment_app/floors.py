@@ -0,0 +1,89 @@
+"""
+评论楼层号分配
+
+每个帖子在 comment_floor_counter 中有一行计数器，分配楼层只对这一行做
+一次 "UPDATE ... SET last_floor = last_floor + n"，事务只包含这一条更新和
+一次主键读取，不会锁住整个帖子的评论。
+
+楼层号保证唯一、单调递增，但允许出现空洞（评论插入失败时分配出去的楼层
+不会回收）。1楼是楼主的帖子本身，评论从2楼开始；只有顶层评论占楼层，
+楼中楼回复不分配楼层号。
+
+注意：请在开启评论写入事务之前分配楼层（Comment.save 在没有外层事务时
+即是如此），否则计数器行锁会一直持有到外层事务提交，同帖的并发写入又会
+互相等待。
+
+热门帖子可以通过 COMMENT_FLOOR_BLOCK_SIZE 让每个进程一次预留一段楼层，
+进一步减少对计数器行的争用；代价是不同进程之间的楼层顺序可能与发帖时间
+略有交错。本进程最多为 MAX_BLOCKS 个帖子保留预留段，最久未用的被淘汰，
+淘汰时没用完的楼层成为空洞。
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import Comment, CommentFloorCounter
+
+FIRST_FLOOR = 2
+
+# 保留预留段的帖子数上限
+MAX_BLOCKS = 1024
+
+_blocks = OrderedDict()
+_blocks_lock = threading.Lock()
+
+
+def reserve_floors(post_id, count=1):
+    """为帖子预留 count 个连续楼层，返回 (first, last)"""
+    with transaction.atomic():
+        updated = (CommentFloorCounter.objects
+                   .filter(post_id=post_id)
+                   .update(last_floor=F('last_floor') + count))
+        if not updated:
+            _ensure_counter(post_id)
+            CommentFloorCounter.objects.filter(post_id=post_id).update(
+                last_floor=F('last_floor') + count)
+        last = (CommentFloorCounter.objects
+                .filter(post_id=post_id)
+                .values_list('last_floor', flat=True)
+                .get())
+    return last - count + 1, last
+
+
+def allocate_floor(post_id):
+    """分配一个楼层号"""
+    block_size = getattr(settings, 'COMMENT_FLOOR_BLOCK_SIZE', 1)
+    if block_size <= 1:
+        return reserve_floors(post_id)[0]
+
+    with _blocks_lock:
+        block = _blocks.get(post_id)
+        if block and block[0] <= block[1]:
+            floor = block[0]
+            block[0] += 1
+            _blocks.move_to_end(post_id)
+            return floor
+
+    first, last = reserve_floors(post_id, block_size)
+    with _blocks_lock:
+        # 预留的第一层自己用，剩下的留给本进程后续的评论
+        _blocks[post_id] = [first + 1, last]
+        _blocks.move_to_end(post_id)
+        while len(_blocks) > MAX_BLOCKS:
+            _blocks.popitem(last=False)
+    return first
+
+
+def _ensure_counter(post_id):
+    """首次在帖子下评论时创建计数器，已有评论的帖子从当前最大楼层继续"""
+    current = (Comment.objects
+               .filter(post_id=post_id)
+               .aggregate(m=Max('floor_number'))['m'])
+    CommentFloorCounter.objects.get_or_create(
+        post_id=post_id,
+        defaults={'last_floor': max(current or 0, FIRST_FLOOR - 1)},
+    )
@@ -0,0 +1,82 @@
+"""
+评论的后台任务（见 outbox_app/outbox.py）
+
+发表评论的请求只写评论和一条 outbox 记录（楼中楼回复另有祖先
+reply_count 的更新，见 threads.py），其余副作用由 run_outbox 批量执行：
+- 帖子 comment_count 和 last_reply_at、评论者 comment_count：
+  同一批里同一帖子、同一用户的增量合并成一条 UPDATE
+- 解析评论中的 @提及，写入 CommentMention（见 mentions.py）
+- 给帖子作者 / 被回复者 / 被@用户的通知，一次写入整批
+- 写入搜索索引（见 search_app/indexer.py）
+
+计数增量取自任务参数而不是评论本身：评论在任务执行前被删除时，
+删除信号已经减过一次，这里仍要加回去，计数才一致；通知则只发给仍然存在的评论。
+"""
+
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.dateparse import parse_datetime
+
+from outbox_app import outbox
+from post_app.models import Post
+from search_app import indexer
+from tieba_project import counters
+from user_app import notifications
+
+from . import mentions
+from .models import Comment
+
+COMMENT_CREATED = 'comment.created'
+
+
+def enqueue_created(comment):
+    """在评论写入的事务中记录后续任务"""
+    outbox.enqueue(COMMENT_CREATED, {
+        'comment_id': comment.pk,
+        'post_id': comment.post_id,
+        'author_id': comment.author_id,
+        'created_at': comment.created_at.isoformat(),
+    }, key='%s:%d' % (COMMENT_CREATED, comment.pk))
+
+
+def _event(comment, user_id, notification_type, target_key, title):
+    return dict(user_id=user_id, notification_type=notification_type, target_key=target_key, title=title,
+                actor_id=comment['author_id'], content=comment['content'][:100], at=comment['created_at'])
+
+
+@outbox.handler(COMMENT_CREATED)
+def comment_created(payloads):
+    User = get_user_model()
+    post_counts = Counter(p['post_id'] for p in payloads)
+    author_counts = Counter(p['author_id'] for p in payloads)
+    counters.write_now([(Post, pk, 'comment_count', n) for pk, n in post_counts.items()]
+                       + [(User, pk, 'comment_count', n) for pk, n in author_counts.items()])
+
+    last_reply = {}
+    for p in payloads:
+        at = parse_datetime(p['created_at'])
+        if p['post_id'] not in last_reply or at > last_reply[p['post_id']]:
+            last_reply[p['post_id']] = at
+    for post_id, at in last_reply.items():
+        # 历史数据里 last_reply_at 可能为空，GREATEST 遇到 NULL 在各数据库上结果不一致
+        Post.objects.filter(pk=post_id).update(
+            last_reply_at=Greatest(Coalesce(F('last_reply_at'), Value(at)), Value(at)))
+
+    comments = list(Comment.objects.filter(pk__in=[p['comment_id'] for p in payloads])
+                    .values('id', 'post_id', 'parent_id', 'author_id', 'content', 'created_at',
+                            'post__author_id', 'parent__author_id'))
+    events = []
+    for comment in comments:
+        if comment['parent_id']:
+            events.append(_event(comment, comment['parent__author_id'], 'comment_reply',
+                                 'comment:%d' % comment['parent_id'], '你的评论有新回复'))
+        else:
+            events.append(_event(comment, comment['post__author_id'], 'post_comment',
+                                 'post:%d' % comment['post_id'], '你的帖子有新回复'))
+    for comment, user_id in mentions.record(comments):
+        events.append(_event(comment, user_id, 'comment_mention', 'comment:%d' % comment['id'], '有人在评论中@了你'))
+    notifications.notify_now(events)
+    indexer.index_comments([p['comment_id'] for p in payloads])
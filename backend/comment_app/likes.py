@@ -0,0 +1,7 @@
+"""评论点赞服务（见 tieba_project/likes.py）"""
+
+from tieba_project.likes import LikeService
+
+from .models import CommentLike
+
+comment_likes = LikeService(CommentLike, 'comment')
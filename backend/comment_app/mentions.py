@@ -0,0 +1,90 @@
+"""
+评论中的 @提及
+
+- 一条预编译的正则扫描整条评论，取出全部 @用户名（去重，保持出现顺序），
+  每条评论最多 MAX_PER_COMMENT 个，超出的不再解析
+- 用户名 -> 用户ID 先查进程内 LRU（热门用户被反复 @），未命中的用户名合在
+  一条 username__in 查询里解析；不存在的用户名也缓存，避免反复查库。
+  缓存条目 CACHE_TTL 秒后过期，新注册、改名的用户最多延迟这么久才能被 @ 到
+- 提及行用 bulk_create(ignore_conflicts=True) 一次写入，重复的行由
+  (comment, mentioned_user) 唯一约束忽略
+
+由评论的后台任务调用（见 jobs.py），一批评论共用一次解析查询。
+"""
+
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from tieba_project.cache import LocalLRU
+
+from .models import CommentMention
+
+# 用户名可以含字母、数字、汉字和 . + - _；前面紧挨着英文字母数字的 @（如邮箱）不算提及，
+# 紧挨着汉字的算（"谢谢@张三"）
+MENTION_RE = re.compile(r'(?<![0-9A-Za-z_@.+-])@([\w.+-]{1,150})')
+
+
+def _config(key, default):
+    return getattr(settings, 'MENTIONS', {}).get(key, default)
+
+
+_usernames = LocalLRU(max_size=_config('CACHE_SIZE', 10000), ttl=_config('CACHE_TTL', 300))
+_UNKNOWN = 0
+
+
+def extract(content, limit=None):
+    """评论中 @ 到的用户名列表"""
+    limit = limit or _config('MAX_PER_COMMENT', 10)
+    names = []
+    for match in MENTION_RE.finditer(content):
+        # 句末的标点不属于用户名，如 "@bob."
+        name = match.group(1).rstrip('.')
+        if name and name not in names:
+            names.append(name)
+            if len(names) >= limit:
+                break
+    return names
+
+
+def resolve(usernames):
+    """{用户名: 用户ID}，不存在或已停用的用户名不在结果中"""
+    found, missing = {}, []
+    for name in set(usernames):
+        user_id = _usernames.get(name)
+        if user_id is None:
+            missing.append(name)
+        elif user_id != _UNKNOWN:
+            found[name] = user_id
+    if missing:
+        rows = dict(get_user_model().objects.filter(username__in=missing, is_active=True)
+                    .values_list('username', 'id'))
+        for name in missing:
+            _usernames.set(name, rows.get(name, _UNKNOWN))
+        found.update(rows)
+    return found
+
+
+def clear_cache():
+    """清空本进程的用户名缓存（批量改名后、基准测试中使用）"""
+    _usernames.clear()
+
+
+def record(comments, limit=None):
+    """
+    为一批评论写入提及行，comments 为含 id、author_id、content 的字典；
+    返回 [(评论, 被@用户ID)]（不含 @ 自己）。limit 同 extract()
+    """
+    parsed = [(comment, extract(comment['content'], limit)) for comment in comments]
+    user_ids = resolve({name for _, names in parsed for name in names})
+    mentions = []
+    for comment, names in parsed:
+        for name in names:
+            user_id = user_ids.get(name)
+            if user_id is not None and user_id != comment['author_id']:
+                mentions.append((comment, user_id))
+    CommentMention.objects.bulk_create(
+        [CommentMention(comment_id=comment['id'], mentioned_user_id=user_id) for comment, user_id in mentions],
+        ignore_conflicts=True)
+    return mentions
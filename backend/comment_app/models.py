@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 class Comment(models.Model):
@@ -15,12 +15,19 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, 
                              related_name='replies', verbose_name='父评论')
     
-    # 楼层号
-    floor_number = models.IntegerField(default=0, verbose_name='楼层号')
+    # 楼中楼的树结构（物化路径）：path 是所有祖先ID，形如 "12/57/"，不含自身；
+    # root 是所在楼层的顶层评论，顶层评论的 root 为空、depth 为 0
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='descendants', verbose_name='所在楼层')
+    path = models.CharField(max_length=255, blank=True, default='', verbose_name='祖先路径')
+    depth = models.SmallIntegerField(default=0, verbose_name='层级')
+    
+    # 楼层号：只有顶层评论占楼层，楼中楼回复为空（NULL 不受唯一约束限制）
+    floor_number = models.IntegerField(null=True, blank=True, verbose_name='楼层号')
     
     # 统计字段
     like_count = models.IntegerField(default=0, verbose_name='点赞数')
-    reply_count = models.IntegerField(default=0, verbose_name='回复数')
+    reply_count = models.IntegerField(default=0, verbose_name='回复数')  # 整棵子树的回复数
     
     # 状态字段
     STATUS_CHOICES = [
@@ -40,15 +47,47 @@ class Comment(models.Model):
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['floor_number']
+        # 唯一约束同时充当 (post, floor_number) 索引
+        unique_together = ('post', 'floor_number')
         indexes = [
-            models.Index(fields=['post', 'floor_number']),
             models.Index(fields=['author', 'created_at']),
             models.Index(fields=['parent', 'created_at']),
             models.Index(fields=['status', 'created_at']),
+            # 按层级分页加载整个楼层的回复
+            models.Index(fields=['root', 'depth', 'id']),
         ]
     
     def __str__(self):
         return f"{self.author.username}的评论"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        if self.parent_id is None:
+            # 新的顶层评论自动分配楼层号（在写入事务之外分配，见 comment_app.floors）
+            if not self.floor_number:
+                from comment_app.floors import allocate_floor
+                self.floor_number = allocate_floor(self.post_id)
+            # 评论和后台任务记录（post_save 信号中写入）在同一事务中
+            with transaction.atomic():
+                return super().save(*args, **kwargs)
+        # 楼中楼回复不占楼层：填充树结构，插入和祖先 reply_count 的更新在同一事务中
+        from comment_app import threads
+        with transaction.atomic():
+            threads.attach(self)
+            super().save(*args, **kwargs)
+            threads.add_to_ancestors(self, 1)
+
+class CommentFloorCounter(models.Model):
+    """帖子楼层计数器（每个帖子一行，只记录已分配的最大楼层号）"""
+    post = models.OneToOneField('post_app.Post', on_delete=models.CASCADE, primary_key=True,
+                                related_name='floor_counter', verbose_name='帖子')
+    last_floor = models.IntegerField(default=1, verbose_name='已分配楼层')
+    
+    class Meta:
+        db_table = 'comment_floor_counter'
+        verbose_name = '楼层计数器'
+        verbose_name_plural = '楼层计数器'
 
 class CommentLike(models.Model):
     """评论点赞"""
@@ -0,0 +1,12 @@
+from tieba_project.pagination import KeysetPagination
+
+
+class FloorPagination(KeysetPagination):
+    """帖子内按楼层正序翻页，走 (post, floor_number) 唯一索引"""
+    ordering = ('floor_number',)
+
+
+class ReplyTreePagination(KeysetPagination):
+    """楼层内的回复按层级、再按ID翻页，走 (root, depth, id) 索引"""
+    ordering = ('depth', 'id')
+    page_size = 50
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from .models import Comment
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    """评论序列化器"""
+    author_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'parent', 'depth', 'floor_number', 'author', 'author_name', 'content',
+                  'like_count', 'reply_count', 'created_at']
+
+    def get_author_name(self, obj):
+        return obj.author.nickname or obj.author.username
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from post_app.models import Post
+from tieba_project import counters
+
+from . import jobs, threads
+from .models import Comment, CommentLike
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        # 计数、最后回复时间和通知交给后台任务（见 jobs.py）
+        jobs.enqueue_created(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # 级联删除子树时每个节点各减一次，存活祖先正好减去整棵子树的大小
+    threads.add_to_ancestors(instance, -1)
+    counters.decr(Post, instance.post_id, 'comment_count')
+    counters.decr(get_user_model(), instance.author_id, 'comment_count')
+
+
+@receiver(post_save, sender=CommentLike)
+def comment_liked(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(Comment, instance.comment_id, 'like_count')
+
+
+@receiver(post_delete, sender=CommentLike)
+def comment_unliked(sender, instance, **kwargs):
+    counters.decr(Comment, instance.comment_id, 'like_count')
@@ -0,0 +1,154 @@
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post_app.models import Post
+from tieba_app.models import Tieba, TiebaCategory
+from tieba_project import likes
+from user_app.models import User
+
+from . import floors
+from .models import Comment, CommentLike
+
+THREADS = 8
+PER_THREAD = 25
+
+
+def make_post():
+    user = User.objects.create_user('author', 'author@example.com', 'pass')
+    tieba = Tieba.objects.create(name='tieba', category=TiebaCategory.objects.create(name='category'), owner=user)
+    return Post.objects.create(tieba=tieba, author=user, title='title', content='content')
+
+
+def allocate_concurrently(post_id):
+    """THREADS 个线程同时为同一帖子各分配 PER_THREAD 个楼层"""
+    results, errors = [], []
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        try:
+            start.wait()
+            results.extend(floors.allocate_floor(post_id) for _ in range(PER_THREAD))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class FloorAllocationTests(TransactionTestCase):
+
+    def setUp(self):
+        floors._blocks.clear()
+        self.post = make_post()
+
+    def test_concurrent_allocation_is_unique_and_gap_free(self):
+        results, errors = allocate_concurrently(self.post.pk)
+        self.assertEqual(errors, [])
+        total = THREADS * PER_THREAD
+        self.assertEqual(sorted(results), list(range(floors.FIRST_FLOOR, floors.FIRST_FLOOR + total)))
+
+    @override_settings(COMMENT_FLOOR_BLOCK_SIZE=10)
+    def test_block_reservation_is_unique(self):
+        results, errors = allocate_concurrently(self.post.pk)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(results)), len(results))
+        self.assertGreaterEqual(min(results), floors.FIRST_FLOOR)
+
+    @override_settings(COMMENT_FLOOR_BLOCK_SIZE=10)
+    def test_blocks_are_bounded(self):
+        # 其他帖子已用完的预留段
+        with floors._blocks_lock:
+            for post_id in range(10 ** 6, 10 ** 6 + floors.MAX_BLOCKS + 5):
+                floors._blocks[post_id] = [2, 1]
+        floors.allocate_floor(self.post.pk)
+        self.assertEqual(len(floors._blocks), floors.MAX_BLOCKS)
+        self.assertIn(self.post.pk, floors._blocks)
+
+
+class ReplyTreeTests(TestCase):
+
+    def setUp(self):
+        self.post = make_post()
+        self.author = self.post.author
+
+    def comment(self, parent=None, post=None):
+        return Comment.objects.create(post=post or self.post, author=self.author, parent=parent, content='c')
+
+    def test_replies_do_not_take_floors(self):
+        first = self.comment()
+        reply = self.comment(parent=first)
+        second = self.comment()
+        self.assertIsNone(reply.floor_number)
+        self.assertEqual(second.floor_number, first.floor_number + 1)
+        self.assertEqual((reply.root_id, reply.depth, reply.path), (first.pk, 1, '%d/' % first.pk))
+
+    def test_parent_must_belong_to_the_same_post(self):
+        other = Post.objects.create(tieba=self.post.tieba, author=self.author, title='other', content='other')
+        floor = self.comment(post=other)
+        with self.assertRaises(ValueError):
+            self.comment(parent=floor)
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+
+    def test_hidden_floor_is_not_listed(self):
+        floor = self.comment()
+        self.comment(parent=floor)
+        url = reverse('floor-reply-list', args=[floor.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        Comment.objects.filter(pk=floor.pk).update(status=3)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AsyncCommentListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = make_post()
+        cls.floors = [Comment.objects.create(post=cls.post, author=cls.post.author, content='c%d' % i)
+                      for i in range(3)]
+        CommentLike.objects.create(comment=cls.floors[1], user=cls.post.author)
+
+    def setUp(self):
+        caches['default'].clear()
+        likes._cache.clear_local()
+
+    def both(self, params=None, **headers):
+        sync = self.client.get(reverse('post-comment-list', args=[self.post.pk]), params, **headers)
+        caches['default'].clear()
+        likes._cache.clear_local()
+        async_ = self.client.get(reverse('post-comment-list-async', args=[self.post.pk]), params, **headers)
+        self.assertEqual(async_.status_code, sync.status_code)
+        return sync.json(), async_.json()
+
+    def assertSamePage(self, sync, async_):
+        self.assertEqual(async_['results'], sync['results'])
+        for link in ('next', 'previous'):
+            self.assertEqual(async_[link] is None, sync[link] is None)
+
+    def test_matches_sync_view(self):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer %s' % AccessToken.for_user(self.post.author)}
+        sync, async_ = self.both({'page_size': 2}, **headers)
+        self.assertSamePage(sync, async_)
+        self.assertEqual([item['liked'] for item in async_['results']], [False, True])
+        cursor = parse_qs(urlsplit(sync['next']).query)['cursor'][0]
+        self.assertSamePage(*self.both({'page_size': 2, 'cursor': cursor}, **headers))
+
+    def test_without_token_has_no_liked(self):
+        sync, async_ = self.both()
+        self.assertSamePage(sync, async_)
+        self.assertNotIn('liked', async_['results'][0])
+
+    def test_invalid_cursor(self):
+        sync, async_ = self.both({'cursor': 'garbage'})
+        self.assertEqual(async_, sync)
@@ -0,0 +1,67 @@
+"""
+楼中楼回复树（物化路径）
+
+每条回复保存祖先路径 path（"12/57/"，不含自身）、层级 depth 和所在楼层
+root。插入时只需读一次父评论就能算出这三个字段，因此一次 INSERT 即可；
+祖先列表直接从 path 解析，reply_count（整棵子树的回复数）用一条
+"UPDATE ... WHERE id IN (祖先)" 在同一事务中更新。
+
+读取整个楼层时按 (root, depth, id) 索引取一页回复，再在内存中按 parent
+组装成树，不需要逐层递归查询。
+
+层级超过 MAX_DEPTH 的回复挂到父评论的父评论下，保证 path 不超出字段长度。
+"""
+
+from django.db.models import F
+
+from .models import Comment
+
+MAX_DEPTH = 16
+
+
+def ancestor_ids(comment):
+    """从 path 解析出所有祖先ID（从楼层顶层评论开始）"""
+    return [int(pk) for pk in comment.path.split('/') if pk]
+
+
+def subtree_prefix(comment):
+    """该评论所有后代的 path 前缀，可用于 path__startswith 查询整棵子树"""
+    return '%s%d/' % (comment.path, comment.pk)
+
+
+def attach(comment):
+    """根据父评论填充 path、depth、root；父评论不在同一帖子下时抛出 ValueError"""
+    parent = Comment.objects.only('post_id', 'path', 'depth', 'root_id', 'parent_id').get(pk=comment.parent_id)
+    if parent.post_id != comment.post_id:
+        raise ValueError('父评论不属于该帖子')
+    if parent.depth >= MAX_DEPTH:
+        parent = Comment.objects.only('path', 'depth', 'root_id', 'parent_id').get(pk=parent.parent_id)
+        comment.parent_id = parent.pk
+    comment.path = subtree_prefix(parent)
+    comment.depth = parent.depth + 1
+    comment.root_id = parent.root_id or parent.pk
+
+
+def add_to_ancestors(comment, amount):
+    """祖先的 reply_count 加上 amount（应在写入评论的同一事务中调用）"""
+    ids = ancestor_ids(comment)
+    if ids:
+        Comment.objects.filter(pk__in=ids).update(reply_count=F('reply_count') + amount)
+
+
+def build_tree(comments):
+    """
+    把按 (depth, id) 排序的评论字典（需包含 id、parent）组装成嵌套结构，
+    每个节点增加 replies 列表；父评论不在本批数据中的节点作为顶层返回
+    """
+    nodes = {}
+    roots = []
+    for item in comments:
+        item['replies'] = []
+        nodes[item['id']] = item
+        parent = nodes.get(item['parent'])
+        if parent is None:
+            roots.append(item)
+        else:
+            parent['replies'].append(item)
+    return roots
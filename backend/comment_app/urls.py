@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('post/<int:post_id>/', views.PostCommentListView.as_view(), name='post-comment-list'),
+    path('post/<int:post_id>/async/', views.post_comment_list_async, name='post-comment-list-async'),
+    path('floor/<int:comment_id>/', views.FloorReplyListView.as_view(), name='floor-reply-list'),
+    path('<int:comment_id>/like/', views.CommentLikeView.as_view(), name='comment-like'),
+]
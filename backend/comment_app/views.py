@@ -0,0 +1,96 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from tieba_project.async_views import async_get, bearer_user_id, error, keyset_page, ok
+
+from . import threads
+from .likes import comment_likes
+from .models import Comment
+from .pagination import FloorPagination, ReplyTreePagination
+from .serializers import CommentSerializer
+
+
+class PostCommentListView(generics.ListAPIView):
+    """帖子楼层列表（只列顶层评论，按楼层号正序，游标分页）"""
+    serializer_class = CommentSerializer
+    pagination_class = FloorPagination
+
+    def get_queryset(self):
+        return (Comment.objects
+                .filter(post_id=self.kwargs['post_id'], depth=0, status=1)
+                .select_related('author'))
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            # 一页楼层一次批量判断是否赞过
+            results = response.data['results']
+            liked = comment_likes.liked_ids(request.user.pk, [item['id'] for item in results])
+            for item in results:
+                item['liked'] = item['id'] in liked
+        return response
+
+
+@async_get
+async def post_comment_list_async(request, post_id):
+    """PostCommentListView 的异步版本（令牌只验签，带 liked）"""
+    queryset = Comment.objects.filter(post_id=post_id, depth=0, status=1).select_related('author')
+    try:
+        data = await keyset_page(FloorPagination(), request, queryset, CommentSerializer)
+    except ValueError:
+        return error(FloorPagination.invalid_cursor_message, 404)
+    user_id = bearer_user_id(request)
+    if user_id is not None:
+        results = data['results']
+        liked = await comment_likes.aliked_ids(user_id, [item['id'] for item in results])
+        for item in results:
+            item['liked'] = item['id'] in liked
+    return ok(data)
+
+
+class FloorReplyListView(generics.ListAPIView):
+    """
+    某一楼的楼中楼回复树
+
+    两条查询：楼层本身 + 一页回复（按层级、ID排序），回复在内存中按 parent
+    组装成树。max_depth 参数可以只加载前几层。
+    """
+    serializer_class = CommentSerializer
+    pagination_class = ReplyTreePagination
+
+    def get_queryset(self):
+        queryset = (Comment.objects
+                    .filter(root_id=self.kwargs['comment_id'], status=1)
+                    .select_related('author'))
+        try:
+            max_depth = int(self.request.query_params['max_depth'])
+        except (KeyError, ValueError):
+            return queryset
+        return queryset.filter(depth__lte=max_depth)
+
+    def list(self, request, *args, **kwargs):
+        floor = get_object_or_404(Comment.objects.select_related('author'),
+                                  pk=self.kwargs['comment_id'], depth=0, status=1)
+        page = self.paginate_queryset(self.get_queryset())
+        replies = threads.build_tree(self.get_serializer(page, many=True).data)
+        response = self.get_paginated_response(replies)
+        response.data['floor'] = self.get_serializer(floor).data
+        return response
+
+
+class CommentLikeView(APIView):
+    """评论点赞（PUT）/ 取消点赞（DELETE），重复请求不改变计数"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, comment_id):
+        return self.set_liked(request, comment_id, True)
+
+    def delete(self, request, comment_id):
+        return self.set_liked(request, comment_id, False)
+
+    def set_liked(self, request, comment_id, liked):
+        comment = get_object_or_404(Comment.objects.only('id', 'like_count'), pk=comment_id, status=1)
+        comment_likes.set_liked(request.user.pk, comment, liked)
+        return Response({'liked': liked, 'like_count': comment_likes.like_count(comment)})
@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from media_app import pipeline
+from media_app.models import ImageAsset
+from post_app.models import PostImage
+
+
+class Command(BaseCommand):
+    help = '用进程池生成待处理（或处理失败）图片的各规格，并可把历史帖子图片导入去重存储'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='进程数，默认为CPU核数')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--retry-failed', action='store_true', help='同时重试处理失败的图片')
+        parser.add_argument('--all', action='store_true', help='重新生成全部图片（修改规格配置后使用）')
+        parser.add_argument('--backfill', action='store_true', help='先把没有关联原件的帖子图片导入')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill(options['batch_size'])
+
+        statuses = [pipeline.PENDING]
+        if options['retry_failed']:
+            statuses.append(pipeline.FAILED)
+        queryset = ImageAsset.objects.order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(status__in=statuses)
+
+        done = failed = 0
+        last_id = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                # 按主键分批，避免一次把所有记录读进内存
+                batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                futures = []
+                for asset in batch:
+                    try:
+                        args = pipeline.render_args(asset)
+                    except Exception:
+                        pipeline.mark_failed(asset)
+                        failed += 1
+                        continue
+                    futures.append((asset, args[2], pool.submit(pipeline.render, *args)))
+                for asset, image_format, future in futures:
+                    try:
+                        rendered = future.result()
+                    except Exception:
+                        pipeline.mark_failed(asset)
+                        failed += 1
+                        continue
+                    pipeline.store(asset, rendered, image_format)
+                    done += 1
+                self.stdout.write('已处理 %d 张，失败 %d 张' % (done, failed))
+        self.stdout.write(self.style.SUCCESS('完成：生成 %d 张，失败 %d 张' % (done, failed)))
+
+    def backfill(self, batch_size):
+        imported = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(PostImage.objects.filter(asset__isnull=True, id__gt=last_id)
+                         .order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for image in batch:
+                try:
+                    with image.image.open('rb') as f:
+                        asset = pipeline.ingest(f.read(), defer=True)
+                except Exception as exc:
+                    self.stderr.write('跳过帖子图片 %d: %s' % (image.id, exc))
+                    skipped += 1
+                    continue
+                image.asset = asset
+                image.image = asset.file.name
+                image.save(update_fields=['asset', 'image'])
+                imported += 1
+        self.stdout.write('导入帖子图片 %d 张，跳过 %d 张' % (imported, skipped))
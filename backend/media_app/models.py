@@ -0,0 +1,44 @@
+from django.db import models
+
+
+class ImageAsset(models.Model):
+    """图片原件（按内容哈希去重，同一张图片无论上传多少次只存一份）"""
+    STATUS_CHOICES = [
+        (1, '待处理'),
+        (2, '已生成'),
+        (3, '处理失败'),
+    ]
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='内容哈希')
+    file = models.ImageField(upload_to='images/', max_length=200, verbose_name='原图')
+    format = models.CharField(max_length=10, verbose_name='格式')
+    width = models.IntegerField(verbose_name='宽')
+    height = models.IntegerField(verbose_name='高')
+    file_size = models.IntegerField(verbose_name='文件大小')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='处理状态')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    
+    class Meta:
+        db_table = 'image_asset'
+        verbose_name = '图片'
+        verbose_name_plural = '图片'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return self.sha256
+
+class ImageVariant(models.Model):
+    """图片的固定尺寸版本（缩略图、列表图等）"""
+    asset = models.ForeignKey(ImageAsset, on_delete=models.CASCADE, related_name='variants', verbose_name='原图')
+    name = models.CharField(max_length=20, verbose_name='规格')
+    file = models.ImageField(upload_to='images/variants/', max_length=200, verbose_name='文件')
+    width = models.IntegerField(verbose_name='宽')
+    height = models.IntegerField(verbose_name='高')
+    file_size = models.IntegerField(verbose_name='文件大小')
+    
+    class Meta:
+        db_table = 'image_variant'
+        verbose_name = '图片规格'
+        verbose_name_plural = '图片规格'
+        unique_together = ('asset', 'name')
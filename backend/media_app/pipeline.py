@@ -0,0 +1,248 @@
+"""
+图片处理流水线
+
+上传的图片先计算 SHA-256，按哈希存放在 images/ab/cd/<哈希>.<扩展名>：
+同一张图片（例如被反复转发的表情包）只存一份文件、一行 ImageAsset，
+后续上传直接复用。入库时记录宽高，客户端不下载图片也能排版。
+
+原图入库后在工作池中生成 IMAGE_PIPELINE['VARIANTS'] 中的固定尺寸版本：
+- Web 进程中在事务提交后交给线程池（Pillow 缩放时会释放 GIL）
+- process_images 命令用进程池补处理积压或失败的图片
+render() 只处理字节，不依赖 Django，两种池都可以直接调用。
+
+只生成比原图小的规格，不放大；缺少的规格回退到原图。
+全部使用 default_storage，本地文件存储下可完全离线运行。
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError, features
+
+from .models import ImageAsset, ImageVariant
+
+PENDING, READY, FAILED = 1, 2, 3
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# 需要旋转 90 度才能摆正的 EXIF 方向（摆正后宽高互换）
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+DEFAULT_VARIANTS = {
+    # 规格名: (宽, 高, 是否裁剪)；高为 0 表示按宽等比缩放
+    'thumb': (160, 160, True),
+    'small': (480, 0, False),
+    'large': (1280, 0, False),
+}
+
+
+def _config(key, default):
+    return getattr(settings, 'IMAGE_PIPELINE', {}).get(key, default)
+
+
+def output_format():
+    """变体的输出格式；Pillow 编译时没有 libwebp 则回退到 JPEG"""
+    image_format = _config('FORMAT', 'WEBP')
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def original_name(sha256, image_format):
+    return 'images/%s/%s/%s.%s' % (sha256[:2], sha256[2:4], sha256, EXTENSIONS.get(image_format, 'img'))
+
+
+def variant_name(sha256, name, image_format):
+    return 'images/variants/%s/%s/%s.%s' % (sha256[:2], sha256, name, EXTENSIONS[image_format])
+
+
+def probe(data):
+    """校验图片并返回 (格式, 宽, 高)，不是受支持的图片时抛出 ValidationError"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+        with Image.open(io.BytesIO(data)) as image:
+            # 宽高以摆正 EXIF 方向之后为准；只读文件头里的方向标记，不解码像素
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise ValidationError('无法识别的图片文件') from exc
+    if image_format not in EXTENSIONS:
+        raise ValidationError('不支持的图片格式: %s' % image_format)
+    return image_format, width, height
+
+
+def render(data, specs, image_format='WEBP', quality=82):
+    """
+    生成各规格的图片，返回 [(规格名, 字节, 宽, 高)]
+    specs 为 {规格名: (宽, 高, 是否裁剪)}；只依赖 Pillow，可在子进程中执行
+    """
+    results = []
+    with Image.open(io.BytesIO(data)) as source:
+        source.seek(0)  # 动图只取第一帧
+        image = ImageOps.exif_transpose(source)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        for name, (width, height, crop) in specs.items():
+            if crop:
+                if image.width <= width and image.height <= height:
+                    continue
+                resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                if image.width <= width:
+                    continue
+                target = (width, height or round(image.height * width / image.width))
+                resized = image.resize(target, Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, quality=quality, optimize=True)
+            results.append((name, buffer.getvalue(), resized.width, resized.height))
+    return results
+
+
+def ingest(upload, defer=False):
+    """
+    保存上传的图片（UploadedFile、File 或 bytes），返回 ImageAsset
+    内容相同的图片直接返回已有记录；新图片在事务提交后排队生成各规格，
+    defer=True 时只入库，留给 process_images 命令批量处理
+    """
+    data = upload if isinstance(upload, bytes) else b''.join(upload.chunks())
+    sha256 = hashlib.sha256(data).hexdigest()
+    asset = ImageAsset.objects.filter(sha256=sha256).first()
+    if asset is not None:
+        return asset
+
+    image_format, width, height = probe(data)
+    name = original_name(sha256, image_format)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    try:
+        with transaction.atomic():
+            asset = ImageAsset.objects.create(sha256=sha256, file=name, format=image_format,
+                                              width=width, height=height, file_size=len(data))
+    except IntegrityError:
+        # 并发上传了同一张图片
+        return ImageAsset.objects.get(sha256=sha256)
+    if not defer:
+        transaction.on_commit(lambda: submit(asset.pk))
+    return asset
+
+
+def attach(instance, field_name, upload, save=True):
+    """把上传的图片去重后挂到模型的图片字段上（例如头像、贴吧横幅），返回 ImageAsset"""
+    asset = ingest(upload)
+    setattr(instance, field_name, asset.file.name)
+    if save:
+        instance.save(update_fields=[field_name])
+    return asset
+
+
+def render_args(asset):
+    """render() 的参数（读取原图）"""
+    with asset.file.open('rb') as f:
+        data = f.read()
+    return data, _config('VARIANTS', DEFAULT_VARIANTS), output_format(), _config('QUALITY', 82)
+
+
+def store(asset, rendered, image_format):
+    """保存 render() 的结果，替换原有规格并标记为已生成"""
+    variants = []
+    for name, content, width, height in rendered:
+        path = variant_name(asset.sha256, name, image_format)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        path = default_storage.save(path, ContentFile(content))
+        variants.append(ImageVariant(asset=asset, name=name, file=path,
+                                     width=width, height=height, file_size=len(content)))
+    with transaction.atomic():
+        ImageVariant.objects.filter(asset=asset).delete()
+        ImageVariant.objects.bulk_create(variants)
+        ImageAsset.objects.filter(pk=asset.pk).update(status=READY)
+
+
+def mark_failed(asset):
+    logger.exception('生成图片规格失败: %s', asset.sha256)
+    ImageAsset.objects.filter(pk=asset.pk).update(status=FAILED)
+
+
+def process(asset):
+    """在当前线程生成一张图片的所有规格，成功返回 True"""
+    try:
+        args = render_args(asset)
+        rendered = render(*args)
+    except Exception:
+        mark_failed(asset)
+        return False
+    store(asset, rendered, args[2])
+    return True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _process_by_id(asset_id):
+    from django.db import connections
+
+    try:
+        asset = ImageAsset.objects.filter(pk=asset_id, status=PENDING).first()
+        if asset is not None:
+            process(asset)
+    finally:
+        connections.close_all()
+
+
+def submit(asset_id):
+    """把图片交给后台线程池生成规格；INLINE 为 True 时（测试）直接同步处理"""
+    if _config('INLINE', False):
+        asset = ImageAsset.objects.get(pk=asset_id)
+        return process(asset)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_config('WORKERS', 2), thread_name_prefix='images')
+    _executor.submit(_process_by_id, asset_id)
+
+
+def assets_for(names):
+    """按原图路径批量取 ImageAsset（头像等只保存路径的字段用），返回 {路径: asset}"""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    assets = ImageAsset.objects.filter(file__in=names).prefetch_related('variants')
+    return {asset.file.name: asset for asset in assets}
+
+
+async def aassets_for(names):
+    """assets_for 的异步版本：预取由 prefetch_related 完成，放在线程中执行"""
+    return await sync_to_async(assets_for)(names)
+
+
+def image_data(asset, request=None):
+    """
+    图片的展示数据：原图地址、宽高和各规格地址（缺少的规格回退到原图）
+    asset 的 variants 应已通过 prefetch_related 预取
+    """
+    def url(file):
+        return request.build_absolute_uri(file.url) if request else file.url
+
+    original = url(asset.file)
+    variants = {v.name: {'url': url(v.file), 'width': v.width, 'height': v.height}
+                for v in asset.variants.all()}
+    for name in _config('VARIANTS', DEFAULT_VARIANTS):
+        variants.setdefault(name, {'url': original, 'width': asset.width, 'height': asset.height})
+    return {'url': original, 'width': asset.width, 'height': asset.height, 'variants': variants}
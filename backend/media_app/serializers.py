@@ -0,0 +1,56 @@
+from rest_framework import serializers
+
+from .pipeline import assets_for, image_data
+
+
+class ImageAssetSerializer(serializers.BaseSerializer):
+    """图片展示数据：原图地址、宽高和各规格地址（需预取 variants）"""
+
+    def to_representation(self, instance):
+        return image_data(instance, self.context.get('request'))
+
+
+def load_assets(context, names):
+    """把还没取过的图片路径一次查出，放进 context['image_assets']（同一次序列化内共用）"""
+    assets = context.setdefault('image_assets', {})
+    missing = {name for name in names if name and name not in assets}
+    if missing:
+        found = assets_for(missing)
+        for name in missing:
+            assets[name] = found.get(name)
+    return assets
+
+
+class AssetImageField(serializers.Field):
+    """
+    只保存路径的图片字段（头像、横幅、缩略图）的展示数据，格式同 ImageAssetSerializer；
+    不是经流水线入库的旧图片输出 None，客户端回退到原来的地址字段。
+    列表序列化时由 AssetListSerializer 一次查出整页的图片
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        asset = load_assets(self.context, [value.name])[value.name]
+        return image_data(asset, self.context.get('request')) if asset is not None else None
+
+
+class AssetListSerializer(serializers.ListSerializer):
+    """列表中所有 AssetImageField 的路径合并成一次 assets_for 查询"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        load_assets(self.context, self.child.image_names(items))
+        return super().to_representation(items)
+
+
+class AssetImagesMixin:
+    """配合 AssetListSerializer 使用：列出一批对象中需要预取的图片路径"""
+
+    def image_names(self, items):
+        fields = [field.source for field in self.fields.values() if isinstance(field, AssetImageField)]
+        return [getattr(item, source).name for item in items for source in fields if getattr(item, source)]
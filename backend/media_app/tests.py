@@ -0,0 +1,156 @@
+import io
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import ExifTags, Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from message_app import uploads
+from message_app.models import MessageAttachment, PrivateMessage
+from message_app.serializers import MessageAttachmentSerializer
+from post_app.models import Post
+from tieba_app import cache as tieba_cache
+from tieba_app.models import Tieba
+from user_app import graph
+from user_app.models import FollowRelation, User
+
+from . import pipeline
+from .models import ImageAsset
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_bytes(size=(600, 300), color='red', orientation=None):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    if orientation:
+        exif[ExifTags.Base.Orientation] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+def upload(name, **kwargs):
+    return SimpleUploadedFile(name, image_bytes(**kwargs), content_type='image/jpeg')
+
+
+class ProbeTests(TestCase):
+
+    def test_rotated_exif_swaps_dimensions(self):
+        self.assertEqual(pipeline.probe(image_bytes((40, 20), orientation=6)), ('JPEG', 20, 40))
+        self.assertEqual(pipeline.probe(image_bytes((40, 20), orientation=3)), ('JPEG', 40, 20))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PIPELINE={'INLINE': True, 'FORMAT': 'JPEG'},
+                   NOTIFICATIONS={'ENABLED': False})
+class UploadWiringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.fans = [User.objects.create_user('fan%d' % i, 'fan%d@example.com' % i, 'pass') for i in range(3)]
+        for fan in cls.fans:
+            FollowRelation.objects.create(follower=fan, following=cls.owner)
+        cls.tieba = Tieba.objects.create(name='tieba', owner=cls.owner)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        tieba_cache.tieba_cache.clear_local()
+        self.client = APIClient()
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(user))
+
+    def put(self, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(url, data, format='multipart')
+
+    def test_avatar_upload(self):
+        self.login(self.fans[0])
+        response = self.put(reverse('user-avatar'), {'avatar': upload('a.jpg')})
+        self.assertEqual(response.status_code, 200)
+        asset = ImageAsset.objects.get()
+        self.assertEqual(User.objects.get(pk=self.fans[0].pk).avatar.name, asset.file.name)
+        self.assertEqual(response.data['avatar_image']['width'], 600)
+        # 各规格在提交后生成
+        self.assertEqual(set(asset.variants.values_list('name', flat=True)), {'thumb', 'small'})
+
+    def test_rejects_non_images(self):
+        self.login(self.fans[0])
+        bad = SimpleUploadedFile('a.jpg', b'not an image', content_type='image/jpeg')
+        self.assertEqual(self.put(reverse('user-avatar'), {'avatar': bad}).status_code, 400)
+
+    def test_follower_list_loads_avatars_in_one_batch(self):
+        def count():
+            caches['default'].clear()
+            graph.graph_cache.local.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('follower-list', args=[self.owner.pk]))
+            self.assertEqual(response.status_code, 200)
+            return len(queries), response.data['results']
+
+        self.login(self.fans[0])
+        self.put(reverse('user-avatar'), {'avatar': upload('a.jpg')})
+        one, _ = count()
+        for i, fan in enumerate(self.fans[1:]):
+            self.login(fan)
+            self.put(reverse('user-avatar'), {'avatar': upload('b.jpg', color='blue' if i else 'green')})
+        many, results = count()
+        self.assertEqual(one, many)
+        self.assertTrue(all(item['user']['avatar_image'] for item in results))
+
+    def test_tieba_images_in_header(self):
+        self.login(self.fans[0])
+        url = reverse('tieba-images', args=[self.tieba.pk])
+        self.assertEqual(self.put(url, {'banner': upload('b.jpg')}).status_code, 403)
+        self.login(self.owner)
+        self.client.get(reverse('tieba-detail', args=[self.tieba.pk]))
+        response = self.put(url, {'avatar': upload('a.jpg', size=(200, 200)), 'banner': upload('b.jpg', color='blue')})
+        self.assertEqual(response.status_code, 200)
+        tieba = self.client.get(reverse('tieba-detail', args=[self.tieba.pk])).data['tieba']
+        self.assertEqual(tieba['avatar_image']['width'], 200)
+        self.assertEqual(tieba['banner_image']['width'], 600)
+        # 异步版本的图片数据与同步版本一致
+        tieba_cache.tieba_cache.clear_local()
+        caches['default'].clear()
+        async_tieba = self.client.get(reverse('tieba-detail-async', args=[self.tieba.pk])).json()['tieba']
+        self.assertEqual(async_tieba['avatar_image'], tieba['avatar_image'])
+        self.assertEqual(async_tieba['banner_image'], tieba['banner_image'])
+
+    def test_post_images(self):
+        post = Post.objects.create(tieba=self.tieba, author=self.owner, title='title', content='content')
+        url = reverse('post-images', args=[post.pk])
+        self.login(self.fans[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url, {'image': upload('a.jpg')}, format='multipart').status_code, 403)
+        self.login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'image': upload('a.jpg'), 'caption': 'hi'}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        images = self.client.get(url).data
+        self.assertEqual([image['caption'] for image in images], ['hi'])
+        self.assertEqual(set(images[0]['asset']['variants']), {'thumb', 'small', 'large'})
+
+    def test_message_image_thumbnail(self):
+        message = PrivateMessage.objects.create(sender=self.fans[0], receiver=self.owner, content='photo')
+        attachment = MessageAttachment(message=message, attachment_type=uploads.IMAGE, file_name='a.jpg')
+        attachment.file.save('a.jpg', ContentFile(image_bytes()), save=False)
+        attachment.file_size = attachment.file.size
+        attachment.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.make_thumbnails(message.pk)
+        data = MessageAttachmentSerializer(message.attachments.all(), many=True).data
+        self.assertEqual(data[0]['thumbnail']['variants']['thumb']['width'], 160)
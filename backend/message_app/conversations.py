@@ -0,0 +1,143 @@
+"""
+私信会话服务
+
+会话的两个用户按ID排序存放（user1 < user2），同一对用户只有一个会话。
+发送消息时在同一事务中插入消息并用 F() 更新会话的消息数、对方未读数、
+最后消息和更新时间；收件箱和未读数都直接读会话表，不再对私信表做
+GROUP BY。
+"""
+
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from tieba_project import pubsub
+
+from . import uploads
+from .models import Conversation, PrivateMessage
+
+
+def normalize_pair(user_a_id, user_b_id):
+    """返回 (user1_id, user2_id)，保证 user1_id < user2_id"""
+    if user_a_id == user_b_id:
+        raise ValueError('不能和自己会话')
+    return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+
+def unread_field(conversation, user_id):
+    """该用户在会话中的未读数字段名"""
+    return 'unread_count_user1' if conversation.user1_id == user_id else 'unread_count_user2'
+
+
+def get_conversation(user_a_id, user_b_id, create=True):
+    user1_id, user2_id = normalize_pair(user_a_id, user_b_id)
+    if not create:
+        return Conversation.objects.filter(user1_id=user1_id, user2_id=user2_id).first()
+    conversation, _ = Conversation.objects.get_or_create(user1_id=user1_id, user2_id=user2_id)
+    return conversation
+
+
+def send_message(sender_id, receiver_id, content, message_type=1, upload_ids=None):
+    """
+    发送私信，返回 (message, conversation)
+    upload_ids 为发送者已完成的分片上传会话，会转成消息附件
+    """
+    with transaction.atomic():
+        sessions = uploads.completed_sessions(sender_id, upload_ids) if upload_ids else []
+        conversation = get_conversation(sender_id, receiver_id)
+        message = PrivateMessage.objects.create(
+            sender_id=sender_id, receiver_id=receiver_id,
+            content=content, message_type=message_type,
+        )
+        if sessions:
+            uploads.attach(message, sessions)
+        field = unread_field(conversation, receiver_id)
+        Conversation.objects.filter(pk=conversation.pk).update(
+            message_count=F('message_count') + 1,
+            last_message=message,
+            updated_at=message.created_at,
+            **{field: F(field) + 1},
+        )
+        transaction.on_commit(lambda: pubsub.publish_to_user(receiver_id, {
+            'type': 'private_message',
+            'conversation': conversation.pk,
+            'message': {'id': message.pk, 'sender': sender_id, 'content': content,
+                        'message_type': message_type, 'created_at': message.created_at.isoformat()},
+            'unread_delta': 1,
+        }))
+    return message, conversation
+
+
+def mark_conversation_read(user_id, conversation):
+    """把会话中发给该用户的消息全部标为已读，返回标记的条数"""
+    other_id = conversation.user2_id if conversation.user1_id == user_id else conversation.user1_id
+    with transaction.atomic():
+        marked = (PrivateMessage.objects
+                  .filter(sender_id=other_id, receiver_id=user_id, is_read=False)
+                  .update(is_read=True, read_at=timezone.now()))
+        if marked:
+            # 只减去本次实际标记的条数：并发送达的新消息已经把计数加一，不能一并清零
+            field = unread_field(conversation, user_id)
+            Conversation.objects.filter(pk=conversation.pk).update(
+                **{field: Greatest(F(field) - marked, Value(0))})
+            # 同步该用户其他已连接的终端
+            transaction.on_commit(lambda: pubsub.publish_to_user(user_id, {
+                'type': 'unread', 'scope': 'messages', 'conversation': conversation.pk, 'delta': -marked,
+            }))
+    return marked
+
+
+def mark_message_read(user_id, message_id):
+    """标记单条消息已读，返回是否发生了变化"""
+    with transaction.atomic():
+        message = (PrivateMessage.objects
+                   .filter(pk=message_id, receiver_id=user_id, is_read=False)
+                   .only('sender_id', 'receiver_id')
+                   .first())
+        if message is None:
+            return False
+        updated = (PrivateMessage.objects
+                   .filter(pk=message_id, is_read=False)
+                   .update(is_read=True, read_at=timezone.now()))
+        if updated:
+            conversation = get_conversation(message.sender_id, user_id, create=False)
+            if conversation is not None:
+                field = unread_field(conversation, user_id)
+                Conversation.objects.filter(pk=conversation.pk, **{'%s__gt' % field: 0}).update(
+                    **{field: F(field) - 1})
+    return bool(updated)
+
+
+def inbox(user_id, before=None, limit=20):
+    """
+    收件箱：按更新时间倒序的会话列表
+
+    两个分支分别走 (user1, updated_at) 和 (user2, updated_at) 索引，
+    用 UNION 合成一条SQL。before 为上一页最后一个会话的 (updated_at, id)。
+    """
+    arms = []
+    for field in ('user1_id', 'user2_id'):
+        arm = Conversation.objects.filter(**{field: user_id})
+        if before:
+            updated_at, pk = before
+            # 冗余的 updated_at <= x 让索引按范围定位，而不是扫描该用户全部会话
+            arm = arm.filter(Q(updated_at__lte=updated_at),
+                             Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+        if connection.features.supports_slicing_ordering_in_compound:
+            arm = arm.order_by('-updated_at', '-id')[:limit]
+        else:
+            arm = arm.order_by()
+        arms.append(arm)
+    conversations = list(arms[0].union(arms[1], all=True).order_by('-updated_at', '-id')[:limit])
+    prefetch_related_objects(conversations, 'last_message', 'user1', 'user2')
+    return conversations
+
+
+def total_unread(user_id):
+    """该用户所有会话的未读总数"""
+    as_user1 = (Conversation.objects.filter(user1_id=user_id)
+                .aggregate(n=Sum('unread_count_user1'))['n'])
+    as_user2 = (Conversation.objects.filter(user2_id=user_id)
+                .aggregate(n=Sum('unread_count_user2'))['n'])
+    return (as_user1 or 0) + (as_user2 or 0)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from message_app import uploads
+
+
+class Command(BaseCommand):
+    help = '取消已过期的分片上传会话并删除临时文件（建议每小时执行一次）'
+
+    def handle(self, *args, **options):
+        count = uploads.cleanup_expired()
+        self.stdout.write(self.style.SUCCESS('清理过期上传会话 %d 个' % count))
@@ -57,9 +57,10 @@ class MessageAttachment(models.Model):
     attachment_type = models.SmallIntegerField(choices=ATTACHMENT_TYPE_CHOICES, verbose_name='附件类型')
     
     # 附件文件
-    file = models.FileField(upload_to='message_attachments/', verbose_name='附件文件')
+    file = models.FileField(upload_to='message_attachments/', max_length=255, verbose_name='附件文件')
     file_name = models.CharField(max_length=255, verbose_name='文件名')
-    file_size = models.IntegerField(default=0, verbose_name='文件大小')
+    file_size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='校验和')
     
     # 缩略图（用于图片/视频）
     thumbnail = models.ImageField(upload_to='message_thumbnails/', null=True, blank=True, verbose_name='缩略图')
@@ -72,6 +73,54 @@ class MessageAttachment(models.Model):
         verbose_name = '消息附件'
         verbose_name_plural = '消息附件'
 
+class UploadSession(models.Model):
+    """分片上传会话（大附件断点续传，分片直接写入磁盘上的临时文件）"""
+    STATUS_CHOICES = [
+        (1, '上传中'),
+        (2, '已完成'),
+        (3, '已取消'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+                             related_name='upload_sessions', verbose_name='上传者')
+    file_name = models.CharField(max_length=255, verbose_name='文件名')
+    total_size = models.BigIntegerField(verbose_name='文件大小')
+    chunk_size = models.IntegerField(verbose_name='分片大小')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='状态')
+    
+    # 完成后的文件路径和校验和（各分片 SHA-256 依次拼接后再做一次 SHA-256）
+    file = models.FileField(upload_to='message_attachments/', max_length=255, blank=True, verbose_name='文件')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='校验和')
+    
+    # 时间字段
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    expires_at = models.DateTimeField(verbose_name='过期时间')
+    
+    class Meta:
+        db_table = 'upload_session'
+        verbose_name = '分片上传会话'
+        verbose_name_plural = '分片上传会话'
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+class UploadChunk(models.Model):
+    """已收到的分片（用于断点续传和最终校验）"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, 
+                                related_name='chunks', verbose_name='上传会话')
+    index = models.IntegerField(verbose_name='分片序号')
+    size = models.IntegerField(verbose_name='分片大小')
+    sha256 = models.CharField(max_length=64, verbose_name='分片哈希')
+    
+    class Meta:
+        db_table = 'upload_chunk'
+        verbose_name = '上传分片'
+        verbose_name_plural = '上传分片'
+        unique_together = ('session', 'index')
+
 class Conversation(models.Model):
     """会话（用于私信对话）"""
     user1 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
@@ -118,8 +167,9 @@ class SystemMessage(models.Model):
     ]
     message_type = models.SmallIntegerField(choices=MESSAGE_TYPE_CHOICES, default=1, verbose_name='消息类型')
     
-    # 目标用户
+    # 目标用户（仅定向消息；广播消息不写入关联行，按用户水位线在读取时匹配）
     target_users = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, 
+                                         through='SystemMessageRecipient',
                                          related_name='system_messages', verbose_name='目标用户')
     
     # 发送设置
@@ -139,11 +189,42 @@ class SystemMessage(models.Model):
         indexes = [
             models.Index(fields=['message_type', 'created_at']),
             models.Index(fields=['is_broadcast', 'created_at']),
+            models.Index(fields=['is_broadcast', 'id']),
         ]
     
     def __str__(self):
         return self.title
 
+class SystemMessageRecipient(models.Model):
+    """定向系统消息的接收记录"""
+    message = models.ForeignKey(SystemMessage, on_delete=models.CASCADE, 
+                                related_name='recipients', verbose_name='系统消息')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+                             related_name='system_message_receipts', verbose_name='用户')
+    is_read = models.BooleanField(default=False, verbose_name='是否已读')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='发送时间')
+    
+    class Meta:
+        db_table = 'system_message_recipient'
+        verbose_name = '系统消息接收记录'
+        verbose_name_plural = '系统消息接收记录'
+        unique_together = ('message', 'user')
+        indexes = [
+            models.Index(fields=['user', 'is_read']),
+        ]
+
+class SystemMessageCursor(models.Model):
+    """用户已读广播水位线（已读到的最大广播消息ID）"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='system_message_cursor', verbose_name='用户')
+    last_broadcast_id = models.BigIntegerField(default=0, verbose_name='已读广播ID')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'system_message_cursor'
+        verbose_name = '系统消息水位线'
+        verbose_name_plural = '系统消息水位线'
+
 class UserMessageSetting(models.Model):
     """用户消息设置"""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
@@ -0,0 +1,73 @@
+from rest_framework import serializers
+
+from media_app.serializers import AssetImageField, AssetImagesMixin, AssetListSerializer
+
+from .models import Conversation, MessageAttachment, PrivateMessage, SystemMessage, UploadSession
+
+
+class PrivateMessageSerializer(serializers.ModelSerializer):
+    """私信序列化器（uploads 为已完成的分片上传会话ID，发送时转成附件）"""
+    uploads = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+
+    class Meta:
+        model = PrivateMessage
+        fields = ['id', 'sender', 'receiver', 'content', 'message_type', 'is_read', 'created_at', 'uploads']
+        read_only_fields = ['sender', 'is_read', 'created_at']
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """收件箱会话序列化器（peer 为对方用户，unread_count 为当前用户的未读数）"""
+    peer = serializers.SerializerMethodField()
+    peer_name = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+    last_message = PrivateMessageSerializer(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'peer', 'peer_name', 'unread_count', 'message_count', 'last_message', 'updated_at']
+
+    def _peer(self, obj):
+        user_id = self.context['request'].user.pk
+        return obj.user2 if obj.user1_id == user_id else obj.user1
+
+    def get_peer(self, obj):
+        return self._peer(obj).pk
+
+    def get_peer_name(self, obj):
+        peer = self._peer(obj)
+        return peer.nickname or peer.username
+
+    def get_unread_count(self, obj):
+        user_id = self.context['request'].user.pk
+        return obj.unread_count_user1 if obj.user1_id == user_id else obj.unread_count_user2
+
+
+class SystemMessageSerializer(serializers.ModelSerializer):
+    """系统消息序列化器"""
+
+    class Meta:
+        model = SystemMessage
+        fields = ['id', 'title', 'content', 'message_type', 'is_broadcast',
+                  'is_important', 'is_pinned', 'created_at', 'expires_at']
+
+
+class MessageAttachmentSerializer(AssetImagesMixin, serializers.ModelSerializer):
+    """私信附件序列化器（文件通过下载接口获取，不直接暴露存储路径；图片附件带缩略图各规格）"""
+    thumbnail = AssetImageField()
+
+    class Meta:
+        model = MessageAttachment
+        fields = ['id', 'attachment_type', 'file_name', 'file_size', 'checksum', 'thumbnail', 'created_at']
+        list_serializer_class = AssetListSerializer
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """分片上传会话序列化器"""
+    chunk_count = serializers.IntegerField(read_only=True)
+    chunk_size = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'file_name', 'total_size', 'chunk_size', 'chunk_count',
+                  'status', 'checksum', 'created_at', 'expires_at']
+        read_only_fields = ['status', 'checksum', 'created_at', 'expires_at']
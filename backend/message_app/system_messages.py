@@ -0,0 +1,126 @@
+"""
+系统消息投递
+
+- 广播消息（is_broadcast=True）只存一行，不写 target_users 关联；每个用户
+  在 system_message_cursor 中记录已读到的最大广播ID，未读广播就是
+  "id > 水位线且未过期" 的广播，走 (is_broadcast, id) 索引计数。
+  还没有水位线的用户（从未全部标为已读）以注册前的最后一条广播为水位线，
+  新用户不会把历史广播全部算作未读
+- 定向消息写入 system_message_recipient，大批量用户按块 bulk_create，
+  已经收到过的用户跳过，未读数走 (user, is_read) 索引计数
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Q, Subquery
+from django.utils import timezone
+
+from tieba_project import pubsub
+
+from .models import SystemMessage, SystemMessageCursor, SystemMessageRecipient
+
+CHUNK_SIZE = 5000
+
+
+def _active(prefix=''):
+    """未过期的消息"""
+    return (Q(**{prefix + 'expires_at__isnull': True})
+            | Q(**{prefix + 'expires_at__gt': timezone.now()}))
+
+
+def broadcast(title, content, **fields):
+    """发送全站广播，并推送给所有在线用户"""
+    message = SystemMessage.objects.create(title=title, content=content, is_broadcast=True, **fields)
+    transaction.on_commit(lambda: pubsub.publish(pubsub.BROADCAST, _payload(message)))
+    return message
+
+
+def _payload(message):
+    return {'type': 'system_message', 'id': message.pk, 'title': message.title,
+            'is_important': message.is_important, 'unread_delta': 1}
+
+
+def send_to_users(message, user_ids, chunk_size=CHUNK_SIZE):
+    """把定向消息投递给一批用户（可以是ID列表或 values_list 查询集），返回投递数"""
+    if hasattr(user_ids, 'iterator'):
+        user_ids = user_ids.iterator(chunk_size=chunk_size)
+    sent, chunk = 0, []
+    for user_id in user_ids:
+        chunk.append(SystemMessageRecipient(message=message, user_id=user_id))
+        if len(chunk) >= chunk_size:
+            sent += _insert(chunk)
+            chunk = []
+    if chunk:
+        sent += _insert(chunk)
+    return sent
+
+
+def _insert(chunk):
+    """写入一块接收记录，返回新增的条数；已经收到过的用户不计数也不再推送"""
+    message = chunk[0].message
+    existing = set(SystemMessageRecipient.objects
+                   .filter(message=message, user_id__in=[r.user_id for r in chunk])
+                   .values_list('user_id', flat=True))
+    chunk = [r for r in chunk if r.user_id not in existing]
+    if not chunk:
+        return 0
+    # ignore_conflicts 只兜底并发重复投递同一条消息的情况
+    SystemMessageRecipient.objects.bulk_create(chunk, ignore_conflicts=True)
+    payload = _payload(message)
+    user_ids = [r.user_id for r in chunk]
+    transaction.on_commit(lambda: [pubsub.publish_to_user(user_id, payload) for user_id in user_ids])
+    return len(chunk)
+
+
+def watermark(user_id):
+    """已读到的最大广播ID；没有水位线时取注册之前的最后一条广播"""
+    seen = (SystemMessageCursor.objects
+            .filter(user_id=user_id)
+            .values_list('last_broadcast_id', flat=True)
+            .first())
+    if seen is None:
+        joined = get_user_model().objects.filter(pk=user_id).values('date_joined')[:1]
+        seen = (SystemMessage.objects
+                .filter(is_broadcast=True, created_at__lt=Subquery(joined))
+                .aggregate(m=Max('id'))['m'])
+    return seen or 0
+
+
+def unread_count(user_id):
+    """未读系统消息数（定向 + 广播）"""
+    targeted = (SystemMessageRecipient.objects
+                .filter(user_id=user_id, is_read=False)
+                .filter(_active('message__'))
+                .count())
+    broadcasts = (SystemMessage.objects
+                  .filter(_active(), is_broadcast=True, id__gt=watermark(user_id))
+                  .count())
+    return targeted + broadcasts
+
+
+def messages_for_user(user_id, limit=20):
+    """用户可见的系统消息（定向 + 广播，未过期），返回 [(message, is_read)]，按ID倒序"""
+    targeted = {
+        r.message_id: r
+        for r in (SystemMessageRecipient.objects
+                  .filter(user_id=user_id)
+                  .filter(_active('message__'))
+                  .select_related('message')
+                  .order_by('-message_id')[:limit])
+    }
+    broadcasts = list(SystemMessage.objects
+                      .filter(_active(), is_broadcast=True)
+                      .order_by('-id')[:limit])
+    seen = watermark(user_id)
+
+    items = [(r.message, r.is_read) for r in targeted.values()]
+    items += [(m, m.pk <= seen) for m in broadcasts if m.pk not in targeted]
+    items.sort(key=lambda item: -item[0].pk)
+    return items[:limit]
+
+
+def mark_all_read(user_id):
+    """全部标为已读：定向消息批量更新，广播只推进水位线"""
+    SystemMessageRecipient.objects.filter(user_id=user_id, is_read=False).update(is_read=True)
+    latest = SystemMessage.objects.filter(is_broadcast=True).aggregate(m=Max('id'))['m'] or 0
+    SystemMessageCursor.objects.update_or_create(user_id=user_id, defaults={'last_broadcast_id': latest})
@@ -0,0 +1,124 @@
+import hashlib
+import io
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tieba_project.pagination import encode_cursor
+from user_app.models import User
+
+from . import conversations, system_messages, uploads
+from .models import Conversation, SystemMessage, UploadChunk, UploadSession
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class InboxCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'pass')
+
+    def get(self, cursor):
+        return self.client.get(reverse('message-inbox'), {'cursor': cursor},
+                               HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(self.user))
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor([]), encode_cursor(['2024-01-01T00:00:00+00:00']),
+                       encode_cursor([1, 2]), encode_cursor(['yesterday', 1]),
+                       encode_cursor(['2024-01-01T00:00:00+00:00', '1']), encode_cursor([None, None])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get(cursor).status_code, 400)
+
+    def test_valid_cursor(self):
+        self.assertEqual(self.get(encode_cursor(['2024-01-01T00:00:00+00:00', 1])).status_code, 200)
+
+    def test_next_page_seeks_by_range(self):
+        with CaptureQueriesContext(connection) as queries:
+            conversations.inbox(self.user.pk, before=(timezone.now(), 1))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        # 两个分支都按 updated_at 的范围定位
+        self.assertEqual(plan.count('updated_at<?'), 2, plan)
+
+
+class MarkConversationReadTests(TestCase):
+
+    def test_only_marked_messages_are_subtracted(self):
+        sender = User.objects.create_user('sender', 'sender@example.com', 'pass')
+        receiver = User.objects.create_user('receiver', 'receiver@example.com', 'pass')
+        for i in range(3):
+            _, conversation = conversations.send_message(sender.pk, receiver.pk, 'hello %d' % i)
+        field = conversations.unread_field(conversation, receiver.pk)
+        # 模拟并发发送：计数已经加一，消息行在标记已读之后才可见
+        Conversation.objects.filter(pk=conversation.pk).update(**{field: 4})
+
+        self.assertEqual(conversations.mark_conversation_read(receiver.pk, conversation), 3)
+        conversation.refresh_from_db()
+        self.assertEqual(getattr(conversation, field), 1)
+
+
+class SystemMessageTests(TestCase):
+
+    def test_new_user_does_not_see_old_broadcasts_as_unread(self):
+        system_messages.broadcast('old', 'before signup')
+        user = User.objects.create_user('newcomer', 'newcomer@example.com', 'pass')
+        self.assertEqual(system_messages.unread_count(user.pk), 0)
+        system_messages.broadcast('new', 'after signup')
+        self.assertEqual(system_messages.unread_count(user.pk), 1)
+        system_messages.mark_all_read(user.pk)
+        self.assertEqual(system_messages.unread_count(user.pk), 0)
+
+    def test_send_counts_only_new_recipients(self):
+        users = [User.objects.create_user('target%d' % i, 'target%d@example.com' % i, 'pass') for i in range(3)]
+        message = SystemMessage.objects.create(title='notice', content='notice')
+        self.assertEqual(system_messages.send_to_users(message, [u.pk for u in users[:2]]), 2)
+        self.assertEqual(system_messages.send_to_users(message, [u.pk for u in users], chunk_size=2), 1)
+        self.assertEqual(message.recipients.count(), 3)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT,
+                   UPLOADS={'MIN_CHUNK_SIZE': 4, 'FREE_SPACE_RESERVE': 0})
+class ChunkUploadTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        user = User.objects.create_user('uploader', 'uploader@example.com', 'pass')
+        self.session = uploads.create_session(user.pk, 'a.bin', 8, chunk_size=4)
+
+    def write(self, index, data, sha256=None):
+        return uploads.write_chunk(self.session, index, io.BytesIO(data), len(data), sha256)
+
+    def test_failed_retry_invalidates_the_recorded_chunk(self):
+        self.write(0, b'aaaa')
+        self.write(1, b'bbbb')
+        with self.assertRaises(uploads.UploadError) as raised:
+            self.write(0, b'cccc', hashlib.sha256(b'aaaa').hexdigest())
+        self.assertEqual(raised.exception.status, 422)
+        # 旧哈希对应的数据已被覆盖，该分片必须重传
+        self.assertEqual(uploads.received(self.session), [1])
+        with self.assertRaises(uploads.UploadError):
+            uploads.complete(self.session)
+        self.write(0, b'aaaa')
+        self.assertEqual(UploadChunk.objects.get(session=self.session, index=0).sha256,
+                         hashlib.sha256(b'aaaa').hexdigest())
+
+    def test_chunk_after_complete_is_a_conflict(self):
+        self.write(0, b'aaaa')
+        self.write(1, b'bbbb')
+        stale = UploadSession.objects.get(pk=self.session.pk)
+        uploads.complete(self.session)
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.write_chunk(stale, 1, io.BytesIO(b'bbbb'), 4)
+        self.assertEqual(raised.exception.status, 409)
@@ -0,0 +1,233 @@
+"""
+私信附件的分片上传（断点续传）
+
+1. 创建上传会话：声明文件名和总大小，服务端检查磁盘剩余空间，
+   在 UPLOADS['TEMP_DIR'] 下预先建好同样大小的稀疏临时文件
+2. 逐个（可并发、可乱序、可重传）上传分片：请求体按块读出，边写入
+   临时文件对应偏移边计算 SHA-256，不经过 Django 的上传处理器缓冲
+3. 完成：所有分片齐全后，把临时文件原地改名为正式文件，不再读一遍；
+   整个文件的校验和是各分片 SHA-256 依次拼接后的 SHA-256
+   （客户端可用同样方法在本地算出并核对）
+
+分片直接写本地文件，要求 default_storage 是文件系统存储。
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from media_app import pipeline
+
+from .models import MessageAttachment, UploadChunk, UploadSession
+
+UPLOADING, COMPLETED, ABORTED = 1, 2, 3
+
+BLOCK_SIZE = 64 * 1024
+
+IMAGE = 1
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    """上传请求无法处理，status 为对应的 HTTP 状态码"""
+
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def _config(key, default):
+    return getattr(settings, 'UPLOADS', {}).get(key, default)
+
+
+def temp_path(session):
+    return default_storage.path(os.path.join(_config('TEMP_DIR', 'uploads/partial'), '%d.part' % session.pk))
+
+
+def create_session(user_id, file_name, total_size, chunk_size=None):
+    """创建上传会话并预分配临时文件"""
+    if total_size <= 0:
+        raise UploadError('文件大小无效')
+    if total_size > _config('MAX_SIZE', 4 << 30):
+        raise UploadError('文件过大', 413)
+    chunk_size = chunk_size or _config('CHUNK_SIZE', 8 << 20)
+    chunk_size = max(_config('MIN_CHUNK_SIZE', 256 << 10), min(chunk_size, _config('MAX_CHUNK_SIZE', 64 << 20)))
+
+    directory = default_storage.path(_config('TEMP_DIR', 'uploads/partial'))
+    os.makedirs(directory, exist_ok=True)
+    if shutil.disk_usage(directory).free < total_size + _config('FREE_SPACE_RESERVE', 512 << 20):
+        raise UploadError('服务器存储空间不足', 507)
+
+    session = UploadSession.objects.create(
+        user_id=user_id, file_name=os.path.basename(file_name)[:255], total_size=total_size, chunk_size=chunk_size,
+        expires_at=timezone.now() + timedelta(seconds=_config('EXPIRES', 86400)),
+    )
+    with open(temp_path(session), 'wb') as f:
+        f.truncate(total_size)
+    return session
+
+
+def expected_size(session, index):
+    if index == session.chunk_count - 1:
+        return session.total_size - index * session.chunk_size
+    return session.chunk_size
+
+
+def check_open(session):
+    if session.status != UPLOADING:
+        raise UploadError('上传会话已结束', 409)
+    if session.expires_at <= timezone.now():
+        raise UploadError('上传会话已过期', 410)
+
+
+def write_chunk(session, index, stream, length, sha256=None):
+    """
+    把一个分片从请求流写入临时文件，返回 UploadChunk
+    sha256 为客户端给出的分片哈希，不一致时拒绝（该分片需要重传）
+    """
+    check_open(session)
+    if not 0 <= index < session.chunk_count:
+        raise UploadError('分片序号超出范围')
+    if length != expected_size(session, index):
+        raise UploadError('分片大小应为 %d 字节' % expected_size(session, index))
+
+    # 重传已记录的分片时先作废原记录：写入中途失败或校验不过，该分片都算未上传，
+    # complete() 不会拿旧哈希去核对已被覆盖的数据
+    UploadChunk.objects.filter(session=session, index=index).delete()
+    hasher = hashlib.sha256()
+    remaining = length
+    try:
+        with open(temp_path(session), 'r+b') as f:
+            f.seek(index * session.chunk_size)
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise UploadError('分片数据不完整')
+                hasher.update(block)
+                f.write(block)
+                remaining -= len(block)
+    except FileNotFoundError as exc:
+        # 临时文件已被 complete() 改名或被 abort() 删除
+        raise UploadError('上传会话已结束', 409) from exc
+    digest = hasher.hexdigest()
+    if sha256 and sha256.lower() != digest:
+        raise UploadError('分片校验失败', 422)
+
+    # 校验通过后才记录哈希（同一分片并发重传时后完成的覆盖前者）
+    chunk, _ = UploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={'size': length, 'sha256': digest},
+    )
+    return chunk
+
+
+def received(session):
+    """已收到的分片序号（断点续传时客户端据此跳过）"""
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def final_name(session, checksum):
+    now = timezone.now()
+    name = get_valid_filename(os.path.basename(session.file_name)) or 'file'
+    return default_storage.get_available_name(
+        'message_attachments/%d/%02d/%s/%s' % (now.year, now.month, checksum[:16], name), max_length=255)
+
+
+def complete(session):
+    """所有分片到齐后生成正式文件，返回会话；重复调用直接返回"""
+    if session.status == COMPLETED:
+        return session
+    check_open(session)
+    chunks = list(session.chunks.order_by('index').values_list('index', 'sha256'))
+    if len(chunks) != session.chunk_count:
+        have = {index for index, _ in chunks}
+        missing = [i for i in range(session.chunk_count) if i not in have]
+        raise UploadError('还有 %d 个分片未上传，例如 %s' % (len(missing), missing[:10]), 409)
+
+    checksum = hashlib.sha256(b''.join(bytes.fromhex(digest) for _, digest in chunks)).hexdigest()
+    name = final_name(session, checksum)
+    os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+    os.replace(temp_path(session), default_storage.path(name))
+    UploadSession.objects.filter(pk=session.pk).update(status=COMPLETED, file=name, checksum=checksum)
+    session.status, session.file, session.checksum = COMPLETED, name, checksum
+    return session
+
+
+def abort(session):
+    """取消上传并删除临时文件"""
+    if session.status == UPLOADING:
+        UploadSession.objects.filter(pk=session.pk).update(status=ABORTED)
+        session.status = ABORTED
+        try:
+            os.remove(temp_path(session))
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_expired():
+    """取消已过期的上传会话，返回清理的数量"""
+    count = 0
+    for session in UploadSession.objects.filter(status=UPLOADING, expires_at__lte=timezone.now()).iterator():
+        abort(session)
+        count += 1
+    return count
+
+
+def attachment_type(file_name):
+    content_type = mimetypes.guess_type(file_name)[0] or ''
+    return {'image': 1, 'audio': 3, 'video': 4}.get(content_type.split('/')[0], 2)
+
+
+def attach(message, sessions):
+    """把已完成的上传会话挂到私信上（需在发送消息的事务中调用），返回附件列表"""
+    attachments = MessageAttachment.objects.bulk_create([
+        MessageAttachment(message=message, attachment_type=attachment_type(s.file_name),
+                          file=s.file.name, file_name=s.file_name, file_size=s.total_size,
+                          checksum=s.checksum)
+        for s in sessions
+    ])
+    # 文件已归附件所有，会话不能再被引用
+    UploadSession.objects.filter(pk__in=[s.pk for s in sessions]).delete()
+    if any(a.attachment_type == IMAGE for a in attachments):
+        transaction.on_commit(partial(make_thumbnails, message.pk))
+    return attachments
+
+
+def make_thumbnails(message_id):
+    """
+    图片附件送入图片流水线，thumbnail 指向去重后的原图，各规格在后台生成
+    按消息查询附件：bulk_create 在 MySQL 上拿不到主键；超过 THUMBNAIL_MAX_SIZE 的图片不处理
+    """
+    attachments = (MessageAttachment.objects
+                   .filter(Q(thumbnail='') | Q(thumbnail__isnull=True), message_id=message_id,
+                           attachment_type=IMAGE, file_size__lte=_config('THUMBNAIL_MAX_SIZE', 32 << 20)))
+    for attachment in attachments:
+        try:
+            with attachment.file.open('rb') as f:
+                pipeline.attach(attachment, 'thumbnail', f.read())
+        except (ValidationError, OSError):
+            # 扩展名是图片但内容不是，按普通文件处理
+            logger.warning('附件 %s 无法生成缩略图', attachment.pk, exc_info=True)
+
+
+def completed_sessions(user_id, session_ids):
+    """取用户自己已完成的上传会话，有任一无效时抛出 UploadError"""
+    sessions = list(UploadSession.objects.select_for_update()
+                    .filter(pk__in=session_ids, user_id=user_id, status=COMPLETED))
+    if len(sessions) != len(set(session_ids)):
+        raise UploadError('附件不存在或尚未上传完成')
+    return sessions
+
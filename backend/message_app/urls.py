@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('inbox/', views.InboxView.as_view(), name='message-inbox'),
+    path('send/', views.SendMessageView.as_view(), name='message-send'),
+    path('conversations/<int:pk>/read/', views.ConversationReadView.as_view(), name='conversation-read'),
+    path('system/', views.SystemMessageListView.as_view(), name='system-message-list'),
+    path('system/read/', views.SystemMessageReadView.as_view(), name='system-message-read'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<int:pk>/', views.UploadSessionDetailView.as_view(), name='upload-detail'),
+    path('uploads/<int:pk>/chunks/<int:index>/', views.UploadChunkView.as_view(), name='upload-chunk'),
+    path('uploads/<int:pk>/complete/', views.UploadCompleteView.as_view(), name='upload-complete'),
+    path('attachments/<int:pk>/download/', views.AttachmentDownloadView.as_view(), name='attachment-download'),
+]
@@ -0,0 +1,194 @@
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from tieba_project import downloads
+from tieba_project.pagination import decode_cursor, encode_cursor
+
+from . import conversations, system_messages, uploads
+from .models import Conversation, MessageAttachment, UploadSession
+from .serializers import (ConversationSerializer, MessageAttachmentSerializer, PrivateMessageSerializer,
+                          SystemMessageSerializer, UploadSessionSerializer)
+
+
+def _inbox_position(cursor):
+    """解析收件箱游标，返回 (updated_at, id)；格式或类型不对时抛出 ValueError"""
+    values = decode_cursor(cursor)[0]
+    if len(values) != 2:
+        raise ValueError(cursor)
+    updated_at, pk = values
+    if not isinstance(updated_at, str) or type(pk) is not int:
+        raise ValueError(cursor)
+    updated_at = parse_datetime(updated_at)
+    if updated_at is None:
+        raise ValueError(cursor)
+    return updated_at, pk
+
+
+class InboxView(APIView):
+    """私信收件箱（会话列表，按更新时间倒序）"""
+    permission_classes = [permissions.IsAuthenticated]
+    page_size = 20
+
+    def get(self, request):
+        before = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                before = _inbox_position(cursor)
+            except ValueError:
+                return Response({'detail': '无效的分页游标'}, status=status.HTTP_400_BAD_REQUEST)
+        items = conversations.inbox(request.user.pk, before=before, limit=self.page_size)
+        next_cursor = None
+        if len(items) == self.page_size:
+            next_cursor = encode_cursor([items[-1].updated_at, items[-1].pk])
+        return Response({
+            'next': next_cursor,
+            'unread': conversations.total_unread(request.user.pk),
+            'results': ConversationSerializer(items, many=True, context={'request': request}).data,
+        })
+
+
+class SendMessageView(APIView):
+    """发送私信"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = PrivateMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        receiver = serializer.validated_data['receiver']
+        if receiver.pk == request.user.pk:
+            return Response({'detail': '不能给自己发私信'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            message, _ = conversations.send_message(
+                request.user.pk, receiver.pk,
+                serializer.validated_data['content'],
+                serializer.validated_data.get('message_type', 1),
+                upload_ids=serializer.validated_data.get('uploads'),
+            )
+        except uploads.UploadError as exc:
+            return Response({'detail': exc.detail}, status=exc.status)
+        data = PrivateMessageSerializer(message).data
+        data['attachments'] = MessageAttachmentSerializer(message.attachments.all(), many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class ConversationReadView(APIView):
+    """把整个会话标为已读"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        user_id = request.user.pk
+        conversation = get_object_or_404(Conversation, pk=pk)
+        if user_id not in (conversation.user1_id, conversation.user2_id):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'marked': conversations.mark_conversation_read(user_id, conversation)})
+
+
+class SystemMessageListView(APIView):
+    """系统消息列表（定向 + 广播）及未读数"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        items = system_messages.messages_for_user(request.user.pk)
+        results = []
+        for message, is_read in items:
+            data = SystemMessageSerializer(message).data
+            data['is_read'] = is_read
+            results.append(data)
+        return Response({'unread': system_messages.unread_count(request.user.pk), 'results': results})
+
+
+class SystemMessageReadView(APIView):
+    """系统消息全部标为已读"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        system_messages.mark_all_read(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionCreateView(APIView):
+    """创建分片上传会话（大附件断点续传，见 message_app/uploads.py）"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = uploads.create_session(request.user.pk, **serializer.validated_data)
+        except uploads.UploadError as exc:
+            return Response({'detail': exc.detail}, status=exc.status)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(APIView):
+    """查询上传进度（已收到的分片序号）或取消上传"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, user_id=request.user.pk)
+        data = UploadSessionSerializer(session).data
+        data['received'] = uploads.received(session)
+        return Response(data)
+
+    def delete(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, user_id=request.user.pk)
+        uploads.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkView(APIView):
+    """
+    上传一个分片：PUT 请求体即分片的原始字节（Content-Type: application/octet-stream），
+    可选请求头 X-Chunk-SHA256 用于校验；同一分片可以重复上传
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, pk, index):
+        session = get_object_or_404(UploadSession, pk=pk, user_id=request.user.pk)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return Response({'detail': '需要 Content-Length'}, status=status.HTTP_411_LENGTH_REQUIRED)
+        try:
+            # 直接读取请求流，不经过 request.data 的解析和缓冲
+            chunk = uploads.write_chunk(session, index, request.stream, length,
+                                        request.headers.get('X-Chunk-SHA256'))
+        except uploads.UploadError as exc:
+            return Response({'detail': exc.detail}, status=exc.status)
+        return Response({'index': chunk.index, 'size': chunk.size, 'sha256': chunk.sha256})
+
+
+class UploadCompleteView(APIView):
+    """所有分片上传完毕后合成文件，返回文件校验和"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=pk, user_id=request.user.pk)
+            try:
+                uploads.complete(session)
+            except uploads.UploadError as exc:
+                return Response({'detail': exc.detail}, status=exc.status)
+        return Response(UploadSessionSerializer(session).data)
+
+
+class AttachmentDownloadView(APIView):
+    """下载私信附件（仅收发双方），支持 Range 请求或交给前端服务器发送"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        user_id = request.user.pk
+        attachment = get_object_or_404(
+            MessageAttachment.objects.filter(Q(message__sender_id=user_id) | Q(message__receiver_id=user_id)),
+            pk=pk,
+        )
+        return downloads.serve(request, attachment.file.name, attachment.file_name,
+                               etag=attachment.checksum or None)
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class OutboxAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'outbox_app'
+    verbose_name = '后台任务'
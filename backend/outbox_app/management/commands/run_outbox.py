@@ -0,0 +1,72 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from outbox_app import outbox, worker
+from tieba_project import pubsub
+
+
+class Command(BaseCommand):
+    help = '用本机进程池执行 outbox 中的后台任务（评论计数、通知等），不依赖消息队列'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=outbox._config('WORKERS', 2),
+                            help='子进程数，0 表示在当前进程中执行')
+        parser.add_argument('--batch-size', type=int, default=outbox._config('BATCH_SIZE', 100),
+                            help='每次交给一个子进程的任务数（同类任务合并执行）')
+        parser.add_argument('--once', action='store_true', help='执行完当前到期的任务后退出')
+        parser.add_argument('--retry-dead', action='store_true', help='先把已放弃的任务重新放回队列')
+
+    def handle(self, *args, **options):
+        if not pubsub.get_pubsub().cross_process:
+            self.stderr.write(self.style.WARNING(
+                "REALTIME['BACKEND'] 是进程内实现，后台任务发出的实时推送到不了 ASGI 进程里的客户端；"
+                '生产环境请改用 tieba_project.pubsub.RedisPubSub'))
+        if options['retry_dead']:
+            self.stdout.write('重新排队 %d 个已放弃的任务' % outbox.retry_dead())
+
+        workers, batch_size = options['workers'], options['batch_size']
+        pool = None
+        if workers > 0:
+            # spawn 出的子进程各自建立数据库连接，不共享父进程的连接
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=worker.init)
+        poll = outbox._config('POLL_INTERVAL', 1.0)
+        prune_every = outbox._config('PRUNE_INTERVAL', 3600)
+        last_prune = 0
+        done = failed = 0
+        try:
+            while True:
+                if time.monotonic() - last_prune >= prune_every:
+                    pruned = outbox.prune()
+                    if pruned:
+                        self.stdout.write('清理已完成任务 %d 个' % pruned)
+                    last_prune = time.monotonic()
+
+                token, jobs = outbox.claim(max(workers, 1) * batch_size)
+                if not jobs:
+                    if options['once']:
+                        break
+                    # 空闲时释放连接，避免长期占用
+                    connections.close_all()
+                    time.sleep(poll)
+                    continue
+
+                batches = outbox.split(jobs, batch_size)
+                if pool is None:
+                    results = [outbox.execute(ids, token) for ids in batches]
+                else:
+                    results = [f.result() for f in [pool.submit(worker.run, ids, token) for ids in batches]]
+                done += sum(d for d, _ in results)
+                failed += sum(f for _, f in results)
+                self.stdout.write('已完成 %d 个任务，失败 %d 个' % (done, failed))
+        except KeyboardInterrupt:
+            # 已领取未完成的任务在租约到期后由其他执行者重新领取
+            self.stdout.write('收到中断，退出')
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS('完成：%d 个任务，失败 %d 个' % (done, failed)))
@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxJob(models.Model):
+    """待执行的后台任务（和产生它的业务数据在同一事务中写入）"""
+    STATUS_CHOICES = [
+        (1, '待执行'),
+        (2, '执行中'),
+        (3, '已完成'),
+        (4, '已放弃'),
+    ]
+    kind = models.CharField(max_length=50, verbose_name='任务类型')
+    payload = models.JSONField(default=dict, verbose_name='参数')
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True, verbose_name='幂等键')
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1, verbose_name='状态')
+    attempts = models.SmallIntegerField(default=0, verbose_name='已执行次数')
+    # 待执行时为最早执行时间（重试退避），执行中时为租约到期时间
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    locked_by = models.CharField(max_length=64, blank=True, default='', verbose_name='领取批次')
+    last_error = models.TextField(blank=True, default='', verbose_name='最近错误')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        db_table = 'outbox_job'
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        indexes = [
+            # 领取到期任务
+            models.Index(fields=['status', 'run_after', 'id']),
+            # 清理已完成任务
+            models.Index(fields=['status', 'finished_at']),
+        ]
+    
+    def __str__(self):
+        return '%s#%s' % (self.kind, self.pk)
@@ -0,0 +1,184 @@
+"""
+事务性 outbox
+
+请求里只把副作用记成一行 OutboxJob，和业务数据在同一个事务中提交：
+业务回滚则任务也不存在，业务提交则任务一定会被执行。run_outbox 命令
+在本机用进程池执行任务，不依赖消息队列。
+
+- 领取：一次领取一批到期任务，标记为执行中并设置租约（LEASE 秒）；
+  执行者崩溃后租约到期，任务会被重新领取
+- 批量：同类任务合并成一次处理函数调用，处理函数收到参数列表，
+  可以把多条任务的写入合并成少量 SQL
+- 幂等：enqueue 时给出幂等键，同一键只会有一个任务；处理函数的写入和
+  "标记完成"在同一事务中，任务成功时副作用恰好生效一次
+- 重试：失败的批次拆成单条重试，找出出错的那一条；出错的任务按
+  RETRY_BASE * 2^(n-1) 秒退避，超过 MAX_ATTEMPTS 次后放弃（可用
+  run_outbox --retry-dead 重新执行）
+
+处理函数用 @handler('类型') 注册，放在各应用的 jobs.py 中，由应用的
+ready() 导入。配置见 settings.OUTBOX。
+"""
+
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxJob
+
+logger = logging.getLogger(__name__)
+
+PENDING, RUNNING, DONE, DEAD = 1, 2, 3, 4
+
+_handlers = {}
+
+
+def _config(key, default):
+    return getattr(settings, 'OUTBOX', {}).get(key, default)
+
+
+class LeaseLost(Exception):
+    """租约已过期并被其他执行者领取，本次执行的结果作废"""
+
+
+def handler(kind):
+    """注册任务处理函数，处理函数接收同类任务的参数列表"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, key=None, delay=0):
+    """
+    记录一个后台任务，应在业务写入的事务中调用；
+    key 为幂等键，同一键的任务已存在时什么也不做
+    """
+    job = OutboxJob(kind=kind, payload=payload, idempotency_key=key,
+                    run_after=timezone.now() + timedelta(seconds=delay))
+    if key:
+        OutboxJob.objects.bulk_create([job], ignore_conflicts=True)
+    else:
+        job.save()
+    if _config('INLINE', False):
+        transaction.on_commit(run_pending)
+
+
+def backoff(attempts):
+    """第 attempts 次失败后等待的秒数"""
+    return min(_config('RETRY_BASE', 5) * 2 ** (attempts - 1), _config('RETRY_MAX', 3600))
+
+
+def claim(limit):
+    """领取最多 limit 个到期任务，返回 (领取批次, 任务列表)"""
+    now = timezone.now()
+    token = '%s:%d:%s' % (socket.gethostname()[:40], os.getpid(), uuid.uuid4().hex[:8])
+    due = OutboxJob.objects.filter(status__in=[PENDING, RUNNING], run_after__lte=now).order_by('id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return token, []
+        # 条件再判断一次：不支持 SKIP LOCKED 的数据库上，并发领取的另一方已经改过的行不会被重复领取
+        OutboxJob.objects.filter(pk__in=ids, status__in=[PENDING, RUNNING], run_after__lte=now).update(
+            status=RUNNING, locked_by=token, attempts=F('attempts') + 1,
+            run_after=now + timedelta(seconds=_config('LEASE', 300)))
+    return token, list(OutboxJob.objects.filter(pk__in=ids, locked_by=token).only('id', 'kind').order_by('id'))
+
+
+def split(jobs, size):
+    """按任务类型分组，每组再按 size 切成批次，返回任务ID列表的列表"""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.kind, []).append(job.pk)
+    return [ids[i:i + size] for ids in groups.values() for i in range(0, len(ids), size)]
+
+
+def _run(func, jobs, token):
+    with transaction.atomic():
+        func([job.payload for job in jobs])
+        finished = OutboxJob.objects.filter(
+            pk__in=[job.pk for job in jobs], status=RUNNING, locked_by=token,
+        ).update(status=DONE, locked_by='', finished_at=timezone.now())
+        if finished != len(jobs):
+            raise LeaseLost()
+
+
+def _fail(job, token, error):
+    dead = job.attempts >= _config('MAX_ATTEMPTS', 8)
+    OutboxJob.objects.filter(pk=job.pk, status=RUNNING, locked_by=token).update(
+        status=DEAD if dead else PENDING, locked_by='', last_error=error[-4000:],
+        run_after=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+
+
+def execute(job_ids, token):
+    """执行本批次领取的任务，返回 (完成数, 失败数)"""
+    jobs = list(OutboxJob.objects.filter(pk__in=job_ids, status=RUNNING, locked_by=token).order_by('id'))
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.kind, []).append(job)
+
+    done = failed = 0
+    for kind, group in groups.items():
+        func = _handlers.get(kind)
+        if func is None:
+            for job in group:
+                _fail(job, token, '未注册的任务类型: %s' % kind)
+            failed += len(group)
+            continue
+        # 整批失败时逐条重试，只让出错的任务进入退避
+        if len(group) > 1:
+            try:
+                _run(func, group, token)
+                done += len(group)
+                continue
+            except LeaseLost:
+                logger.warning('任务租约已过期，放弃本次结果: %s', kind)
+                continue
+            except Exception:
+                logger.exception('批量执行失败，改为逐条执行: %s', kind)
+        for job in group:
+            try:
+                _run(func, [job], token)
+                done += 1
+            except LeaseLost:
+                logger.warning('任务租约已过期，放弃本次结果: %s', job)
+            except Exception:
+                logger.exception('任务执行失败: %s', job)
+                _fail(job, token, traceback.format_exc())
+                failed += 1
+    return done, failed
+
+
+def run_pending(batch_size=None):
+    """在当前进程中执行所有到期任务（INLINE 模式和 run_outbox --workers 0 使用）"""
+    batch_size = batch_size or _config('BATCH_SIZE', 100)
+    done = failed = 0
+    while True:
+        token, jobs = claim(batch_size)
+        if not jobs:
+            return done, failed
+        for ids in split(jobs, batch_size):
+            d, f = execute(ids, token)
+            done, failed = done + d, failed + f
+
+
+def retry_dead():
+    """把已放弃的任务重新放回队列，返回任务数"""
+    return OutboxJob.objects.filter(status=DEAD).update(
+        status=PENDING, attempts=0, run_after=timezone.now(), last_error='')
+
+
+def prune():
+    """删除完成超过 KEEP_DONE 秒的任务，返回删除数"""
+    cutoff = timezone.now() - timedelta(seconds=_config('KEEP_DONE', 7 * 86400))
+    deleted, _ = OutboxJob.objects.filter(status=DONE, finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from comment_app import jobs
+from comment_app.models import Comment
+from post_app.models import Post
+from tieba_app.models import Tieba
+from user_app.models import User, UserNotification
+
+from . import outbox
+from .models import OutboxJob
+
+FLAKY = 'test.flaky'
+RECORD = 'test.record'
+
+calls = []
+
+
+@outbox.handler(FLAKY)
+def flaky(payloads):
+    calls.append([p['n'] for p in payloads])
+    if any(p.get('fail') for p in payloads):
+        raise RuntimeError('boom')
+    Tieba.objects.filter(pk__in=[p['tieba_id'] for p in payloads]).update(post_count=len(payloads))
+
+
+@outbox.handler(RECORD)
+def record(payloads):
+    for p in payloads:
+        Tieba.objects.filter(pk=p['tieba_id']).update(description=p['text'])
+
+
+# SQLite 的 FTS5 索引表在测试用例的事务回滚后会损坏，评论索引改用普通表后端
+@override_settings(OUTBOX={'INLINE': True, 'MAX_ATTEMPTS': 2, 'RETRY_BASE': 5}, SEARCH_BACKEND='table')
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', 'author@example.com', 'pass')
+        cls.replier = User.objects.create_user('replier', 'replier@example.com', 'pass')
+        cls.tieba = Tieba.objects.create(name='tieba', owner=cls.author)
+
+    def setUp(self):
+        calls.clear()
+
+    def enqueue(self, kind, payload, key=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.enqueue(kind, payload, key=key)
+
+    def test_comment_created_handler(self):
+        post = Post.objects.create(tieba=self.tieba, author=self.author, title='title', content='content')
+        # 历史数据中 last_reply_at 可能为空
+        Post.objects.filter(pk=post.pk).update(last_reply_at=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=post, author=self.replier, content='reply')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.last_reply_at, comment.created_at)
+        self.assertTrue(UserNotification.objects.filter(user=self.author).exists())
+        self.assertEqual(OutboxJob.objects.get(kind=jobs.COMMENT_CREATED).status, outbox.DONE)
+
+    def test_idempotency_key(self):
+        with self.captureOnCommitCallbacks():
+            outbox.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'a'}, key='k')
+            outbox.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'b'}, key='k')
+        self.assertEqual(OutboxJob.objects.count(), 1)
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        with self.captureOnCommitCallbacks():
+            outbox.enqueue(FLAKY, {'n': 1, 'tieba_id': self.tieba.pk})
+            outbox.enqueue(FLAKY, {'n': 2, 'tieba_id': self.tieba.pk, 'fail': True})
+        with self.assertLogs('outbox_app.outbox', 'ERROR'):
+            self.assertEqual(outbox.run_pending(), (1, 1))
+        self.assertEqual(calls, [[1, 2], [1], [2]])
+        good, bad = OutboxJob.objects.order_by('id')
+        self.assertEqual(good.status, outbox.DONE)
+        self.assertEqual((bad.status, bad.attempts), (outbox.PENDING, 1))
+        self.assertIn('boom', bad.last_error)
+        self.assertGreater(bad.run_after, timezone.now())
+
+        # 退避到期后再失败一次，达到 MAX_ATTEMPTS 后放弃
+        OutboxJob.objects.filter(pk=bad.pk).update(run_after=timezone.now())
+        with self.assertLogs('outbox_app.outbox', 'ERROR'):
+            self.assertEqual(outbox.run_pending(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, outbox.DEAD)
+        self.assertEqual(outbox.run_pending(), (0, 0))
+
+        self.assertEqual(outbox.retry_dead(), 1)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts, bad.last_error), (outbox.PENDING, 0, ''))
+
+    def test_lease_lost_discards_the_result(self):
+        self.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'inline'})
+        with self.captureOnCommitCallbacks():
+            outbox.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'late'})
+        token, jobs = outbox.claim(10)
+        self.assertEqual(len(jobs), 1)
+        # 租约过期后被其他执行者领走
+        OutboxJob.objects.filter(pk=jobs[0].pk).update(locked_by='other')
+        with self.assertRaises(outbox.LeaseLost):
+            outbox._run(record, list(OutboxJob.objects.filter(pk=jobs[0].pk)), token)
+        self.assertEqual(Tieba.objects.get(pk=self.tieba.pk).description, 'inline')
+        # execute() 只处理仍由本批次持有的任务
+        self.assertEqual(outbox.execute([jobs[0].pk], token), (0, 0))
+        self.assertEqual(OutboxJob.objects.get(pk=jobs[0].pk).status, outbox.RUNNING)
+
+    def test_expired_lease_is_reclaimed(self):
+        with self.captureOnCommitCallbacks():
+            outbox.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'retry'})
+        first, jobs = outbox.claim(10)
+        OutboxJob.objects.filter(pk=jobs[0].pk).update(run_after=timezone.now() - timedelta(seconds=1))
+        second, reclaimed = outbox.claim(10)
+        self.assertEqual([job.pk for job in reclaimed], [jobs[0].pk])
+        self.assertEqual(outbox.execute([jobs[0].pk], first), (0, 0))
+        self.assertEqual(outbox.execute([jobs[0].pk], second), (1, 0))
+        self.assertEqual(Tieba.objects.get(pk=self.tieba.pk).description, 'retry')
+
+    def test_prune(self):
+        self.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'old'})
+        self.enqueue(RECORD, {'tieba_id': self.tieba.pk, 'text': 'new'})
+        old = OutboxJob.objects.order_by('id').first()
+        OutboxJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(outbox.prune(), 1)
+        self.assertEqual(OutboxJob.objects.count(), 1)
@@ -0,0 +1,21 @@
+"""
+run_outbox 进程池中子进程的入口
+
+子进程以 spawn 方式启动，不继承父进程的数据库连接；模块顶层不导入模型，
+反序列化任务时先由 init() 初始化 Django。
+"""
+
+import django
+
+
+def init():
+    django.setup()
+
+
+def run(job_ids, token):
+    from django.db import close_old_connections
+
+    from .outbox import execute
+
+    close_old_connections()
+    return execute(job_ids, token)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PostAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'post_app'
+    verbose_name = '帖子'
+
+    def ready(self):
+        from . import jobs, signals  # noqa: F401
@@ -0,0 +1,115 @@
+"""
+贴吧热门帖子排行
+
+热度 = log10(互动量) + 发帖时间戳 / TIME_SCALE，
+互动量 = 点赞 * LIKE_WEIGHT + 评论 * COMMENT_WEIGHT + 浏览 * VIEW_WEIGHT + 1。
+
+热度与"现在"无关：晚发 TIME_SCALE 秒的帖子相当于互动量多十倍，时间衰减
+体现在新帖的起点更高。只重算受影响的行也不会打乱和其他行的相对顺序
+（旧公式按重算时刻衰减，刚重算过的行反而会被压低）。
+
+热度保存在 post_hot_score 表中，(tieba, -score) 索引让"取某吧前N条"
+只是一次索引范围读取，不再对 post 表按表达式排序。
+
+- 发帖时插入热度行
+- 点赞、评论、浏览的计数增量写回数据库后（counters_flushed 信号），
+  只重算受影响的那几行
+- rerank_hot_posts 命令定期按帖子真实计数校正互动量，
+  并删除超出 WINDOW_DAYS 的旧帖
+"""
+
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Post, PostHotScore
+
+ENGAGEMENT_FIELDS = {
+    'like_count': 'LIKE_WEIGHT',
+    'comment_count': 'COMMENT_WEIGHT',
+    'view_count': 'VIEW_WEIGHT',
+}
+
+_DEFAULT_WEIGHTS = {'LIKE_WEIGHT': 3.0, 'COMMENT_WEIGHT': 5.0, 'VIEW_WEIGHT': 0.1}
+
+
+def _config(key, default=None):
+    return getattr(settings, 'HOT_RANKING', {}).get(key, _DEFAULT_WEIGHTS.get(key, default))
+
+
+def engagement_of(like_count=0, comment_count=0, view_count=0):
+    return (like_count * _config('LIKE_WEIGHT') + comment_count * _config('COMMENT_WEIGHT')
+            + view_count * _config('VIEW_WEIGHT') + 1)
+
+
+def hot_score(engagement, created_at):
+    return math.log10(max(engagement, 1)) + created_at.timestamp() / _config('TIME_SCALE', 45000)
+
+
+def track_post(post):
+    """新帖进入热门排行"""
+    engagement = engagement_of(post.like_count, post.comment_count, post.view_count)
+    PostHotScore.objects.update_or_create(
+        post_id=post.pk,
+        defaults={
+            'tieba_id': post.tieba_id,
+            'engagement': engagement,
+            'score': hot_score(engagement, post.created_at),
+            'post_created_at': post.created_at,
+        },
+    )
+
+
+def apply_deltas(deltas):
+    """按计数增量重算受影响帖子的热度，deltas 为 {帖子主键: {字段: 增量}}"""
+    changes = {}
+    for pk, fields in deltas.items():
+        weight = sum(n * _config(ENGAGEMENT_FIELDS[f]) for f, n in fields.items() if f in ENGAGEMENT_FIELDS)
+        if weight:
+            changes[pk] = weight
+    if not changes:
+        return 0
+
+    now = timezone.now()
+    rows = list(PostHotScore.objects.filter(post_id__in=list(changes)))
+    for row in rows:
+        row.engagement = max(row.engagement + changes[row.post_id], 0)
+        row.score = hot_score(row.engagement, row.post_created_at)
+        row.updated_at = now
+    PostHotScore.objects.bulk_update(rows, ['engagement', 'score', 'updated_at'])
+    return len(rows)
+
+
+def rerank(batch_size=1000):
+    """按帖子真实计数重算窗口内所有帖子的热度，返回 (重算数, 删除数)"""
+    now = timezone.now()
+    cutoff = now - timedelta(days=_config('WINDOW_DAYS', 7))
+    removed = PostHotScore.objects.filter(post_created_at__lt=cutoff).delete()[0]
+
+    updated, last_pk = 0, 0
+    while True:
+        rows = list(PostHotScore.objects
+                    .filter(post_id__gt=last_pk)
+                    .select_related('post')
+                    .order_by('post_id')[:batch_size])
+        if not rows:
+            break
+        for row in rows:
+            post = row.post
+            row.engagement = engagement_of(post.like_count, post.comment_count, post.view_count)
+            row.score = hot_score(row.engagement, row.post_created_at)
+            row.updated_at = now
+        PostHotScore.objects.bulk_update(rows, ['engagement', 'score', 'updated_at'])
+        updated += len(rows)
+        last_pk = rows[-1].post_id
+    return updated, removed
+
+
+def hot_posts(tieba_id, limit=20):
+    """某吧热门帖子前N条"""
+    return (Post.objects
+            .filter(hot_score__tieba_id=tieba_id, status=1)
+            .select_related('author')
+            .order_by('-hot_score__score')[:limit])
@@ -0,0 +1,29 @@
+"""
+帖子的后台任务（见 outbox_app/outbox.py）
+
+发帖请求只写帖子和一条 outbox 记录，由 run_outbox 在请求之外完成：
+- 推送到粉丝和吧成员的收件箱（最多上万行，见 timeline.py）
+- 写入搜索索引（见 search_app/indexer.py）
+"""
+
+from outbox_app import outbox
+from search_app import indexer
+
+from . import timeline
+from .models import Post
+
+POST_CREATED = 'post.created'
+
+
+def enqueue_created(post):
+    """在发帖的事务中记录后续任务"""
+    outbox.enqueue(POST_CREATED, {'post_id': post.pk}, key='%s:%d' % (POST_CREATED, post.pk))
+
+
+@outbox.handler(POST_CREATED)
+def post_created(payloads):
+    # 任务执行前已被删除的帖子不再推送
+    post_ids = [p['post_id'] for p in payloads]
+    for post in Post.objects.filter(pk__in=post_ids).select_related('tieba'):
+        timeline.fan_out_post(post)
+    indexer.index_posts(post_ids)
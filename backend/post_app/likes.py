@@ -0,0 +1,7 @@
+"""帖子点赞服务（见 tieba_project/likes.py）"""
+
+from tieba_project.likes import LikeService
+
+from .models import PostLike
+
+post_likes = LikeService(PostLike, 'post')
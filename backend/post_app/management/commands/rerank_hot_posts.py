@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from post_app import hot_ranking
+
+
+class Command(BaseCommand):
+    help = '按帖子真实计数校正热度，移除超出热门窗口的旧帖'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated, removed = hot_ranking.rerank(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('重算 %d 条，移除 %d 条' % (updated, removed)))
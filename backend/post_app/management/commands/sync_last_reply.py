@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from comment_app.models import Comment
+from post_app.models import Post
+
+
+class Command(BaseCommand):
+    help = ('按评论表重算帖子的 last_reply_at（最新评论时间，没有评论时为发帖时间）；'
+            '新评论由 comment.created 后台任务更新，本命令用于修复历史数据')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        latest_reply = Subquery(Comment.objects.filter(post_id=OuterRef('pk'))
+                                .order_by().values('post_id').annotate(m=Max('created_at')).values('m')[:1])
+        updated = 0
+        last_id = 0
+        while True:
+            # 按主键分批，每批一个短事务，避免长时间锁住帖子表
+            ids = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                updated += Post.objects.filter(id__in=ids).update(
+                    last_reply_at=Coalesce(latest_reply, F('created_at')))
+        self.stdout.write(self.style.SUCCESS('已重算 %d 个帖子的最后回复时间' % updated))
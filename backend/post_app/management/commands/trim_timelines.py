@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from post_app import timeline
+
+
+class Command(BaseCommand):
+    help = '把每个用户的首页动态收件箱裁剪到 TIMELINE["INBOX_SIZE"] 条'
+
+    def handle(self, *args, **options):
+        deleted = timeline.trim_inboxes()
+        self.stdout.write(self.style.SUCCESS('删除 %d 条过旧的动态' % deleted))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Post(models.Model):
     """帖子主表"""
@@ -52,8 +53,10 @@ class Post(models.Model):
         db_table = 'post'
         verbose_name = '帖子'
         verbose_name_plural = '帖子'
-        ordering = ['-last_reply_at', '-created_at']
+        # id 随创建时间递增，作为最后的排序键保证顺序唯一，便于游标分页
+        ordering = ['-last_reply_at', '-id']
         indexes = [
+            models.Index(fields=['tieba', 'status', 'last_reply_at', 'id']),
             models.Index(fields=['tieba', 'post_type']),
             models.Index(fields=['author', 'created_at']),
             models.Index(fields=['status', 'created_at']),
@@ -62,11 +65,19 @@ class Post(models.Model):
     
     def __str__(self):
         return self.title
+    
+    def save(self, *args, **kwargs):
+        # 新帖的最后回复时间即发帖时间，保证排序键不为空
+        if self.last_reply_at is None:
+            self.last_reply_at = timezone.now()
+        super().save(*args, **kwargs)
 
 class PostImage(models.Model):
     """帖子图片"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images', verbose_name='帖子')
-    image = models.ImageField(upload_to='post_images/', verbose_name='图片')
+    image = models.ImageField(upload_to='post_images/', max_length=200, verbose_name='图片')
+    asset = models.ForeignKey('media_app.ImageAsset', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='post_images', verbose_name='图片原件')
     caption = models.CharField(max_length=200, blank=True, verbose_name='图片说明')
     sort_order = models.IntegerField(default=0, verbose_name='排序')
     
@@ -75,6 +86,14 @@ class PostImage(models.Model):
         verbose_name = '帖子图片'
         verbose_name_plural = '帖子图片'
         ordering = ['sort_order', 'id']
+    
+    @classmethod
+    def from_upload(cls, post, upload, **kwargs):
+        """保存上传的帖子图片：原图按内容哈希去重，各规格在后台生成"""
+        from media_app.pipeline import ingest
+        
+        asset = ingest(upload)
+        return cls.objects.create(post=post, image=asset.file.name, asset=asset, **kwargs)
 
 class PostLike(models.Model):
     """帖子点赞"""
@@ -108,14 +127,57 @@ class PostCollect(models.Model):
             models.Index(fields=['user', 'created_at']),
         ]
 
+class PostHotScore(models.Model):
+    """帖子热度（按贴吧预先排好序，首页"热门"直接按索引取前N条）"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True,
+                                related_name='hot_score', verbose_name='帖子')
+    tieba = models.ForeignKey('tieba_app.Tieba', on_delete=models.CASCADE, related_name='+', verbose_name='所属贴吧')
+    engagement = models.FloatField(default=0, verbose_name='互动量')
+    score = models.FloatField(default=0, verbose_name='热度')
+    post_created_at = models.DateTimeField(verbose_name='发帖时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        db_table = 'post_hot_score'
+        verbose_name = '帖子热度'
+        verbose_name_plural = '帖子热度'
+        indexes = [
+            models.Index(fields=['tieba', '-score']),
+        ]
+
+class TimelineEntry(models.Model):
+    """首页动态收件箱（发帖时推送给关注者和吧成员，每人只保留最近的若干条）"""
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                              related_name='timeline_entries', verbose_name='接收者')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+', verbose_name='帖子')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='推送时间')
+    
+    class Meta:
+        db_table = 'timeline_entry'
+        verbose_name = '首页动态'
+        verbose_name_plural = '首页动态'
+        # 唯一约束即 (owner, post) 索引，按 post 倒序读取就是一次范围扫描
+        unique_together = ('owner', 'post')
+
+class UserAgent(models.Model):
+    """用户代理字符串字典（浏览记录只保存引用，避免重复存储长文本）"""
+    ua_hash = models.CharField(max_length=40, unique=True, verbose_name='摘要')
+    value = models.TextField(verbose_name='用户代理')
+    
+    class Meta:
+        db_table = 'user_agent'
+        verbose_name = '用户代理'
+        verbose_name_plural = '用户代理'
+
 class PostViewHistory(models.Model):
     """帖子浏览历史"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_history', verbose_name='帖子')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, 
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
                             related_name='post_view_history', verbose_name='用户')
     ip_address = models.GenericIPAddressField(verbose_name='IP地址')
-    user_agent = models.TextField(blank=True, verbose_name='用户代理')
-    viewed_at = models.DateTimeField(auto_now_add=True, verbose_name='浏览时间')
+    user_agent = models.ForeignKey(UserAgent, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', verbose_name='用户代理')
+    viewed_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='浏览时间')
     
     class Meta:
         db_table = 'post_view_history'
@@ -126,6 +188,19 @@ class PostViewHistory(models.Model):
             models.Index(fields=['post', 'viewed_at']),
         ]
 
+class PostViewDaily(models.Model):
+    """帖子每日浏览汇总（由过期的浏览历史压缩而来）"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_views', verbose_name='帖子')
+    date = models.DateField(verbose_name='日期')
+    view_count = models.IntegerField(default=0, verbose_name='浏览数')
+    visitor_count = models.IntegerField(default=0, verbose_name='访客数')
+    
+    class Meta:
+        db_table = 'post_view_daily'
+        verbose_name = '帖子每日浏览'
+        verbose_name_plural = '帖子每日浏览'
+        unique_together = ('post', 'date')
+
 class PostReport(models.Model):
     """帖子举报"""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reports', verbose_name='帖子')
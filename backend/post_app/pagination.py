@@ -0,0 +1,11 @@
+from tieba_project.pagination import KeysetPagination
+
+
+class PostCursorPagination(KeysetPagination):
+    """
+    贴吧帖子列表游标分页
+
+    与 Post.Meta.ordering 保持一致，配合 (tieba, status, last_reply_at, id)
+    组合索引，第5000页和第1页的代价相同。
+    """
+    ordering = ('-last_reply_at', '-id')
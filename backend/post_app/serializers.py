@@ -0,0 +1,30 @@
+from rest_framework import serializers
+
+from media_app.serializers import ImageAssetSerializer
+
+from .models import Post, PostImage
+
+
+class PostListSerializer(serializers.ModelSerializer):
+    """帖子列表序列化器"""
+    author_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'title', 'author', 'author_name', 'tieba', 'post_type',
+            'view_count', 'comment_count', 'like_count',
+            'created_at', 'last_reply_at',
+        ]
+
+    def get_author_name(self, obj):
+        return obj.author.nickname or obj.author.username
+
+
+class PostImageSerializer(serializers.ModelSerializer):
+    """帖子图片序列化器（查询时用 select_related('asset') 和 prefetch_related('asset__variants')）"""
+    asset = ImageAssetSerializer(read_only=True)
+
+    class Meta:
+        model = PostImage
+        fields = ['id', 'image', 'asset', 'caption', 'sort_order']
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tieba_app.models import Tieba
+from tieba_project import counters
+from tieba_project.counters import counters_flushed
+from user_app import notifications
+
+from . import hot_ranking, jobs
+from .models import Post, PostCollect, PostLike
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(Tieba, instance.tieba_id, 'post_count')
+        counters.incr(get_user_model(), instance.author_id, 'post_count')
+        hot_ranking.track_post(instance)
+        # 推送到收件箱可能要写上万行，交给后台任务（见 jobs.py）
+        jobs.enqueue_created(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.decr(Tieba, instance.tieba_id, 'post_count')
+    counters.decr(get_user_model(), instance.author_id, 'post_count')
+
+
+@receiver(post_save, sender=PostLike)
+def post_liked(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(Post, instance.post_id, 'like_count')
+        # 点赞接口把已读出 author_id 的帖子传给 get_or_create，这里不再查库
+        notifications.notify(instance.post.author_id, 'post_like', 'post:%d' % instance.post_id,
+                             instance.user_id, '你的帖子收到了新的赞')
+
+
+@receiver(post_delete, sender=PostLike)
+def post_unliked(sender, instance, **kwargs):
+    counters.decr(Post, instance.post_id, 'like_count')
+
+
+@receiver(post_save, sender=PostCollect)
+def post_collected(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(Post, instance.post_id, 'collect_count')
+
+
+@receiver(post_delete, sender=PostCollect)
+def post_uncollected(sender, instance, **kwargs):
+    counters.decr(Post, instance.post_id, 'collect_count')
+
+
+@receiver(counters_flushed)
+def post_counters_flushed(sender, deltas, **kwargs):
+    label = Post._meta.label
+    hot_ranking.apply_deltas({pk: fields for (model, pk), fields in deltas.items() if model == label})
@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from outbox_app.models import OutboxJob
+from tieba_app.models import Tieba, TiebaCategory
+from tieba_project import counters, likes
+from tieba_project.pagination import encode_cursor
+from user_app.models import FollowRelation, User
+
+from . import hot_ranking, jobs, timeline
+from .likes import post_likes
+from .management.commands.rollup_post_views import Command as RollupCommand
+from .models import Post, PostLike, PostViewDaily, PostViewHistory, TimelineEntry, UserAgent
+from .pagination import PostCursorPagination
+
+from .view_tracking import get_client_ip
+
+
+class ClientIpTests(SimpleTestCase):
+
+    def ip(self, remote, forwarded=None):
+        headers = {'REMOTE_ADDR': remote}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return get_client_ip(RequestFactory().get('/', **headers))
+
+    @override_settings(POST_VIEW_TRACKING={'TRUSTED_PROXIES': []})
+    def test_forwarded_header_ignored_without_trusted_proxies(self):
+        self.assertEqual(self.ip('203.0.113.5', '1.2.3.4'), '203.0.113.5')
+
+    @override_settings(POST_VIEW_TRACKING={'TRUSTED_PROXIES': ['10.0.0.0/8']})
+    def test_forwarded_header_from_untrusted_peer_ignored(self):
+        self.assertEqual(self.ip('203.0.113.5', '1.2.3.4'), '203.0.113.5')
+
+    @override_settings(POST_VIEW_TRACKING={'TRUSTED_PROXIES': ['10.0.0.0/8']})
+    def test_skips_trusted_hops_from_the_right(self):
+        # 客户端自己伪造的 9.9.9.9 在最左边，不应被采用
+        self.assertEqual(self.ip('10.0.0.2', '9.9.9.9, 198.51.100.7, 10.0.0.1'), '198.51.100.7')
+
+    @override_settings(POST_VIEW_TRACKING={'TRUSTED_PROXIES': ['10.0.0.0/8']})
+    def test_invalid_hop_stops_the_walk(self):
+        self.assertEqual(self.ip('10.0.0.2', 'garbage'), '10.0.0.2')
+
+
+class HotScoreTests(TestCase):
+
+    def test_counter_deltas_reorder_hot_posts(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pass')
+        tieba = Tieba.objects.create(name='tieba', owner=author)
+        older = Post.objects.create(tieba=tieba, author=author, title='older', content='content')
+        newer = Post.objects.create(tieba=tieba, author=author, title='newer', content='content')
+        Post.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(hours=5))
+        older.refresh_from_db()
+        hot_ranking.track_post(older)
+        self.assertEqual(list(hot_ranking.hot_posts(tieba.pk)), [newer, older])
+        # 未开启缓冲时直接写库，同样经 counters_flushed 调用 apply_deltas
+        counters.incr(Post, older.pk, 'like_count', 1000)
+        self.assertEqual(list(hot_ranking.hot_posts(tieba.pk)), [older, newer])
+        counters.decr(Post, older.pk, 'like_count', 1000)
+        self.assertEqual(list(hot_ranking.hot_posts(tieba.pk)), [newer, older])
+
+    def test_engagement_only_raises_score(self):
+        created = timezone.now()
+        self.assertGreater(hot_ranking.hot_score(51, created), hot_ranking.hot_score(50, created))
+
+    @override_settings(HOT_RANKING={'TIME_SCALE': 3600})
+    def test_newer_post_needs_less_engagement(self):
+        now = timezone.now()
+        older = hot_ranking.hot_score(10, now - timedelta(hours=1))
+        self.assertAlmostEqual(hot_ranking.hot_score(1, now), older)
+
+
+class RollupTests(TestCase):
+
+    def test_anonymous_visitors_counted_and_rerun_does_not_double_count(self):
+        reader = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        tieba = Tieba.objects.create(name='tieba', owner=reader)
+        post = Post.objects.create(tieba=tieba, author=reader, title='title', content='content')
+        ua1, ua2 = [UserAgent.objects.create(ua_hash=str(i), value='ua%d' % i) for i in range(2)]
+        viewed_at = timezone.now() - timedelta(days=40)
+        day = timezone.localtime(viewed_at).date()
+
+        def view(user=None, ip='10.0.0.1', ua=None):
+            PostViewHistory.objects.create(post=post, user=user, ip_address=ip, user_agent=ua, viewed_at=viewed_at)
+
+        view(reader, ip='10.0.0.9')
+        view(reader)
+        view(ip='10.0.0.1', ua=ua1)
+        view(ip='10.0.0.1', ua=ua1)
+        view(ip='10.0.0.1', ua=ua2)
+        view(ip='10.0.0.2')
+        self.assertEqual(RollupCommand().rollup_day(day, 100), 6)
+        daily = PostViewDaily.objects.get(post=post, date=day)
+        self.assertEqual((daily.view_count, daily.visitor_count), (6, 4))
+
+        # 晚写入的记录再汇总一次：浏览数累加，同一访客不重复计入
+        view(reader)
+        self.assertEqual(RollupCommand().rollup_day(day, 100), 1)
+        daily.refresh_from_db()
+        self.assertEqual((daily.view_count, daily.visitor_count), (7, 4))
+
+
+class TimelineTests(TestCase):
+
+    @override_settings(OUTBOX={'INLINE': True}, SEARCH_BACKEND='table', NOTIFICATIONS={'ENABLED': False})
+    def test_fan_out_runs_outside_the_request(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pass')
+        reader = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        FollowRelation.objects.create(follower=reader, following=author)
+        tieba = Tieba.objects.create(name='tieba', owner=author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(tieba=tieba, author=author, title='title', content='content')
+        # 发帖只记下一条任务，收件箱在任务执行时才写入
+        self.assertTrue(OutboxJob.objects.filter(kind=jobs.POST_CREATED).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(TimelineEntry.objects.values_list('owner_id', 'post_id')), [(reader.pk, post.pk)])
+
+    def test_hidden_posts_do_not_end_the_timeline(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pass')
+        reader = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        tieba = Tieba.objects.create(name='tieba', category=TiebaCategory.objects.create(name='c'), owner=author)
+        posts = [Post.objects.create(tieba=tieba, author=author, title='p%d' % i, content='c') for i in range(6)]
+        TimelineEntry.objects.bulk_create([TimelineEntry(owner=reader, post=post) for post in posts])
+        # 最新的三条里有两条被删除，第一页只剩一条，但后面还有内容
+        Post.objects.filter(pk__in=[posts[5].pk, posts[4].pk]).update(status=3)
+
+        page, before = timeline.read_timeline(reader.pk, limit=3)
+        self.assertEqual([post.pk for post in page], [posts[3].pk])
+        self.assertEqual(before, posts[3].pk)
+        page, before = timeline.read_timeline(reader.pk, before=before, limit=3)
+        self.assertEqual([post.pk for post in page], [posts[2].pk, posts[1].pk, posts[0].pk])
+        page, before = timeline.read_timeline(reader.pk, before=before, limit=3)
+        self.assertEqual((page, before), ([], None))
+
+
+class KeysetRangeTests(TestCase):
+
+    def test_deep_page_seeks_by_range(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pass')
+        tieba = Tieba.objects.create(name='tieba', owner=author)
+        post = Post.objects.create(tieba=tieba, author=author, title='title', content='content')
+        cursor = encode_cursor([post.last_reply_at, post.pk])
+        queryset = Post.objects.filter(tieba_id=tieba.pk, status=1)
+        queryset = PostCursorPagination()._prepare(queryset, cursor, 20)[0]
+        # 索引要按 last_reply_at 的范围定位，而不只用 (tieba, status) 等值前缀
+        self.assertIn('last_reply_at<?', queryset.explain())
+
+
+@override_settings(NOTIFICATIONS={'ENABLED': False})
+class LikeFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'pass')
+        cls.tieba = Tieba.objects.create(name='tieba', owner=cls.user)
+        cls.posts = [Post.objects.create(tieba=cls.tieba, author=cls.user, title='post%d' % i, content='content')
+                     for i in range(3)]
+
+    def setUp(self):
+        caches['default'].clear()
+        likes._cache.clear_local()
+
+    def like(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            post_likes.like(self.user.pk, post)
+
+    def test_new_like_is_added_without_rebuilding(self):
+        self.assertEqual(post_likes.liked_ids(self.user.pk, [self.posts[0].pk]), set())
+        group = post_likes._group(self.user.pk)
+        version = likes._cache.version(group)
+        self.like(self.posts[0])
+        self.assertEqual(likes._cache.version(group), version)
+        self.assertEqual(post_likes.liked_ids(self.user.pk, [p.pk for p in self.posts]), {self.posts[0].pk})
+
+    def test_full_filter_is_rebuilt(self):
+        post_likes.liked_ids(self.user.pk, [self.posts[0].pk])
+        group = post_likes._group(self.user.pk)
+        key = likes._cache.key(group, 'bloom')
+        bloom = likes.BloomFilter.loads(caches['default'].get(key))
+        bloom.count = bloom.capacity
+        caches['default'].set(key, bloom.dumps())
+        version = likes._cache.version(group)
+        self.like(self.posts[1])
+        self.assertEqual(likes._cache.version(group), version + 1)
+        self.assertEqual(post_likes.liked_ids(self.user.pk, [p.pk for p in self.posts]), {self.posts[1].pk})
+
+    def test_async_list_marks_liked(self):
+        PostLike.objects.create(post=self.posts[0], user=self.user)
+        url = reverse('tieba-post-list-async', args=[self.tieba.pk])
+        headers = {'HTTP_AUTHORIZATION': 'Bearer %s' % AccessToken.for_user(self.user)}
+        results = self.client.get(url, **headers).json()['results']
+        self.assertEqual({item['id']: item['liked'] for item in results},
+                         {p.pk: p.pk == self.posts[0].pk for p in self.posts})
+        self.assertNotIn('liked', self.client.get(url).json()['results'][0])
@@ -0,0 +1,128 @@
+"""
+首页动态（关注的人 + 加入的贴吧）
+
+写扩散：发帖时记一条 outbox 任务（见 jobs.py），由后台把帖子ID推送到
+作者粉丝和贴吧成员的收件箱（timeline_entry），读取时只需按 (owner, post)
+索引倒序取一段。
+
+大V作者（粉丝数超过 FANOUT_FOLLOWER_LIMIT）和大吧（成员数超过
+FANOUT_MEMBER_LIMIT）不做推送，读取时再按作者/贴吧索引拉取最新的几条
+与收件箱合并，避免一次发帖写入几十万行。
+
+收件箱只保留最近 INBOX_SIZE 条，由 trim_timelines 命令定期裁剪。
+"""
+
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+
+from tieba_app.models import TiebaMember
+from user_app.models import FollowRelation
+
+from .models import Post, TimelineEntry
+
+
+def _config(key, default):
+    return getattr(settings, 'TIMELINE', {}).get(key, default)
+
+
+def fan_out_post(post):
+    """把新帖推送到粉丝和吧成员的收件箱，返回推送的人数"""
+    follower_limit = _config('FANOUT_FOLLOWER_LIMIT', 5000)
+    member_limit = _config('FANOUT_MEMBER_LIMIT', 10000)
+    author = get_user_model().objects.only('follower_count').get(pk=post.author_id)
+
+    recipients = set()
+    if author.follower_count <= follower_limit:
+        recipients.update(FollowRelation.objects
+                          .filter(following_id=post.author_id)
+                          .values_list('follower_id', flat=True))
+    if post.tieba.member_count <= member_limit:
+        recipients.update(TiebaMember.objects
+                          .filter(tieba_id=post.tieba_id, is_active=True)
+                          .values_list('user_id', flat=True))
+    recipients.discard(post.author_id)
+
+    chunk = _config('CHUNK_SIZE', 1000)
+    recipients = list(recipients)
+    for i in range(0, len(recipients), chunk):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=uid, post_id=post.pk) for uid in recipients[i:i + chunk]],
+            ignore_conflicts=True,
+        )
+    return len(recipients)
+
+
+def read_timeline(user_id, before=None, limit=20):
+    """
+    读取首页动态，返回 (按时间倒序的帖子列表, 下一页的 before)；before 为上一页扫描到的
+    最后一个帖子ID。已删除、隐藏的帖子被过滤掉后一页可能不满 limit 条，下一页仍从
+    本页扫描到的位置继续，没有更多时为 None
+    """
+    inbox = TimelineEntry.objects.filter(owner_id=user_id)
+    if before:
+        inbox = inbox.filter(post_id__lt=before)
+    post_ids = list(inbox.order_by('-post_id').values_list('post_id', flat=True)[:limit])
+
+    pulled = _pull_post_ids(user_id, before, limit)
+    if pulled:
+        # 两路都是倒序，合并去重后取前 limit 条
+        merged = []
+        for pk in heapq.merge(post_ids, pulled, key=lambda x: -x):
+            if not merged or merged[-1] != pk:
+                merged.append(pk)
+        post_ids = merged[:limit]
+
+    posts = (Post.objects
+             .filter(pk__in=post_ids, status=1)
+             .select_related('author', 'tieba')
+             .in_bulk())
+    next_before = post_ids[-1] if len(post_ids) == limit else None
+    return [posts[pk] for pk in post_ids if pk in posts], next_before
+
+
+def _pull_post_ids(user_id, before, limit):
+    """读时拉取：大V作者和大吧的最新帖子"""
+    celebrities = list(FollowRelation.objects
+                       .filter(follower_id=user_id,
+                               following__follower_count__gt=_config('FANOUT_FOLLOWER_LIMIT', 5000))
+                       .values_list('following_id', flat=True))
+    big_tiebas = list(TiebaMember.objects
+                      .filter(user_id=user_id, is_active=True,
+                              tieba__member_count__gt=_config('FANOUT_MEMBER_LIMIT', 10000))
+                      .values_list('tieba_id', flat=True))
+    if not celebrities and not big_tiebas:
+        return []
+
+    source = Q()
+    if celebrities:
+        source |= Q(author_id__in=celebrities)
+    if big_tiebas:
+        source |= Q(tieba_id__in=big_tiebas)
+    posts = Post.objects.filter(source, status=1).exclude(author_id=user_id)
+    if before:
+        posts = posts.filter(pk__lt=before)
+    return list(posts.order_by('-id').values_list('id', flat=True)[:limit])
+
+
+def trim_inboxes(batch_size=1000):
+    """把每个收件箱裁剪到 INBOX_SIZE 条，返回删除的行数"""
+    size = _config('INBOX_SIZE', 800)
+    deleted = 0
+    owners = (TimelineEntry.objects
+              .values('owner_id')
+              .order_by()
+              .annotate(n=Count('id'))
+              .filter(n__gt=size)
+              .values_list('owner_id', flat=True))
+    for owner_id in owners.iterator(chunk_size=batch_size):
+        boundary = list(TimelineEntry.objects
+                        .filter(owner_id=owner_id)
+                        .order_by('-post_id')
+                        .values_list('post_id', flat=True)[size - 1:size])
+        if boundary:
+            deleted += TimelineEntry.objects.filter(owner_id=owner_id, post_id__lt=boundary[0]).delete()[0]
+    return deleted
+
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('timeline/', views.TimelineView.as_view(), name='timeline'),
+    path('tieba/<int:tieba_id>/', views.TiebaPostListView.as_view(), name='tieba-post-list'),
+    path('tieba/<int:tieba_id>/async/', views.tieba_post_list_async, name='tieba-post-list-async'),
+    path('tieba/<int:tieba_id>/hot/', views.TiebaHotPostListView.as_view(), name='tieba-hot-posts'),
+    path('<int:post_id>/images/', views.PostImageListView.as_view(), name='post-images'),
+    path('<int:post_id>/like/', views.PostLikeView.as_view(), name='post-like'),
+]
@@ -0,0 +1,154 @@
+"""
+帖子浏览记录采集
+
+record_view() 只做两件事：用缓存去重，把事件放进内存队列。队列按批
+用 bulk_create 写入 post_view_history，用户代理字符串先转换成
+user_agent 字典表的主键。浏览数走 counters 写回，不再逐条 UPDATE。
+
+- 同一用户（未登录按IP）在 DEDUPE_WINDOW 秒内重复浏览同一帖子只算一次
+- 登录用户的浏览历史全部保留；匿名浏览按 SAMPLE_RATE 抽样写入历史，
+  浏览数仍然全量累加
+- 过期的浏览历史由 rollup_post_views 命令压缩为每日汇总
+
+配置见 settings.POST_VIEW_TRACKING。
+"""
+
+import hashlib
+import ipaddress
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from tieba_project import counters
+from tieba_project.batching import BatchBuffer
+
+from .models import Post, PostViewHistory, UserAgent
+
+MAX_USER_AGENT_LENGTH = 512
+
+
+def _config(key, default):
+    return getattr(settings, 'POST_VIEW_TRACKING', {}).get(key, default)
+
+
+class UserAgentInterner:
+    """把用户代理字符串换成字典表主键，进程内缓存常见的几百个"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, values):
+        """批量解析，返回 {字符串: 主键}"""
+        hashes = {v: hashlib.sha1(v.encode('utf-8')).hexdigest() for v in set(values) if v}
+        with self._lock:
+            result = {v: self._ids[h] for v, h in hashes.items() if h in self._ids}
+        missing = {h: v for v, h in hashes.items() if v not in result}
+        if not missing:
+            return result
+
+        UserAgent.objects.bulk_create(
+            [UserAgent(ua_hash=h, value=v) for h, v in missing.items()],
+            ignore_conflicts=True,
+        )
+        rows = UserAgent.objects.filter(ua_hash__in=list(missing)).values_list('ua_hash', 'id')
+        with self._lock:
+            if len(self._ids) > self.max_size:
+                self._ids.clear()
+            for ua_hash, pk in rows:
+                self._ids[ua_hash] = pk
+                result[missing[ua_hash]] = pk
+        return result
+
+
+class ViewEventBuffer(BatchBuffer):
+    """浏览事件队列"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_agents = UserAgentInterner()
+
+    def empty(self):
+        return []
+
+    def merge(self, pending, item):
+        pending.append(item)
+
+    def write(self, batch):
+        ua_ids = self.user_agents.resolve(event[3] for event in batch)
+        PostViewHistory.objects.bulk_create(
+            [
+                PostViewHistory(post_id=post_id, user_id=user_id, ip_address=ip,
+                                user_agent_id=ua_ids.get(ua), viewed_at=viewed_at)
+                for post_id, user_id, ip, ua, viewed_at in batch
+            ],
+            batch_size=_config('BATCH_SIZE', 500),
+        )
+
+
+_buffer = ViewEventBuffer('post-views',
+                          interval=_config('INTERVAL', 5.0),
+                          max_pending=_config('BATCH_SIZE', 500))
+
+
+def record_view(post_id, user_id, ip_address, user_agent=''):
+    """记录一次浏览，返回这次浏览是否计入（窗口内重复浏览返回 False）"""
+    visitor = 'u%s' % user_id if user_id else 'ip%s' % ip_address
+    dedupe_key = 'post_view:%s:%s' % (post_id, visitor)
+    if not cache.add(dedupe_key, 1, timeout=_config('DEDUPE_WINDOW', 1800)):
+        return False
+
+    counters.incr(Post, post_id, 'view_count')
+    if user_id or random.random() < _config('SAMPLE_RATE', 1.0):
+        _buffer.add((post_id, user_id, ip_address,
+                     (user_agent or '')[:MAX_USER_AGENT_LENGTH], timezone.now()))
+    return True
+
+
+def record_request_view(request, post_id):
+    """从请求中取出用户、IP、UA 并记录浏览"""
+    user_id = request.user.pk if request.user.is_authenticated else None
+    return record_view(post_id, user_id, get_client_ip(request),
+                       request.META.get('HTTP_USER_AGENT', ''))
+
+
+def _is_trusted(address, networks):
+    return any(ipaddress.ip_address(address) in network for network in networks)
+
+
+def _valid_ip(address):
+    try:
+        ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return True
+
+
+def get_client_ip(request):
+    """
+    访客IP：只有直连的对端是 TRUSTED_PROXIES 中的代理时才看 X-Forwarded-For，
+    从右往左跳过可信代理，取第一个不可信的地址；否则客户端可以随意伪造
+    这个头绕过浏览去重
+    """
+    remote = request.META.get('REMOTE_ADDR') or '0.0.0.0'
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    networks = [ipaddress.ip_network(proxy, strict=False) for proxy in _config('TRUSTED_PROXIES', ())]
+    if not forwarded or not networks or not _valid_ip(remote):
+        return remote
+    client = remote
+    hops = [hop.strip() for hop in forwarded.split(',')]
+    while hops and _is_trusted(client, networks):
+        hop = hops.pop()
+        if not _valid_ip(hop):
+            break
+        client = hop
+    return client
+
+
+def flush():
+    """立即写入队列中的浏览事件"""
+    return _buffer.flush()
@@ -0,0 +1,131 @@
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from tieba_project.async_views import async_get, bearer_user_id, error, keyset_page, ok
+
+from . import hot_ranking, timeline
+from .likes import post_likes
+from .models import Post, PostImage
+from .pagination import PostCursorPagination
+from .serializers import PostImageSerializer, PostListSerializer
+
+
+class TiebaPostListView(generics.ListAPIView):
+    """贴吧帖子列表（按最后回复时间倒序，游标分页）"""
+    serializer_class = PostListSerializer
+    pagination_class = PostCursorPagination
+
+    def get_queryset(self):
+        return (Post.objects
+                .filter(tieba_id=self.kwargs['tieba_id'], status=1)
+                .select_related('author'))
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        mark_liked(request, response.data['results'])
+        return response
+
+
+def mark_liked(request, results):
+    """给一页帖子加上当前用户是否赞过（一次批量判断）"""
+    if request.user.is_authenticated:
+        liked = post_likes.liked_ids(request.user.pk, [item['id'] for item in results])
+        for item in results:
+            item['liked'] = item['id'] in liked
+
+
+@async_get
+async def tieba_post_list_async(request, tieba_id):
+    """TiebaPostListView 的异步版本（令牌只验签，带 liked）"""
+    queryset = Post.objects.filter(tieba_id=tieba_id, status=1).select_related('author')
+    try:
+        data = await keyset_page(PostCursorPagination(), request, queryset, PostListSerializer)
+    except ValueError:
+        return error(PostCursorPagination.invalid_cursor_message, 404)
+    user_id = bearer_user_id(request)
+    if user_id is not None:
+        results = data['results']
+        liked = await post_likes.aliked_ids(user_id, [item['id'] for item in results])
+        for item in results:
+            item['liked'] = item['id'] in liked
+    return ok(data)
+
+
+class TiebaHotPostListView(generics.ListAPIView):
+    """贴吧热门帖子（预先计算的热度排行，取前N条）"""
+    serializer_class = PostListSerializer
+    pagination_class = None
+    max_limit = 100
+
+    def get_queryset(self):
+        try:
+            limit = min(int(self.request.query_params.get('limit', 20)), self.max_limit)
+        except ValueError:
+            limit = 20
+        return hot_ranking.hot_posts(self.kwargs['tieba_id'], limit=max(limit, 1))
+
+
+class TimelineView(APIView):
+    """首页动态（关注的人和加入的贴吧的新帖），before 取上一页返回的 next_before"""
+    permission_classes = [permissions.IsAuthenticated]
+    page_size = 20
+
+    def get(self, request):
+        try:
+            before = int(request.query_params.get('before', 0)) or None
+        except ValueError:
+            before = None
+        posts, next_before = timeline.read_timeline(request.user.pk, before=before, limit=self.page_size)
+        results = PostListSerializer(posts, many=True).data
+        mark_liked(request, results)
+        return Response({
+            'next_before': next_before,
+            'results': results,
+        })
+
+
+class PostLikeView(APIView):
+    """点赞（PUT）/ 取消点赞（DELETE），重复请求不改变计数"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, post_id):
+        return self.set_liked(request, post_id, True)
+
+    def delete(self, request, post_id):
+        return self.set_liked(request, post_id, False)
+
+    def set_liked(self, request, post_id, liked):
+        # 带上 author_id：点赞信号给作者发通知时不用再查帖子
+        post = get_object_or_404(Post.objects.only('id', 'like_count', 'author_id'), pk=post_id, status=1)
+        post_likes.set_liked(request.user.pk, post, liked)
+        return Response({'liked': liked, 'like_count': post_likes.like_count(post)})
+
+
+class PostImageListView(APIView):
+    """帖子图片：GET 列出图片及各规格，POST（multipart，字段名 image）由作者上传"""
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def get(self, request, post_id):
+        post = get_object_or_404(Post.objects.only('id'), pk=post_id, status=1)
+        images = post.images.select_related('asset').prefetch_related('asset__variants')
+        return Response(PostImageSerializer(images, many=True, context={'request': request}).data)
+
+    def post(self, request, post_id):
+        post = get_object_or_404(Post.objects.only('id', 'author_id'), pk=post_id, status=1)
+        if post.author_id != request.user.pk:
+            return Response({'detail': '只有作者可以上传图片'}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('image')
+        if upload is None:
+            return Response({'detail': '缺少 image 文件'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            image = PostImage.from_upload(post, upload, caption=str(request.data.get('caption', ''))[:200],
+                                          sort_order=post.images.count())
+        except ValidationError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(PostImageSerializer(image, context={'request': request}).data,
+                        status=status.HTTP_201_CREATED)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class SearchAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'search_app'
+    verbose_name = '搜索'
+
+    def ready(self):
+        from . import jobs, signals  # noqa: F401
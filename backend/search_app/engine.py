@@ -0,0 +1,195 @@
+"""
+全文搜索引擎
+
+文档是帖子（标题 + 正文）和评论（正文），按 segment.tokenize 二元切分后入索引：
+
+- Fts5Backend：SQLite 且编译了 FTS5 时使用 search_fts 虚拟表，按 bm25 排序
+  （标题权重 TITLE_WEIGHT）；rowid = 文档ID * 2 + (0 帖子 / 1 评论)
+- TableBackend：其他数据库使用 search_token 倒排表，先用一条聚合查询取出
+  各词在整个索引中的文档频率，再用一条 GROUP BY 查询在数据库中求交集、
+  打分（词频 / log2(2 + 文档频率)）、排序和分页
+
+两种后端的分数都是越大越相关，结果按 (分数降序, 文档键升序) 排序，
+游标为上一页最后一条的 (分数, 文档键)。
+"""
+
+import math
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value
+
+from tieba_project.pagination import decode_cursor, encode_cursor
+
+from .models import SearchToken
+from .segment import query_terms, tokenize
+
+POST = 1
+COMMENT = 2
+TITLE_WEIGHT = 3.0
+
+
+def doc_key(doc_type, doc_id):
+    return doc_id * 2 + (doc_type - 1)
+
+
+def split_key(key):
+    return (key % 2) + 1, key // 2
+
+
+class Fts5Backend:
+    """SQLite FTS5 后端"""
+    table = 'search_fts'
+
+    def ensure_table(self):
+        # 虚拟表不经过迁移管理，每个连接首次使用时创建
+        if getattr(connection, '_search_fts_ready', False):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                "title, body, tieba_id UNINDEXED, tokenize='unicode61 remove_diacritics 0')" % self.table)
+        connection._search_fts_ready = True
+
+    def index(self, docs):
+        """docs: [(doc_type, doc_id, tieba_id, title, body)]"""
+        rows = [(doc_key(t, i), ' '.join(tokenize(title)), ' '.join(tokenize(body)), tieba_id)
+                for t, i, tieba_id, title, body in docs]
+        with connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % self.table, [(r[0],) for r in rows])
+            cursor.executemany('INSERT INTO %s (rowid, title, body, tieba_id) VALUES (%%s, %%s, %%s, %%s)'
+                               % self.table, rows)
+
+    def remove(self, doc_type, doc_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany('DELETE FROM %s WHERE rowid = %%s' % self.table,
+                               [(doc_key(doc_type, i),) for i in doc_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % self.table)
+
+    def search(self, terms, doc_type, tieba_id, after, limit):
+        match = ' AND '.join('"%s"%s' % (token, '*' if prefix else '') for token, prefix in terms)
+        sql = ['SELECT key, score FROM ('
+               'SELECT rowid AS key, -bm25(%s, %s, 1.0) AS score, tieba_id FROM %s WHERE %s MATCH %%s'
+               ') WHERE 1 = 1' % (self.table, TITLE_WEIGHT, self.table, self.table)]
+        params = [match]
+        if doc_type:
+            sql.append('AND key %%%% 2 = %d' % (doc_type - 1))
+        if tieba_id:
+            sql.append('AND tieba_id = %s')
+            params.append(tieba_id)
+        if after:
+            sql.append('AND (score < %s OR (score = %s AND key > %s))')
+            params += [after[0], after[0], after[1]]
+        sql.append('ORDER BY score DESC, key LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return cursor.fetchall()
+
+
+class TableBackend:
+    """倒排表后端（数据库中求交集、打分）"""
+
+    def ensure_table(self):
+        pass
+
+    def index(self, docs):
+        with transaction.atomic():
+            for doc_type in (POST, COMMENT):
+                ids = [i for t, i, *_ in docs if t == doc_type]
+                if ids:
+                    SearchToken.objects.filter(doc_type=doc_type, doc_id__in=ids).delete()
+            rows = []
+            for doc_type, doc_id, tieba_id, title, body in docs:
+                weights = Counter(tokenize(body))
+                for token in tokenize(title):
+                    weights[token] += TITLE_WEIGHT
+                rows.extend(SearchToken(token=token, doc_type=doc_type, doc_id=doc_id,
+                                        tieba_id=tieba_id, weight=weight)
+                            for token, weight in weights.items())
+            SearchToken.objects.bulk_create(rows, batch_size=1000)
+
+    def remove(self, doc_type, doc_ids):
+        SearchToken.objects.filter(doc_type=doc_type, doc_id__in=list(doc_ids)).delete()
+
+    def clear(self):
+        SearchToken.objects.all().delete()
+
+    def search(self, terms, doc_type, tieba_id, after, limit):
+        matches = [Q(**{'token__startswith' if prefix else 'token': token}) for token, prefix in terms]
+        key = ExpressionWrapper(F('doc_id') * 2 + F('doc_type') - 1, output_field=BigIntegerField())
+        # 文档频率按整个索引统计（不受类型、贴吧筛选和翻页影响），前缀词按匹配到的文档去重
+        frequencies = SearchToken.objects.filter(reduce(operator.or_, matches)).aggregate(
+            **{'d%d' % i: Count(key, distinct=True, filter=q) for i, q in enumerate(matches)})
+        if not all(frequencies.values()):
+            return []
+
+        qs = SearchToken.objects.filter(reduce(operator.or_, matches))
+        if doc_type:
+            qs = qs.filter(doc_type=doc_type)
+        if tieba_id:
+            qs = qs.filter(tieba_id=tieba_id)
+        weights = {'w%d' % i: Sum('weight', filter=q) for i, q in enumerate(matches)}
+        score = reduce(operator.add, (F('w%d' % i) * Value(1 / math.log2(2 + frequencies['d%d' % i]))
+                                      for i in range(len(matches))))
+        # 每个词都命中的文档才保留（求交集）
+        qs = (qs.values('doc_type', 'doc_id')
+              .annotate(**weights)
+              .filter(**{'w%d__isnull' % i: False for i in range(len(matches))})
+              .annotate(score=ExpressionWrapper(score, output_field=FloatField()), key=key))
+        if after:
+            qs = qs.filter(Q(score__lt=after[0]) | Q(score=after[0], key__gt=after[1]))
+        return list(qs.order_by('-score', 'key').values_list('key', 'score')[:limit])
+
+
+def get_backend():
+    choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if choice == 'fts5' or (choice == 'auto' and connection.vendor == 'sqlite' and _has_fts5()):
+        return Fts5Backend()
+    return TableBackend()
+
+
+_fts5_available = None
+
+
+def _has_fts5():
+    global _fts5_available
+    if _fts5_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5_available = any('FTS5' in row[0] for row in cursor.fetchall())
+    return _fts5_available
+
+
+def _position(cursor):
+    """解析游标，返回 (分数, 文档键)；格式或类型不对时抛出 ValueError"""
+    values = decode_cursor(cursor)[0]
+    if len(values) != 2:
+        raise ValueError(cursor)
+    score, key = values
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or type(key) is not int:
+        raise ValueError(cursor)
+    return score, key
+
+
+def search(query, doc_type=None, tieba_id=None, cursor=None, limit=20):
+    """
+    搜索，返回 (hits, next_cursor)，hits 为 [(doc_type, doc_id, score)]
+    游标格式错误时抛出 ValueError
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], None
+    after = _position(cursor) if cursor else None
+    backend = get_backend()
+    backend.ensure_table()
+    rows = backend.search(terms, doc_type, tieba_id, after, limit)
+    hits = [(*split_key(key), score) for key, score in rows]
+    next_cursor = encode_cursor([rows[-1][1], rows[-1][0]]) if len(rows) == limit else None
+    return hits, next_cursor
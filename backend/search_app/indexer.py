@@ -0,0 +1,74 @@
+"""
+索引维护：帖子和评论保存/删除后由后台任务增量更新（见 jobs.py），
+rebuild_search_index 命令用于全量重建
+"""
+
+from comment_app.models import Comment
+from post_app.models import Post
+
+from .engine import COMMENT, POST, get_backend
+
+NORMAL = 1
+
+
+def index_posts(post_ids):
+    """按帖子当前状态更新索引：正常的写入，其他状态的移除"""
+    rows = list(Post.objects.filter(pk__in=list(post_ids))
+                .values_list('id', 'tieba_id', 'title', 'content', 'status'))
+    _apply(POST, post_ids,
+           [(POST, pk, tieba_id, title, content) for pk, tieba_id, title, content, status in rows
+            if status == NORMAL])
+
+
+def index_comments(comment_ids):
+    rows = list(Comment.objects.filter(pk__in=list(comment_ids))
+                .values_list('id', 'post__tieba_id', 'content', 'status'))
+    _apply(COMMENT, comment_ids,
+           [(COMMENT, pk, tieba_id, '', content) for pk, tieba_id, content, status in rows
+            if status == NORMAL])
+
+
+def remove(doc_type, doc_ids):
+    backend = get_backend()
+    backend.ensure_table()
+    backend.remove(doc_type, doc_ids)
+
+
+def _apply(doc_type, doc_ids, docs):
+    backend = get_backend()
+    backend.ensure_table()
+    indexed = {doc[1] for doc in docs}
+    stale = [pk for pk in doc_ids if pk not in indexed]
+    if stale:
+        backend.remove(doc_type, stale)
+    if docs:
+        backend.index(docs)
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """全量重建索引，返回 (帖子数, 评论数)"""
+    backend = get_backend()
+    backend.ensure_table()
+    backend.clear()
+    totals = []
+    for model, doc_type, fields in ((Post, POST, ('id', 'tieba_id', 'title', 'content')),
+                                    (Comment, COMMENT, ('id', 'post__tieba_id', 'content'))):
+        last_pk, total = 0, 0
+        while True:
+            rows = list(model.objects
+                        .filter(pk__gt=last_pk, status=NORMAL)
+                        .order_by('pk')
+                        .values_list(*fields)[:batch_size])
+            if not rows:
+                break
+            if doc_type == POST:
+                docs = [(POST, pk, tieba_id, title, content) for pk, tieba_id, title, content in rows]
+            else:
+                docs = [(COMMENT, pk, tieba_id, '', content) for pk, tieba_id, content in rows]
+            backend.index(docs)
+            total += len(rows)
+            last_pk = rows[-1][0]
+            if stdout:
+                stdout.write('%s: %d' % (model._meta.verbose_name, total))
+        totals.append(total)
+    return tuple(totals)
@@ -0,0 +1,31 @@
+"""
+搜索索引的后台任务（见 outbox_app/outbox.py）
+
+帖子、评论修改或删除时只记一条任务，由 run_outbox 按当前状态批量
+更新索引（已删除或不再正常显示的从索引中移除）。新建的帖子和评论由
+post.created / comment.created 任务顺带索引，发帖、评论的请求里
+不再写索引表，也不多写一行 outbox。
+"""
+
+from outbox_app import outbox
+
+from . import indexer
+from .engine import COMMENT, POST
+
+SEARCH_INDEX = 'search.index'
+
+
+def enqueue_index(doc_type, doc_id):
+    """在修改、删除文档的事务中记录重建索引的任务"""
+    outbox.enqueue(SEARCH_INDEX, {'doc_type': doc_type, 'doc_id': doc_id})
+
+
+@outbox.handler(SEARCH_INDEX)
+def reindex(payloads):
+    # 同一文档在一批里多次修改只索引一次
+    post_ids = {p['doc_id'] for p in payloads if p['doc_type'] == POST}
+    comment_ids = {p['doc_id'] for p in payloads if p['doc_type'] == COMMENT}
+    if post_ids:
+        indexer.index_posts(post_ids)
+    if comment_ids:
+        indexer.index_comments(comment_ids)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from search_app import indexer
+
+
+class Command(BaseCommand):
+    help = '全量重建帖子和评论的全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        posts, comments = indexer.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('已索引 %d 个帖子、%d 条评论' % (posts, comments)))
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SearchToken(models.Model):
+    """倒排索引（非SQLite数据库使用，SQLite下使用FTS5虚拟表）"""
+    DOC_TYPE_CHOICES = [
+        (1, '帖子'),
+        (2, '评论'),
+    ]
+    token = models.CharField(max_length=32, verbose_name='词')
+    doc_type = models.SmallIntegerField(choices=DOC_TYPE_CHOICES, verbose_name='文档类型')
+    doc_id = models.BigIntegerField(verbose_name='文档ID')
+    tieba_id = models.BigIntegerField(verbose_name='所属贴吧')
+    weight = models.FloatField(default=1, verbose_name='词频权重')
+    
+    class Meta:
+        db_table = 'search_token'
+        verbose_name = '搜索索引'
+        verbose_name_plural = '搜索索引'
+        indexes = [
+            models.Index(fields=['token', 'doc_type', 'tieba_id']),
+            models.Index(fields=['doc_type', 'doc_id']),
+        ]
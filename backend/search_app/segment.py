@@ -0,0 +1,46 @@
+"""
+中文分词（二元切分）
+
+连续的汉字按相邻两字切成二元词（"百度贴吧" -> 百度 度贴 贴吧），
+英文和数字按单词切分并转小写。建索引和查询使用同一套规则，
+查询中的任意两个以上连续汉字都能命中，不依赖词典。
+
+单个汉字无法组成二元词，查询时按前缀匹配处理。建索引时每段汉字的
+最后一个字另外存一个单字词（"百度贴吧" 多存一个 "吧"）：其余的字都是
+某个二元词的开头，这样任意一个字都能被前缀匹配到。
+"""
+
+import re
+
+_TOKEN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9A-Za-z]+')
+_CJK = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+MAX_TOKEN_LENGTH = 32
+
+
+def tokenize(text, tail=True):
+    """
+    切分文本，返回词列表（保留重复，用于计算词频）
+    tail 为 True 时每段汉字的最后一个字也作为单字词（建索引用）
+    """
+    tokens = []
+    for run in _TOKEN.findall(text or ''):
+        if _CJK.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if tail or len(run) == 1:
+                tokens.append(run[-1])
+        else:
+            tokens.append(run.lower()[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def query_terms(text):
+    """切分查询串，返回去重后的 [(词, 是否前缀匹配)]"""
+    terms, seen = [], set()
+    # 查询中两个字以上的汉字串已由二元词约束，不再附带末尾单字
+    for token in tokenize(text, tail=False):
+        if token in seen:
+            continue
+        seen.add(token)
+        terms.append((token, len(token) == 1 and bool(_CJK.match(token))))
+    return terms
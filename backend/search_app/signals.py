@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from comment_app.models import Comment
+from post_app.models import Post
+
+from . import jobs
+from .engine import COMMENT, POST
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    # 新帖由 post.created 任务一并索引（见 post_app/jobs.py）
+    if not created:
+        jobs.enqueue_index(POST, instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    jobs.enqueue_index(POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    # 新评论由 comment.created 任务一并索引（见 comment_app/jobs.py）
+    if not created:
+        jobs.enqueue_index(COMMENT, instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    jobs.enqueue_index(COMMENT, instance.pk)
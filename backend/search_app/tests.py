@@ -0,0 +1,141 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from comment_app.models import Comment
+from outbox_app.models import OutboxJob
+from post_app.models import Post
+from tieba_app.models import Tieba
+from tieba_project.pagination import encode_cursor
+from user_app.models import User
+
+from . import engine
+from .models import SearchToken
+from .segment import query_terms, tokenize
+
+DOCS = [
+    (engine.POST, 1, 10, 'django search', 'django orm search engine'),
+    (engine.POST, 2, 10, 'django', 'django django views'),
+    (engine.POST, 3, 11, 'search', 'search ranking'),
+    (engine.COMMENT, 4, 10, '', 'django search comment'),
+    (engine.COMMENT, 5, 11, '', 'unrelated text'),
+]
+
+
+class SegmentTests(SimpleTestCase):
+
+    def test_last_character_of_a_run_is_indexed(self):
+        self.assertEqual(tokenize('百度贴吧 django'), ['百度', '度贴', '贴吧', '吧', 'django'])
+        self.assertEqual(tokenize('吧'), ['吧'])
+
+    def test_query_keeps_bigrams_only(self):
+        self.assertEqual(query_terms('百度贴吧'), [('百度', False), ('度贴', False), ('贴吧', False)])
+        self.assertEqual(query_terms('吧'), [('吧', True)])
+
+
+class BackendTestsMixin:
+    """两种后端共用的用例"""
+
+    def test_intersection_and_ranking(self):
+        hits, next_cursor = engine.search('django search')
+        self.assertEqual([(t, i) for t, i, _ in hits], [(engine.POST, 1), (engine.COMMENT, 4)])
+        self.assertGreater(hits[0][2], hits[1][2])
+        self.assertIsNone(next_cursor)
+
+    def test_filters_do_not_change_document_frequency(self):
+        everywhere = dict(((t, i), score) for t, i, score in engine.search('django search')[0])
+        in_tieba = engine.search('django search', doc_type=engine.POST, tieba_id=10)[0]
+        self.assertEqual([(t, i) for t, i, _ in in_tieba], [(engine.POST, 1)])
+        self.assertEqual(in_tieba[0][2], everywhere[(engine.POST, 1)])
+
+    def test_cursor_pages_through_results(self):
+        pages, cursor = [], None
+        while True:
+            hits, cursor = engine.search('django', cursor=cursor, limit=1)
+            pages.extend((t, i) for t, i, _ in hits)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(pages), [(engine.POST, 1), (engine.POST, 2), (engine.COMMENT, 4)])
+        self.assertEqual(pages[0], (engine.POST, 2))
+
+    def test_missing_term_matches_nothing(self):
+        self.assertEqual(engine.search('django missing'), ([], None))
+
+    def test_malformed_cursor(self):
+        for cursor in ('garbage', encode_cursor([1.0]), encode_cursor([1.0, 2, 3]), encode_cursor(['x', 2]),
+                       encode_cursor([1.0, 'y'])):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    engine.search('django', cursor=cursor)
+
+    def test_single_character_matches_anywhere_in_a_run(self):
+        engine.get_backend().index([(engine.POST, 6, 12, '', '百度贴吧'), (engine.POST, 7, 12, '', '吧主')])
+        for query, expected in (('百', [6]), ('贴', [6]), ('吧', [6, 7]), ('主', [7]), ('贴吧', [6])):
+            with self.subTest(query=query):
+                hits = engine.search(query)[0]
+                self.assertEqual(sorted(i for _, i, _ in hits), expected)
+
+
+@override_settings(SEARCH_BACKEND='table')
+class TableBackendTests(BackendTestsMixin, TestCase):
+
+    def setUp(self):
+        engine.TableBackend().index(DOCS)
+
+    def test_remove(self):
+        engine.TableBackend().remove(engine.POST, [1, 2])
+        self.assertFalse(SearchToken.objects.filter(doc_type=engine.POST, doc_id__in=[1, 2]).exists())
+
+
+# FTS5 虚拟表在测试用例的事务回滚后会损坏，这里不用事务包裹，每个用例开始时清空
+@override_settings(SEARCH_BACKEND='fts5')
+class Fts5BackendTests(BackendTestsMixin, TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor != 'sqlite' or not engine._has_fts5():
+            self.skipTest('SQLite 未编译 FTS5')
+        backend = engine.Fts5Backend()
+        backend.ensure_table()
+        backend.clear()
+        backend.index(DOCS)
+
+    def test_remove(self):
+        engine.Fts5Backend().remove(engine.POST, [1, 2])
+        self.assertEqual(engine.search('django', doc_type=engine.POST), ([], None))
+
+
+@override_settings(SEARCH_BACKEND='table', OUTBOX={'INLINE': True}, NOTIFICATIONS={'ENABLED': False})
+class IndexJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', 'author@example.com', 'pass')
+        cls.tieba = Tieba.objects.create(name='tieba', owner=cls.author)
+
+    def found(self, query, doc_type):
+        return [i for t, i, _ in engine.search(query, doc_type=doc_type)[0]]
+
+    def test_documents_are_indexed_outside_the_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(tieba=self.tieba, author=self.author, title='django', content='orm')
+        self.assertEqual(self.found('django', engine.POST), [post.pk])
+
+        jobs = OutboxJob.objects.count()
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            comment = Comment.objects.create(post=post, author=self.author, content='search comment')
+        # 评论请求只写评论和一条 outbox 记录，不碰索引表
+        self.assertFalse([q['sql'] for q in queries if 'search_' in q['sql']])
+        self.assertEqual(OutboxJob.objects.count(), jobs + 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.found('search', engine.COMMENT), [comment.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.content = 'ranking'
+            post.save()
+        self.assertEqual(self.found('ranking', engine.POST), [post.pk])
+        self.assertEqual(self.found('orm', engine.POST), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete()
+        self.assertEqual(self.found('search', engine.COMMENT), [])
@@ -0,0 +1,47 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from comment_app.models import Comment
+from post_app.models import Post
+from post_app.serializers import PostListSerializer
+
+from . import engine
+
+
+class SearchView(APIView):
+    """全文搜索：q 关键词，type=post/comment，tieba 贴吧ID，cursor 游标"""
+    page_size = 20
+    doc_types = {'post': engine.POST, 'comment': engine.COMMENT}
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        doc_type = self.doc_types.get(request.query_params.get('type'))
+        try:
+            tieba_id = int(request.query_params['tieba']) if request.query_params.get('tieba') else None
+            hits, next_cursor = engine.search(query, doc_type=doc_type, tieba_id=tieba_id,
+                                              cursor=request.query_params.get('cursor'),
+                                              limit=self.page_size)
+        except ValueError:
+            return Response({'detail': '无效的搜索参数'}, status=status.HTTP_400_BAD_REQUEST)
+
+        post_ids = [i for t, i, _ in hits if t == engine.POST]
+        comment_ids = [i for t, i, _ in hits if t == engine.COMMENT]
+        posts = Post.objects.select_related('author').in_bulk(post_ids) if post_ids else {}
+        comments = Comment.objects.select_related('author').in_bulk(comment_ids) if comment_ids else {}
+
+        results = []
+        for doc_type, doc_id, score in hits:
+            if doc_type == engine.POST and doc_id in posts:
+                item = {'type': 'post', 'post': PostListSerializer(posts[doc_id]).data}
+            elif doc_type == engine.COMMENT and doc_id in comments:
+                comment = comments[doc_id]
+                item = {'type': 'comment', 'comment': {
+                    'id': comment.pk, 'post': comment.post_id, 'floor_number': comment.floor_number,
+                    'author': comment.author_id, 'content': comment.content, 'created_at': comment.created_at,
+                }}
+            else:
+                continue
+            item['score'] = score
+            results.append(item)
+        return Response({'next': next_cursor, 'results': results})
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class TiebaAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tieba_app'
+    verbose_name = '贴吧'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,142 @@
+"""
+贴吧头部数据缓存
+
+贴吧、分类列表和有效公告几乎每个贴吧页面都要读取，改为两级读穿缓存；
+模型保存/删除时通过信号让对应分组的版本号失效（见 signals.py），失效在事务
+提交后执行。
+
+成员数、帖子数由计数器直接 UPDATE 写回，不触发信号，缓存中的这些
+数字最多滞后 READ_CACHE['TIMEOUT'] 秒。头像、横幅的各规格在上传后由后台
+生成，生成前缓存的是原图，同样最多滞后这么久。
+"""
+
+import asyncio
+
+from django.utils import timezone
+
+from media_app.pipeline import aassets_for, assets_for
+from tieba_project.cache import VersionedCache
+
+from .models import Tieba, TiebaAnnouncement, TiebaCategory
+
+tieba_cache = VersionedCache('tieba')
+
+CATEGORIES_GROUP = 'categories'
+
+
+def tieba_group(tieba_id):
+    return 't%s' % tieba_id
+
+
+def get_tieba(tieba_id):
+    """按ID取贴吧，不存在返回 None"""
+    return tieba_cache.get_or_load(
+        tieba_group(tieba_id), 'obj',
+        lambda: Tieba.objects.filter(pk=tieba_id).first(),
+    )
+
+
+def get_categories():
+    """启用的贴吧分类，按 sort_order 排序"""
+    return tieba_cache.get_or_load(
+        CATEGORIES_GROUP, 'active',
+        lambda: list(TiebaCategory.objects.filter(is_active=True)),
+    )
+
+
+def get_category(category_id):
+    for category in get_categories():
+        if category.pk == category_id:
+            return category
+    return None
+
+
+def get_active_announcements(tieba_id):
+    """贴吧当前有效的公告（置顶在前），过期时间在读取时过滤"""
+    announcements = tieba_cache.get_or_load(
+        tieba_group(tieba_id), 'announcements',
+        lambda: list(TiebaAnnouncement.objects.filter(tieba_id=tieba_id, is_active=True)),
+    )
+    now = timezone.now()
+    return [a for a in announcements if a.expires_at is None or a.expires_at > now]
+
+
+def _image_names(tieba):
+    return [f.name for f in (tieba.avatar, tieba.banner) if f]
+
+
+def _with_missing(names, found):
+    # 不是经流水线入库的旧图片也缓存下来（None），避免每次都查
+    return {name: found.get(name) for name in names}
+
+
+def get_tieba_images(tieba):
+    """贴吧头像、横幅的 ImageAsset（含各规格），{路径: asset 或 None}"""
+    names = _image_names(tieba)
+    if not names:
+        return {}
+    return tieba_cache.get_or_load(tieba_group(tieba.pk), 'images',
+                                   lambda: _with_missing(names, assets_for(names)))
+
+
+def get_tieba_header(tieba_id):
+    """贴吧页头部所需的数据：贴吧、分类、有效公告和头像横幅图片，不存在返回 None"""
+    tieba = get_tieba(tieba_id)
+    if tieba is None:
+        return None
+    return {
+        'tieba': tieba,
+        'category': get_category(tieba.category_id) if tieba.category_id else None,
+        'announcements': get_active_announcements(tieba_id),
+        'images': get_tieba_images(tieba),
+    }
+
+
+async def aget_tieba(tieba_id):
+    return await tieba_cache.aget_or_load(
+        tieba_group(tieba_id), 'obj',
+        lambda: Tieba.objects.filter(pk=tieba_id).afirst(),
+    )
+
+
+async def aget_categories():
+    async def load():
+        return [c async for c in TiebaCategory.objects.filter(is_active=True)]
+    return await tieba_cache.aget_or_load(CATEGORIES_GROUP, 'active', load)
+
+
+async def aget_active_announcements(tieba_id):
+    async def load():
+        return [a async for a in TiebaAnnouncement.objects.filter(tieba_id=tieba_id, is_active=True)]
+    announcements = await tieba_cache.aget_or_load(tieba_group(tieba_id), 'announcements', load)
+    now = timezone.now()
+    return [a for a in announcements if a.expires_at is None or a.expires_at > now]
+
+
+async def aget_tieba_images(tieba):
+    names = _image_names(tieba)
+    if not names:
+        return {}
+
+    async def load():
+        return _with_missing(names, await aassets_for(names))
+    return await tieba_cache.aget_or_load(tieba_group(tieba.pk), 'images', load)
+
+
+async def aget_tieba_header(tieba_id):
+    """get_tieba_header 的异步版本：贴吧、分类列表、公告三项并发读取"""
+    tieba, categories, announcements = await asyncio.gather(
+        aget_tieba(tieba_id), aget_categories(), aget_active_announcements(tieba_id))
+    if tieba is None:
+        return None
+    category = next((c for c in categories if c.pk == tieba.category_id), None)
+    return {'tieba': tieba, 'category': category, 'announcements': announcements,
+            'images': await aget_tieba_images(tieba)}
+
+
+def invalidate_tieba(tieba_id):
+    tieba_cache.invalidate(tieba_group(tieba_id))
+
+
+def invalidate_categories():
+    tieba_cache.invalidate(CATEGORIES_GROUP)
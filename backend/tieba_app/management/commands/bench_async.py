@@ -0,0 +1,71 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post_app.models import Post
+from tieba_app.models import Tieba
+from tieba_project.benchmark import run_concurrent
+from user_app.models import User
+
+SAMPLE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = '在并发请求下比较热点只读接口的同步（DRF）和异步（async ORM）版本'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='每个接口每种模式的请求数')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+
+    def handle(self, *args, **options):
+        pairs = self.endpoints()
+        if not pairs:
+            raise CommandError('没有样本数据，请先执行 seed_data')
+        setup_test_environment(debug=False)
+        try:
+            asyncio.run(self.run(pairs, options))
+        finally:
+            teardown_test_environment()
+
+    def endpoints(self):
+        """[(名称, 同步URL列表, 异步URL列表, 请求头)]"""
+        tiebas = list(Tieba.objects.order_by('-post_count').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        posts = list(Post.objects.order_by('-comment_count').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        user = User.objects.order_by('-unread_notification_count').first()
+        if not (tiebas and posts and user):
+            return []
+        auth = {'Authorization': 'Bearer %s' % AccessToken.for_user(user)}
+        return [
+            ('tieba-detail',
+             [reverse('tieba-detail', args=[pk]) for pk in tiebas],
+             [reverse('tieba-detail-async', args=[pk]) for pk in tiebas], {}),
+            ('tieba-post-list',
+             [reverse('tieba-post-list', args=[pk]) for pk in tiebas],
+             [reverse('tieba-post-list-async', args=[pk]) for pk in tiebas], {}),
+            ('post-comment-list',
+             [reverse('post-comment-list', args=[pk]) for pk in posts],
+             [reverse('post-comment-list-async', args=[pk]) for pk in posts], {}),
+            ('notification-unread',
+             [reverse('notification-unread')], [reverse('notification-unread-async')], auth),
+        ]
+
+    async def run(self, pairs, options):
+        client = AsyncClient()
+        self.stdout.write('%-20s %-6s %6s %9s %9s %9s %9s' % (
+            '接口', '模式', '并发', 'p50(ms)', 'p95(ms)', 'p99(ms)', 'req/s'))
+        for name, sync_urls, async_urls, headers in pairs:
+            for concurrency in options['concurrency']:
+                for mode, urls in (('sync', sync_urls), ('async', async_urls)):
+                    async def call(i, urls=urls):
+                        return await client.get(urls[i % len(urls)], headers=headers)
+                    # 预热缓存和连接
+                    await run_concurrent(call, len(urls), 1)
+                    stats = await run_concurrent(call, options['requests'], concurrency)
+                    if stats['errors']:
+                        raise CommandError('%s %s 有 %d 次请求失败' % (name, mode, stats['errors']))
+                    self.stdout.write('%-20s %-6s %6d %9.2f %9.2f %9.2f %9.1f' % (
+                        name, mode, concurrency, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['rps']))
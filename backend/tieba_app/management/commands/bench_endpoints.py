@@ -0,0 +1,279 @@
+import random
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from comment_app import mentions
+from comment_app.models import Comment, CommentMention
+from message_app.models import Conversation
+from post_app.models import Post
+from post_app.pagination import PostCursorPagination
+from search_app.segment import query_terms
+from tieba_app.models import Tieba, TiebaCategory
+from tieba_project import benchmark
+from tieba_project.benchmark import scenario
+from tieba_project.pagination import encode_cursor
+from user_app.models import FollowRelation, User, UserNotification
+
+SAMPLE_SIZE = 10
+SEARCH_WORDS = ['游戏', '比赛', '毕业设计', '攻略', '手机']
+# 每条测试评论中的 @ 数（含重复和不存在的用户名）
+MENTIONS_PER_COMMENT = 40
+
+
+class Context:
+    """场景共用的样本数据：热门对象取前几名，再混入随机对象"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.client = Client()
+        self._tokens = {}
+
+    def sample(self, queryset, hot_ordering, size=SAMPLE_SIZE):
+        hot = list(queryset.order_by(hot_ordering).values_list('pk', flat=True)[:size // 2])
+        ids = list(queryset.values_list('pk', flat=True)[:size * 50])
+        self.rng.shuffle(ids)
+        return list(dict.fromkeys(hot + ids))[:size]
+
+    def token(self, user_id):
+        if user_id not in self._tokens:
+            self._tokens[user_id] = str(AccessToken.for_user(User(pk=user_id)))
+        return self._tokens[user_id]
+
+    def get(self, url, user_id=None):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer %s' % self.token(user_id)} if user_id else {}
+        return lambda: self.client.get(url, **headers)
+
+
+@scenario('category-tieba-list', '分类下的贴吧列表')
+def category_tiebas(ctx):
+    ids = ctx.sample(TiebaCategory.objects.all(), '-id')
+    return [ctx.get(reverse('category-tieba-list', args=[pk])) for pk in ids]
+
+
+@scenario('tieba-post-list', '贴吧帖子列表首页')
+def tieba_posts(ctx):
+    ids = ctx.sample(Tieba.objects.all(), '-post_count')
+    return [ctx.get(reverse('tieba-post-list', args=[pk])) for pk in ids]
+
+
+@scenario('tieba-post-list-deep', '贴吧帖子列表第50页（键集分页）')
+def tieba_posts_deep(ctx, pages=50):
+    paginator = PostCursorPagination()
+    calls = []
+    for tieba in Tieba.objects.order_by('-post_count')[:3]:
+        queryset = Post.objects.filter(tieba=tieba, status=1)
+        cursor = None
+        for _ in range(pages):
+            cursor = paginator.get_page(queryset, cursor).next_cursor
+            if cursor is None:
+                break
+        if cursor:
+            calls.append(ctx.get('%s?cursor=%s' % (reverse('tieba-post-list', args=[tieba.pk]), cursor)))
+    return calls
+
+
+@scenario('tieba-hot-posts', '贴吧热门帖子')
+def tieba_hot_posts(ctx):
+    ids = ctx.sample(Tieba.objects.all(), '-post_count')
+    return [ctx.get(reverse('tieba-hot-posts', args=[pk])) for pk in ids]
+
+
+@scenario('post-comment-list', '帖子楼层首页')
+def post_comments(ctx):
+    ids = ctx.sample(Post.objects.all(), '-comment_count')
+    return [ctx.get(reverse('post-comment-list', args=[pk])) for pk in ids]
+
+
+@scenario('post-comment-list-deep', '热门帖子中间楼层')
+def post_comments_deep(ctx):
+    calls = []
+    for post in Post.objects.order_by('-comment_count')[:5]:
+        cursor = encode_cursor([max(post.comment_count // 2, 1)])
+        calls.append(ctx.get('%s?cursor=%s' % (reverse('post-comment-list', args=[post.pk]), cursor)))
+    return calls
+
+
+@scenario('floor-reply-list', '热门楼层的楼中楼回复树')
+def floor_replies(ctx):
+    ids = list(Comment.objects.filter(depth=0).order_by('-reply_count')
+               .values_list('pk', flat=True)[:SAMPLE_SIZE])
+    return [ctx.get(reverse('floor-reply-list', args=[pk])) for pk in ids]
+
+
+@scenario('message-inbox', '私信收件箱')
+def message_inbox(ctx):
+    users = set()
+    for user1, user2 in Conversation.objects.order_by('-message_count').values_list('user1', 'user2')[:SAMPLE_SIZE]:
+        users.update((user1, user2))
+    return [ctx.get(reverse('message-inbox'), user_id) for user_id in sorted(users)[:SAMPLE_SIZE]]
+
+
+@scenario('notification-list', '通知列表')
+def notifications(ctx):
+    users = list(UserNotification.objects.order_by().values_list('user', flat=True).distinct()[:SAMPLE_SIZE])
+    users = users or ctx.sample(User.objects.all(), '-follower_count')
+    return [ctx.get(reverse('notification-list'), user_id) for user_id in users]
+
+
+@scenario('follower-list', '粉丝列表（含大V）')
+def followers(ctx):
+    ids = ctx.sample(User.objects.all(), '-follower_count')
+    return [ctx.get(reverse('follower-list', args=[pk])) for pk in ids]
+
+
+@scenario('following-list', '关注列表')
+def following(ctx):
+    ids = ctx.sample(User.objects.all(), '-following_count')
+    return [ctx.get(reverse('following-list', args=[pk])) for pk in ids]
+
+
+@scenario('timeline', '首页动态')
+def timeline(ctx):
+    ids = ctx.sample(User.objects.filter(following_count__gt=0), '-following_count')
+    return [ctx.get(reverse('timeline'), user_id) for user_id in ids]
+
+
+@scenario('search', '全文搜索（需先执行 rebuild_search_index）')
+def search(ctx):
+    return [ctx.get('%s?q=%s' % (reverse('search'), word)) for word in SEARCH_WORDS]
+
+
+@scenario('search-like-baseline', '对照组：LIKE 模糊查询帖子和评论')
+def search_like(ctx):
+    def like(word):
+        def run():
+            condition = Q()
+            for token, _ in query_terms(word):
+                condition &= Q(title__contains=token) | Q(content__contains=token)
+            posts = list(Post.objects.filter(condition).order_by('-id')[:20])
+            comments = list(Comment.objects.filter(content__contains=word).order_by('-id')[:20])
+            return posts + comments
+        return run
+    return [like(word) for word in SEARCH_WORDS]
+
+
+def mention_comments(ctx):
+    """一批含大量 @ 的评论：热门用户反复出现，混入不存在的用户名"""
+    names = list(User.objects.order_by('-follower_count').values_list('username', flat=True)[:SAMPLE_SIZE * 5])
+    if not names:
+        return []
+    comments = []
+    for comment in Comment.objects.order_by('-id').values('id', 'author_id')[:SAMPLE_SIZE]:
+        picked = [ctx.rng.choice(names) for _ in range(MENTIONS_PER_COMMENT * 3 // 4)]
+        picked += ['ghost_%d' % ctx.rng.randrange(10000) for _ in range(MENTIONS_PER_COMMENT // 4)]
+        ctx.rng.shuffle(picked)
+        comments.append(dict(comment, content='楼主说得对 ' + ' '.join('@%s 你看看' % name for name in picked)))
+    return comments
+
+
+def record_mentions(batch, cold):
+    def run():
+        if cold:
+            mentions.clear_cache()
+        # 写入后回滚，不改动数据
+        with transaction.atomic():
+            # 和对照组处理同样多的 @（默认上限 MENTIONS['MAX_PER_COMMENT'] 只有 10 个）
+            mentions.record(batch, limit=MENTIONS_PER_COMMENT)
+            transaction.set_rollback(True)
+    return run
+
+
+@scenario('comment-mentions', '含大量@的评论：一次扫描 + 用户名缓存 + 批量写入提及')
+def comment_mentions(ctx):
+    comments = mention_comments(ctx)
+    return [record_mentions([comment], cold=False) for comment in comments]
+
+
+@scenario('comment-mentions-cold', '含大量@的评论（每次清空用户名缓存，一条 username__in）')
+def comment_mentions_cold(ctx):
+    comments = mention_comments(ctx)
+    return [record_mentions([comment], cold=True) for comment in comments]
+
+
+@scenario('comment-mentions-naive-baseline', '对照组：逐个@查询用户、逐行插入提及')
+def comment_mentions_naive(ctx):
+    def naive(comment):
+        def run():
+            with transaction.atomic():
+                for name in re.findall(r'@(\S+)', comment['content']):
+                    user = User.objects.filter(username=name).first()
+                    if user is not None and user.pk != comment['author_id']:
+                        CommentMention.objects.get_or_create(comment_id=comment['id'], mentioned_user=user)
+                transaction.set_rollback(True)
+        return run
+    return [naive(comment) for comment in mention_comments(ctx)]
+
+
+class Command(BaseCommand):
+    help = '对主要读接口做基准测试，输出 p50/p95/p99、SQL条数、内存峰值，并与基线比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=benchmark._config('ITERATIONS', 200))
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', help='只运行这些场景（逗号分隔）')
+        parser.add_argument('--list', action='store_true', help='列出所有场景')
+        parser.add_argument('--baseline', default=str(benchmark._config('BASELINE', settings.BASE_DIR / 'bench_baseline.json')))
+        parser.add_argument('--save-baseline', action='store_true', help='把本次结果写入基线文件')
+        parser.add_argument('--threshold', type=float, help='p95 允许变慢的比例，默认 0.2')
+        parser.add_argument('--seed', type=int, default=2023)
+
+    def handle(self, *args, **options):
+        scenarios = benchmark.registered()
+        if options['list']:
+            for item in scenarios:
+                self.stdout.write('%-26s %s' % (item.name, item.description))
+            return
+        if options['only']:
+            wanted = set(options['only'].split(','))
+            unknown = wanted - {item.name for item in scenarios}
+            if unknown:
+                raise CommandError('未知场景: %s' % ', '.join(sorted(unknown)))
+            scenarios = [item for item in scenarios if item.name in wanted]
+
+        # 关闭 DEBUG 避免 connection.queries 的额外开销，并允许测试客户端的 testserver 主机名
+        setup_test_environment(debug=False)
+        try:
+            results = self.run(scenarios, options)
+        finally:
+            teardown_test_environment()
+
+        meta = {'posts': Post.objects.count(), 'comments': Comment.objects.count(),
+                'users': User.objects.count(), 'follows': FollowRelation.objects.count(),
+                'iterations': options['iterations']}
+        if options['save_baseline']:
+            benchmark.save_baseline(options['baseline'], results, meta)
+            self.stdout.write(self.style.SUCCESS('基线已保存到 %s' % options['baseline']))
+            return
+
+        baseline = benchmark.load_baseline(options['baseline'])
+        if baseline is None:
+            self.stdout.write(self.style.WARNING('没有找到基线 %s，使用 --save-baseline 生成' % options['baseline']))
+        regressions = benchmark.compare(results, baseline, threshold=options['threshold'])
+        if regressions:
+            raise CommandError('性能回退：\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('没有发现性能回退'))
+
+    def run(self, scenarios, options):
+        ctx = Context(random.Random(options['seed']))
+        self.stdout.write('%-26s %8s %8s %8s %7s %7s %9s' % (
+            '场景', 'p50(ms)', 'p95(ms)', 'p99(ms)', 'SQL', 'SQL峰值', '内存(KB)'))
+        results = {}
+        for item in scenarios:
+            calls = item.build(ctx)
+            stats = benchmark.run_scenario(calls, options['iterations'], warmup=options['warmup'])
+            if stats is None:
+                self.stdout.write('%-26s 没有样本数据，跳过' % item.name)
+                continue
+            results[item.name] = stats
+            self.stdout.write('%-26s %8.2f %8.2f %8.2f %7.1f %7d %9.1f' % (
+                item.name, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                stats['mean_queries'], stats['max_queries'], stats['peak_kb']))
+        return results
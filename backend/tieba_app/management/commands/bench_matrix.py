@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tieba_project import benchmark
+
+
+class Command(BaseCommand):
+    help = ('在多种数据库配置下运行 bench_endpoints 并对比结果'
+            '（组合见 BENCHMARK["MATRIX"]，每个组合在独立子进程中按环境变量加载配置）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--targets', help='只运行这些组合（逗号分隔）')
+        parser.add_argument('--scale', default='small', help='SQLite 临时库的数据规模（seed_data --scale）')
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--only', help='只运行这些场景（逗号分隔）')
+        parser.add_argument('--seed-server', action='store_true',
+                            help='也给 MySQL/PostgreSQL 组合建表并生成数据（会写入目标库）')
+        parser.add_argument('--keep', action='store_true', help='保留临时目录（数据库文件和结果）')
+
+    def handle(self, *args, **options):
+        matrix = benchmark._config('MATRIX', {})
+        names = options['targets'].split(',') if options['targets'] else list(matrix)
+        unknown = set(names) - set(matrix)
+        if unknown:
+            raise CommandError('未知组合: %s' % ', '.join(sorted(unknown)))
+
+        workdir = tempfile.mkdtemp(prefix='bench-matrix-')
+        try:
+            results = {}
+            for name in names:
+                self.stdout.write(self.style.MIGRATE_HEADING('== %s' % name))
+                results[name] = self.run_target(name, matrix[name], workdir, options)
+            self.report(names, results)
+        finally:
+            # 中途失败也清理临时目录；--keep 时保留以便排查
+            if options['keep']:
+                self.stdout.write('结果保存在 %s' % workdir)
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def run_target(self, name, target, workdir, options):
+        env = dict(os.environ, **target)
+        engine = env.get('DATABASE_ENGINE', 'sqlite')
+        fresh = engine.startswith('sqlite') and not target.get('DATABASE_NAME')
+        if fresh:
+            env['DATABASE_NAME'] = os.path.join(workdir, '%s.sqlite3' % name)
+        if fresh or options['seed_server']:
+            # 各应用没有迁移文件，按模型直接建表
+            self.manage(env, 'migrate', '--run-syncdb', '-v0')
+            self.manage(env, 'seed_data', '--scale', options['scale'])
+        output = os.path.join(workdir, '%s.json' % name)
+        bench = ['bench_endpoints', '--iterations', str(options['iterations']),
+                 '--save-baseline', '--baseline', output]
+        if options['only']:
+            bench += ['--only', options['only']]
+        self.manage(env, *bench)
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)['scenarios']
+
+    def manage(self, env, *args):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py')] + list(args)
+        if subprocess.run(command, env=env).returncode:
+            raise CommandError('命令执行失败: %s' % ' '.join(args))
+
+    def report(self, names, results):
+        self.stdout.write('')
+        self.stdout.write('%-26s' % '场景（p95 ms / SQL）' + ''.join('%22s' % name for name in names))
+        scenarios = sorted({scenario for name in names for scenario in results[name]})
+        for scenario in scenarios:
+            cells = []
+            for name in names:
+                stats = results[name].get(scenario)
+                cells.append('%22s' % ('%.2f / %d' % (stats['p95_ms'], stats['max_queries']) if stats else '-'))
+            self.stdout.write('%-26s' % scenario + ''.join(cells))
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tieba_project import pubsub
+from tieba_project.benchmark import percentile
+from tieba_project.websocket import PATH, push_application
+from user_app.models import User
+
+
+def make_token(user_id):
+    # 令牌只校验签名，不需要数据库里真的有这些用户
+    return str(AccessToken.for_user(User(pk=user_id)))
+
+
+class FakeConnection:
+    """在进程内直接驱动 ASGI 应用的 WebSocket 连接"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.inbox = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.latencies = []
+        self.received = 0
+        self.inbox.put_nowait({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': PATH,
+                 'query_string': ('token=%s' % make_token(user_id)).encode()}
+        self.task = asyncio.ensure_future(push_application(scope, self.inbox.get, self.send))
+
+    async def send(self, event):
+        if event['type'] == 'websocket.accept':
+            self.accepted.set()
+        elif event['type'] == 'websocket.send':
+            self.received += 1
+            sent_at = json.loads(event['text']).get('sent_at')
+            if sent_at:
+                self.latencies.append((time.perf_counter() - sent_at) * 1000)
+
+    def close(self):
+        self.inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+
+
+class Command(BaseCommand):
+    help = '推送通道压测：建立大量空闲 WebSocket 连接，测量内存占用和推送延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--messages', type=int, default=1000, help='定向推送条数')
+        parser.add_argument('--broadcasts', type=int, default=3, help='全站广播次数')
+        parser.add_argument('--url', help='压测已部署的服务，例如 ws://127.0.0.1:8000/ws/push/（需要 websockets 包）')
+        parser.add_argument('--hold', type=float, default=30.0, help='--url 模式下保持空闲连接的秒数')
+        parser.add_argument('--seed', type=int, default=2023)
+
+    def handle(self, *args, **options):
+        if options['url']:
+            asyncio.run(self.remote(options))
+        else:
+            asyncio.run(self.in_process(options))
+
+    async def in_process(self, options):
+        rng = random.Random(options['seed'])
+        n = options['connections']
+        hub = pubsub.get_pubsub()
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        connections = [FakeConnection(user_id) for user_id in range(1, n + 1)]
+        await asyncio.gather(*(c.accepted.wait() for c in connections))
+        connect_time = time.perf_counter() - started
+        await asyncio.sleep(0)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / n
+        tracemalloc.stop()
+        self.stdout.write('建立 %d 个连接用时 %.2f 秒，每个连接约 %.1f KB，Hub 中连接数 %d' % (
+            n, connect_time, per_connection / 1024, hub.connection_count()))
+
+        for _ in range(options['messages']):
+            user_id = rng.randint(1, n)
+            pubsub.publish_to_user(user_id, {'type': 'loadtest', 'sent_at': time.perf_counter()})
+            await asyncio.sleep(0)
+        await self.drain(connections, options['messages'])
+        targeted = [ms for c in connections for ms in c.latencies]
+        self.report('定向推送', targeted)
+
+        for c in connections:
+            c.latencies.clear()
+        for _ in range(options['broadcasts']):
+            started = time.perf_counter()
+            expected = sum(c.received for c in connections) + n
+            pubsub.publish(pubsub.BROADCAST, {'type': 'loadtest', 'sent_at': started})
+            await self.drain(connections, expected, total=True)
+            self.stdout.write('广播送达全部 %d 个连接用时 %.1f ms' % (n, (time.perf_counter() - started) * 1000))
+        self.report('广播', [ms for c in connections for ms in c.latencies])
+
+        for c in connections:
+            c.close()
+        await asyncio.gather(*(c.task for c in connections))
+        if hub.connection_count():
+            raise CommandError('断开后仍有 %d 个订阅未清理' % hub.connection_count())
+        self.stdout.write(self.style.SUCCESS('全部连接已断开，订阅已清理'))
+
+    async def drain(self, connections, expected, total=False, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            received = sum(c.received for c in connections) if total else \
+                sum(len(c.latencies) for c in connections)
+            if received >= expected:
+                return
+            await asyncio.sleep(0.01)
+        raise CommandError('推送超时：%d 秒内未全部送达' % timeout)
+
+    def report(self, label, latencies):
+        self.stdout.write('%s %d 条：p50 %.2f ms，p95 %.2f ms，p99 %.2f ms' % (
+            label, len(latencies), percentile(latencies, 50), percentile(latencies, 95),
+            percentile(latencies, 99)))
+
+    async def remote(self, options):
+        try:
+            import websockets
+        except ImportError:
+            raise CommandError('--url 模式需要安装 websockets 包')
+        n = options['connections']
+        failures = 0
+
+        async def connect(user_id):
+            return await websockets.connect('%s?token=%s' % (options['url'], make_token(user_id)))
+
+        started = time.perf_counter()
+        sockets = []
+        for result in await asyncio.gather(*(connect(i) for i in range(1, n + 1)), return_exceptions=True):
+            if isinstance(result, Exception):
+                failures += 1
+            else:
+                sockets.append(result)
+        self.stdout.write('建立 %d 个连接（失败 %d）用时 %.2f 秒' % (
+            len(sockets), failures, time.perf_counter() - started))
+        await asyncio.sleep(options['hold'])
+
+        async def ping(socket):
+            sent = time.perf_counter()
+            await socket.send('ping')
+            while await socket.recv() != 'pong':
+                pass
+            return (time.perf_counter() - sent) * 1000
+
+        self.report('空闲 %.0f 秒后 ping' % options['hold'],
+                    await asyncio.gather(*(ping(s) for s in sockets)))
+        await asyncio.gather(*(s.close() for s in sockets))
@@ -0,0 +1,455 @@
+import heapq
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from comment_app.models import Comment, CommentFloorCounter, CommentLike
+from message_app.models import Conversation, PrivateMessage
+from post_app.models import Post, PostHotScore, PostLike, TimelineEntry
+from post_app import hot_ranking, timeline
+from search_app import indexer
+from tieba_app.models import Tieba, TiebaCategory, TiebaMember
+from user_app.models import FollowRelation, UserNotification
+
+User = get_user_model()
+
+SCALES = {
+    'small': dict(users=1000, tiebas=50, posts=10000, comments=100000,
+                  likes=100000, follows=20000, messages=10000),
+    'medium': dict(users=20000, tiebas=500, posts=200000, comments=2000000,
+                   likes=2000000, follows=400000, messages=200000),
+    'large': dict(users=200000, tiebas=5000, posts=1000000, comments=10000000,
+                  likes=10000000, follows=4000000, messages=1000000),
+}
+
+CATEGORIES = ['游戏', '动漫', '体育', '数码', '影视', '音乐', '高校', '地区', '生活', '文学']
+
+WORDS = ('今天 明天 大家 觉得 这个 那个 游戏 比赛 学校 毕业 设计 电影 音乐 手机 电脑 '
+         '贴吧 楼主 沙发 前排 围观 求助 分享 经验 攻略 新人 报道 水贴 讨论 推荐 评测').split()
+
+SQLITE_LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = MEMORY',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -262144',
+]
+SQLITE_RESTORE_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+]
+
+
+@contextmanager
+def mute_signals(*signals):
+    """加载期间临时摘掉信号接收者（计数器、热度、首页动态、搜索索引等都在加载完成后统一重建）"""
+    saved = [(s, s.receivers, s.sender_receivers_cache.copy()) for s in signals]
+    for signal in signals:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers, cache in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+            signal.sender_receivers_cache.update(cache)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """关闭 auto_now / auto_now_add，让生成的时间分布写入数据库"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = '生成大规模测试数据（用户、贴吧、成员、帖子、评论、点赞、关注、私信），热点分布偏斜'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='预设规模')
+        for name in SCALES['small']:
+            parser.add_argument('--%s' % name, type=int, help='覆盖预设中的 %s 数量' % name)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skew', type=float, default=3.0,
+                            help='热点偏斜程度，越大越集中在少数热门贴吧/帖子')
+        parser.add_argument('--days', type=int, default=90, help='数据的时间跨度（天）')
+        parser.add_argument('--seed', type=int, default=2023, help='随机数种子')
+        parser.add_argument('--no-pragmas', action='store_true', help='不修改SQLite的PRAGMA')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.counts = dict(SCALES[options['scale']])
+        for name in self.counts:
+            if options.get(name) is not None:
+                self.counts[name] = options[name]
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+
+        use_pragmas = connection.vendor == 'sqlite' and not options['no_pragmas']
+        if use_pragmas:
+            self._pragmas(SQLITE_LOAD_PRAGMAS)
+        started = time.monotonic()
+        try:
+            with mute_signals(pre_save, post_save, pre_delete, post_delete), \
+                    explicit_timestamps(Post, Comment, PrivateMessage, Conversation, FollowRelation,
+                                        TiebaMember, PostLike, CommentLike, Tieba, UserNotification):
+                self.seed_users()
+                self.seed_tiebas()
+                self.seed_members()
+                self.seed_posts()
+                self.seed_comments()
+                self.seed_likes()
+                self.seed_follows()
+                self.seed_messages()
+                self.recount()
+                self.seed_notifications()
+                self.seed_hot_scores()
+                self.seed_timelines()
+                self.rebuild_search_index()
+        finally:
+            if use_pragmas:
+                # 恢复数据库配置里的 PRAGMA（见 tieba_project/db_backends/sqlite3）
+                if hasattr(connection, 'apply_pragmas'):
+                    connection.apply_pragmas()
+                else:
+                    self._pragmas(SQLITE_RESTORE_PRAGMAS)
+        self.stdout.write(self.style.SUCCESS('数据生成完成，用时 %.1f 秒' % (time.monotonic() - started)))
+
+    # ------------------------------------------------------------------
+    # 工具方法
+
+    def _pragmas(self, statements):
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def skewed(self, n):
+        """0..n-1 之间偏向小下标的随机数（幂律），下标小的即"热门" """
+        return min(n - 1, int(n * self.rng.random() ** self.options['skew']))
+
+    def random_time(self, after=None):
+        after = after or self.start
+        span = (self.now - after).total_seconds()
+        return after + timedelta(seconds=self.rng.random() * max(span, 1))
+
+    def text(self, words):
+        return ''.join(self.rng.choice(WORDS) for _ in range(words))
+
+    def bulk(self, model, objects, **kwargs):
+        """分批 bulk_create，返回创建的对象（SQLite/PostgreSQL 会回填主键）"""
+        created = []
+        for i in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(objects[i:i + self.batch_size], **kwargs)
+        return created
+
+    def stream(self, model, total, factory, **kwargs):
+        """边生成边写入，避免千万级对象同时留在内存中"""
+        done = 0
+        while done < total:
+            size = min(self.batch_size, total - done)
+            with transaction.atomic():
+                model.objects.bulk_create([factory() for _ in range(size)], **kwargs)
+            done += size
+            self.progress(model, done, total)
+
+    def progress(self, model, done, total):
+        if done == total or done % (self.batch_size * 20) == 0:
+            self.stdout.write('%s: %d / %d' % (model._meta.verbose_name, done, total))
+
+    # ------------------------------------------------------------------
+    # 各类数据
+
+    def seed_users(self):
+        password = make_password('password123')
+        offset = User.objects.aggregate(m=Max('id'))['m'] or 0
+        users = [User(username='seed_user_%d' % (offset + i), password=password,
+                      nickname='用户%d' % (offset + i), date_joined=self.random_time())
+                 for i in range(self.counts['users'])]
+        self.user_ids = [u.pk for u in self.bulk(User, users)]
+        self.progress(User, len(self.user_ids), self.counts['users'])
+
+    def seed_tiebas(self):
+        categories = [TiebaCategory.objects.get_or_create(name=name, defaults={'sort_order': i})[0]
+                      for i, name in enumerate(CATEGORIES)]
+        offset = Tieba.objects.aggregate(m=Max('id'))['m'] or 0
+        tiebas = [Tieba(name='测试吧%d' % (offset + i), description=self.text(8),
+                        owner_id=self.rng.choice(self.user_ids),
+                        category=self.rng.choice(categories),
+                        created_at=self.start, updated_at=self.start)
+                  for i in range(self.counts['tiebas'])]
+        self.tieba_ids = [t.pk for t in self.bulk(Tieba, tiebas)]
+
+    def seed_members(self):
+        # 每个用户加入几个贴吧，热门吧成员多
+        seen = set()
+        members = []
+        for user_id in self.user_ids:
+            for _ in range(1 + self.skewed(10)):
+                tieba_id = self.tieba_ids[self.skewed(len(self.tieba_ids))]
+                if (tieba_id, user_id) not in seen:
+                    seen.add((tieba_id, user_id))
+                    members.append(TiebaMember(tieba_id=tieba_id, user_id=user_id,
+                                               join_date=self.random_time()))
+        self.bulk(TiebaMember, members)
+        self.progress(TiebaMember, len(members), len(members))
+
+    def seed_posts(self):
+        self.post_ids, self.post_times = [], []
+        total = self.counts['posts']
+        while len(self.post_ids) < total:
+            size = min(self.batch_size, total - len(self.post_ids))
+            batch = []
+            for _ in range(size):
+                created = self.random_time()
+                batch.append(Post(
+                    title=self.text(4), content=self.text(30),
+                    author_id=self.user_ids[self.skewed(len(self.user_ids))],
+                    tieba_id=self.tieba_ids[self.skewed(len(self.tieba_ids))],
+                    created_at=created, updated_at=created, last_reply_at=created,
+                ))
+            with transaction.atomic():
+                created = Post.objects.bulk_create(batch)
+            self.post_ids += [p.pk for p in created]
+            self.post_times += [p.created_at for p in created]
+            self.progress(Post, len(self.post_ids), total)
+
+    def seed_comments(self):
+        """评论集中在热门帖子上；约五分之一是楼中楼回复（最多两层）"""
+        floors = {}
+        last_root = {}
+        last_reply = {}
+        total = self.counts['comments']
+        done = 0
+        while done < total:
+            size = min(self.batch_size, total - done)
+            batch = []
+            for _ in range(size):
+                index = self.skewed(len(self.post_ids))
+                post_id = self.post_ids[index]
+                created = self.random_time(self.post_times[index])
+                comment = Comment(
+                    content=self.text(12), post_id=post_id,
+                    author_id=self.rng.choice(self.user_ids),
+                    created_at=created, updated_at=created,
+                )
+                root_id = last_root.get(post_id)
+                if root_id and self.rng.random() < 0.2:
+                    reply_id = last_reply.get(root_id)
+                    if reply_id and self.rng.random() < 0.3:
+                        comment.parent_id, comment.depth, comment.path = reply_id, 2, '%d/%d/' % (root_id, reply_id)
+                    else:
+                        comment.parent_id, comment.depth, comment.path = root_id, 1, '%d/' % root_id
+                    comment.root_id = root_id
+                else:
+                    # 只有顶层评论占楼层
+                    floors[post_id] = floors.get(post_id, 1) + 1
+                    comment.floor_number = floors[post_id]
+                batch.append(comment)
+            with transaction.atomic():
+                created = Comment.objects.bulk_create(batch)
+            for comment in created:
+                if comment.depth == 0:
+                    last_root[comment.post_id] = comment.pk
+                elif comment.depth == 1:
+                    last_reply[comment.root_id] = comment.pk
+            done += size
+            self.progress(Comment, done, total)
+        self.bulk(CommentFloorCounter,
+                  [CommentFloorCounter(post_id=pk, last_floor=n) for pk, n in floors.items()],
+                  ignore_conflicts=True)
+
+    def seed_likes(self):
+        self.stream(PostLike, self.counts['likes'], lambda: PostLike(
+            post_id=self.post_ids[self.skewed(len(self.post_ids))],
+            user_id=self.rng.choice(self.user_ids),
+            created_at=self.random_time(),
+        ), ignore_conflicts=True)
+
+    def seed_follows(self):
+        # 少数大V拥有大量粉丝
+        def follow():
+            follower = self.rng.choice(self.user_ids)
+            following = self.user_ids[self.skewed(len(self.user_ids))]
+            if follower == following:
+                following = self.rng.choice(self.user_ids)
+            return FollowRelation(follower_id=follower, following_id=following,
+                                  created_at=self.random_time())
+        self.stream(FollowRelation, self.counts['follows'], follow, ignore_conflicts=True)
+        FollowRelation.objects.filter(follower_id=F('following_id')).delete()
+
+    def seed_messages(self):
+        total = self.counts['messages']
+        # 会话数约为消息数的十分之一，每个会话若干条消息
+        pairs = []
+        for _ in range(max(total // 10, 1)):
+            a, b = self.rng.sample(self.user_ids, 2)
+            pairs.append((min(a, b), max(a, b)))
+        pairs = list(dict.fromkeys(pairs))
+        stats = {}
+        done = 0
+        while done < total:
+            size = min(self.batch_size, total - done)
+            batch = []
+            for _ in range(size):
+                user1, user2 = pairs[self.skewed(len(pairs))]
+                sender, receiver = (user1, user2) if self.rng.random() < 0.5 else (user2, user1)
+                batch.append(PrivateMessage(sender_id=sender, receiver_id=receiver,
+                                            content=self.text(6), is_read=self.rng.random() < 0.7,
+                                            created_at=self.random_time()))
+            with transaction.atomic():
+                created = PrivateMessage.objects.bulk_create(batch)
+            for message in created:
+                pair = (min(message.sender_id, message.receiver_id), max(message.sender_id, message.receiver_id))
+                s = stats.setdefault(pair, [0, 0, 0, None])
+                s[0] += 1
+                if not message.is_read:
+                    s[1 if message.receiver_id == pair[0] else 2] += 1
+                if s[3] is None or message.created_at > s[3].created_at:
+                    s[3] = message
+            done += size
+            self.progress(PrivateMessage, done, total)
+
+        self.bulk(Conversation, [
+            Conversation(user1_id=pair[0], user2_id=pair[1], message_count=n,
+                         unread_count_user1=u1, unread_count_user2=u2,
+                         last_message_id=last.pk, created_at=self.start, updated_at=last.created_at)
+            for pair, (n, u1, u2, last) in stats.items()
+        ], ignore_conflicts=True)
+
+    def recount(self):
+        """按明细表重算所有统计字段，保证与数据一致"""
+        self.stdout.write('重算统计字段...')
+
+        def count_of(model, field, **extra):
+            return Coalesce(Subquery(
+                model.objects.filter(**{field: OuterRef('pk')}, **extra)
+                .order_by().values(field).annotate(n=Count('*')).values('n')[:1]
+            ), Value(0))
+
+        latest_reply = Subquery(Comment.objects.filter(post_id=OuterRef('pk'))
+                                .order_by().values('post_id').annotate(m=Max('created_at')).values('m')[:1])
+        with transaction.atomic():
+            Post.objects.update(
+                comment_count=count_of(Comment, 'post_id'),
+                like_count=count_of(PostLike, 'post_id'),
+                last_reply_at=Coalesce(latest_reply, F('created_at')),
+            )
+            # 生成的回复最多两层：顶层评论的子树按 root 计数，第一层按 parent 计数
+            Comment.objects.filter(depth=0).update(reply_count=count_of(Comment, 'root_id'))
+            Comment.objects.filter(depth=1).update(reply_count=count_of(Comment, 'parent_id'))
+            Tieba.objects.update(
+                member_count=count_of(TiebaMember, 'tieba_id'),
+                post_count=count_of(Post, 'tieba_id'),
+            )
+            User.objects.update(
+                post_count=count_of(Post, 'author_id'),
+                comment_count=count_of(Comment, 'author_id'),
+                follower_count=count_of(FollowRelation, 'following_id'),
+                following_count=count_of(FollowRelation, 'follower_id'),
+            )
+
+    def seed_notifications(self):
+        """每个被点赞/评论过的帖子给作者一条已聚合的通知，然后重算未读数"""
+        rows = []
+        posts = (Post.objects.filter(like_count__gt=0) | Post.objects.filter(comment_count__gt=0))
+        for post in posts.only('author_id', 'like_count', 'comment_count', 'last_reply_at').iterator(
+                chunk_size=self.batch_size):
+            for kind, count, title in (('post_like', post.like_count, '你的帖子收到了新的赞'),
+                                       ('post_comment', post.comment_count, '你的帖子有新回复')):
+                if count:
+                    rows.append(UserNotification(
+                        user_id=post.author_id, notification_type=kind, target_key='post:%d' % post.pk,
+                        title=title, content='', actor_count=count,
+                        sample_actors=self.rng.sample(self.user_ids, min(3, len(self.user_ids))),
+                        is_read=self.rng.random() < 0.6,
+                        created_at=post.last_reply_at, updated_at=post.last_reply_at,
+                    ))
+        self.bulk(UserNotification, rows)
+        User.objects.update(unread_notification_count=Coalesce(Subquery(
+            UserNotification.objects.filter(user_id=OuterRef('pk'), is_read=False)
+            .order_by().values('user_id').annotate(n=Count('*')).values('n')[:1]
+        ), Value(0)))
+
+    def seed_hot_scores(self):
+        cutoff = self.now - timedelta(days=hot_ranking._config('WINDOW_DAYS', 7))
+        rows = []
+        for post in (Post.objects.filter(created_at__gte=cutoff)
+                     .only('tieba_id', 'created_at', 'like_count', 'comment_count', 'view_count')
+                     .iterator(chunk_size=self.batch_size)):
+            engagement = hot_ranking.engagement_of(post.like_count, post.comment_count, post.view_count)
+            rows.append(PostHotScore(post_id=post.pk, tieba_id=post.tieba_id, engagement=engagement,
+                                     score=hot_ranking.hot_score(engagement, post.created_at),
+                                     post_created_at=post.created_at))
+        self.bulk(PostHotScore, rows, ignore_conflicts=True)
+
+    def seed_timelines(self):
+        """按发帖推送的规则一次构建所有收件箱，每人只保留最近 INBOX_SIZE 条"""
+        size = timeline._config('INBOX_SIZE', 800)
+        authors = set(User.objects.filter(follower_count__lte=timeline._config('FANOUT_FOLLOWER_LIMIT', 5000))
+                      .values_list('id', flat=True))
+        tiebas = set(Tieba.objects.filter(member_count__lte=timeline._config('FANOUT_MEMBER_LIMIT', 10000))
+                     .values_list('id', flat=True))
+        # 每个作者、每个吧最新的 size 个帖子（按ID倒序），大V和大吧读时拉取，不推送
+        by_author, by_tieba = defaultdict(list), defaultdict(list)
+        for pk, author_id, tieba_id in (Post.objects.filter(status=1).order_by('-id')
+                                        .values_list('id', 'author_id', 'tieba_id')
+                                        .iterator(chunk_size=self.batch_size)):
+            if author_id in authors and len(by_author[author_id]) < size:
+                by_author[author_id].append((pk, author_id))
+            if tieba_id in tiebas and len(by_tieba[tieba_id]) < size:
+                by_tieba[tieba_id].append((pk, author_id))
+
+        sources = defaultdict(list)
+        for follower_id, following_id in (FollowRelation.objects.values_list('follower_id', 'following_id')
+                                          .iterator(chunk_size=self.batch_size)):
+            if following_id in by_author:
+                sources[follower_id].append(by_author[following_id])
+        for user_id, tieba_id in (TiebaMember.objects.filter(is_active=True).values_list('user_id', 'tieba_id')
+                                  .iterator(chunk_size=self.batch_size)):
+            if tieba_id in by_tieba:
+                sources[user_id].append(by_tieba[tieba_id])
+
+        batch, total = [], 0
+        for user_id, lists in sources.items():
+            last, n = None, 0
+            for pk, author_id in heapq.merge(*lists, reverse=True):
+                if pk == last or author_id == user_id:
+                    continue
+                last, n = pk, n + 1
+                batch.append(TimelineEntry(owner_id=user_id, post_id=pk))
+                if n == size:
+                    break
+            if len(batch) >= self.batch_size:
+                self.bulk(TimelineEntry, batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        self.bulk(TimelineEntry, batch, ignore_conflicts=True)
+        total += len(batch)
+        self.progress(TimelineEntry, total, total)
+
+    def rebuild_search_index(self):
+        self.stdout.write('重建搜索索引...')
+        indexer.rebuild(batch_size=self.batch_size, stdout=self.stdout)
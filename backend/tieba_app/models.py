@@ -61,7 +61,8 @@ class Tieba(models.Model):
         verbose_name_plural = '贴吧'
         indexes = [
             models.Index(fields=['name']),
-            models.Index(fields=['category']),
+            # 分类贴吧列表按成员数排序，索引同时覆盖按分类过滤
+            models.Index(fields=['category', 'status', 'member_count', 'id']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
         ]
@@ -0,0 +1,13 @@
+from tieba_project.pagination import KeysetPagination
+
+
+class TiebaCursorPagination(KeysetPagination):
+    """
+    分类下的贴吧列表，按成员数倒序，配合 (category, status, member_count, id) 索引
+
+    member_count 会变：游标记的是上一页末尾的 (成员数, ID) 值而不是那一行，
+    翻页期间成员数变化的贴吧可能在后面的页里重复出现或被跳过。这是有意接受的：
+    列表本来就是按实时热度排的，每页内部顺序正确，翻页也一定会结束（游标值
+    严格递减）。不要用这个接口做需要完整、不重复遍历的批处理。
+    """
+    ordering = ('-member_count', '-id')
@@ -0,0 +1,210 @@
+"""
+贴吧权限解析
+
+一个用户在所有贴吧的身份（成员角色、吧务权限及任期、是否创建者）用一条
+UNION 查询整体读出，存为 {贴吧ID: TiebaAccess}，放进两级缓存（见
+tieba_project/cache.py），同一请求内只解析一次（挂在 request 上）。
+之后任意贴吧的权限判断、列表页批量判断都不再查库。
+
+- 成员角色：小吧主（2）可以管理帖子和评论，大吧主（3）、创始人（4）拥有全部权限
+- TiebaAdmin：按 can_manage_* 授予对应权限，expires_at 到期后失效；
+  到期时间随数据一起缓存，每次判断时和当前时间比较，不依赖缓存过期
+- 贴吧创建者（Tieba.owner）拥有全部权限
+
+TiebaMember / TiebaAdmin / Tieba 保存或删除时通过信号在事务提交后让该用户的
+缓存失效（见 signals.py）；用 QuerySet.update() 批量修改后需手动调用 invalidate_user()。
+其他进程最多延迟 READ_CACHE['LOCAL_TTL'] 秒看到失效。
+"""
+
+from collections import namedtuple
+
+from django.db.models import BooleanField, DateTimeField, IntegerField, Value
+from django.utils import timezone
+from rest_framework import permissions
+
+from tieba_project.cache import VersionedCache
+
+from .models import Tieba, TiebaAdmin, TiebaMember
+
+POSTS, COMMENTS, MEMBERS, SETTINGS = 'posts', 'comments', 'members', 'settings'
+ALL_PERMISSIONS = frozenset([POSTS, COMMENTS, MEMBERS, SETTINGS])
+MODERATE = frozenset([POSTS, COMMENTS])
+
+ROLE_NONE, ROLE_MEMBER, ROLE_MODERATOR, ROLE_OWNER_ADMIN, ROLE_FOUNDER = 0, 1, 2, 3, 4
+
+ROLE_PERMISSIONS = {
+    ROLE_MODERATOR: MODERATE,
+    ROLE_OWNER_ADMIN: ALL_PERMISSIONS,
+    ROLE_FOUNDER: ALL_PERMISSIONS,
+}
+
+# UNION 中每行的来源
+_MEMBER, _ADMIN, _OWNER = 1, 2, 3
+
+access_cache = VersionedCache('tieba_access')
+
+
+class TiebaAccess(namedtuple('TiebaAccess', ['role', 'is_owner', 'admin_permissions', 'admin_expires_at'])):
+    """用户在一个贴吧中的身份"""
+
+    def admin_active(self, now=None):
+        if not self.admin_permissions:
+            return False
+        return self.admin_expires_at is None or self.admin_expires_at > (now or timezone.now())
+
+    def permissions(self, now=None):
+        if self.is_owner:
+            return ALL_PERMISSIONS
+        granted = ROLE_PERMISSIONS.get(self.role, frozenset())
+        if self.admin_active(now):
+            granted = granted | self.admin_permissions
+        return granted
+
+
+NO_ACCESS = TiebaAccess(ROLE_NONE, False, frozenset(), None)
+
+
+def _rows(user_id):
+    """一条 UNION 查询取出 (来源, 贴吧ID, 角色, 四项吧务权限, 任期到期)"""
+    false = Value(False, output_field=BooleanField())
+    no_expiry = Value(None, output_field=DateTimeField())
+    members = (TiebaMember.objects.filter(user_id=user_id, is_active=True)
+               .values_list(Value(_MEMBER, output_field=IntegerField()), 'tieba_id', 'role',
+                            false, false, false, false, no_expiry))
+    admins = (TiebaAdmin.objects.filter(user_id=user_id)
+              .values_list(Value(_ADMIN, output_field=IntegerField()), 'tieba_id',
+                           Value(ROLE_NONE, output_field=IntegerField()),
+                           'can_manage_posts', 'can_manage_comments', 'can_manage_members',
+                           'can_manage_settings', 'expires_at'))
+    owned = (Tieba.objects.filter(owner_id=user_id)
+             .values_list(Value(_OWNER, output_field=IntegerField()), 'id',
+                          Value(ROLE_NONE, output_field=IntegerField()),
+                          false, false, false, false, no_expiry))
+    return members.union(admins, owned, all=True)
+
+
+def _access_map(rows):
+    access = {}
+    for source, tieba_id, role, posts, comments, members, settings, expires_at in rows:
+        current = access.get(tieba_id, NO_ACCESS)
+        if source == _MEMBER:
+            current = current._replace(role=role)
+        elif source == _OWNER:
+            current = current._replace(is_owner=True)
+        else:
+            granted = frozenset(name for name, flag in ((POSTS, posts), (COMMENTS, comments),
+                                                         (MEMBERS, members), (SETTINGS, settings)) if flag)
+            current = current._replace(admin_permissions=granted, admin_expires_at=expires_at)
+        access[tieba_id] = current
+    return access
+
+
+def load_access_map(user_id):
+    """从数据库读出用户在所有贴吧的身份 {贴吧ID: TiebaAccess}"""
+    return _access_map(_rows(user_id))
+
+
+async def aload_access_map(user_id):
+    return _access_map([row async for row in _rows(user_id)])
+
+
+def user_group(user_id):
+    return 'u%s' % user_id
+
+
+def get_access_map(user_id):
+    return access_cache.get_or_load(user_group(user_id), 'map', lambda: load_access_map(user_id))
+
+
+async def aget_access_map(user_id):
+    return await access_cache.aget_or_load(user_group(user_id), 'map', lambda: aload_access_map(user_id))
+
+
+def invalidate_user(user_id):
+    access_cache.invalidate(user_group(user_id))
+
+
+class PermissionResolver:
+    """某个用户的权限判断，身份表在第一次使用时加载"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._access = None if user_id else {}
+
+    @property
+    def access(self):
+        if self._access is None:
+            self._access = get_access_map(self.user_id)
+        return self._access
+
+    def get(self, tieba_id):
+        return self.access.get(tieba_id, NO_ACCESS)
+
+    def role(self, tieba_id):
+        return self.get(tieba_id).role
+
+    def is_member(self, tieba_id):
+        return self.get(tieba_id).role >= ROLE_MEMBER
+
+    def is_admin(self, tieba_id):
+        """吧主或在任吧务"""
+        return bool(self.get(tieba_id).permissions())
+
+    def has_permission(self, tieba_id, permission):
+        return permission in self.get(tieba_id).permissions()
+
+    def can_moderate(self, tieba_id):
+        return bool(MODERATE & self.get(tieba_id).permissions())
+
+    def can_moderate_many(self, tieba_ids):
+        """列表页批量判断 {贴吧ID: 是否可以管理帖子或评论}"""
+        now = timezone.now()
+        return {tieba_id: bool(MODERATE & self.get(tieba_id).permissions(now)) for tieba_id in tieba_ids}
+
+    def viewer(self, tieba_id):
+        """贴吧页中当前用户的身份"""
+        return {
+            'role': self.role(tieba_id),
+            'is_admin': self.is_admin(tieba_id),
+            'permissions': sorted(self.get(tieba_id).permissions()),
+        }
+
+    def moderated_tiebas(self):
+        """可以管理的全部贴吧ID"""
+        now = timezone.now()
+        return {tieba_id for tieba_id, access in self.access.items() if MODERATE & access.permissions(now)}
+
+
+async def aresolver(user_id):
+    """异步视图用：身份表异步读出后的 PermissionResolver"""
+    resolver = PermissionResolver(user_id)
+    if user_id:
+        resolver._access = await aget_access_map(user_id)
+    return resolver
+
+
+def resolver_for(request):
+    """当前请求用户的 PermissionResolver（同一请求内复用）"""
+    resolver = getattr(request, '_tieba_permissions', None)
+    if resolver is None:
+        user = getattr(request, 'user', None)
+        resolver = PermissionResolver(user.pk if user is not None and user.is_authenticated else None)
+        request._tieba_permissions = resolver
+    return resolver
+
+
+class HasTiebaPermission(permissions.BasePermission):
+    """
+    DRF 权限类：要求当前用户在贴吧中拥有视图的 tieba_permission 权限
+    贴吧ID取自 URL 参数 tieba_id，或对象的 tieba_id 属性
+    """
+    message = '没有该贴吧的管理权限'
+
+    def has_permission(self, request, view):
+        tieba_id = view.kwargs.get('tieba_id')
+        if tieba_id is None:
+            return request.user.is_authenticated
+        return resolver_for(request).has_permission(tieba_id, getattr(view, 'tieba_permission', POSTS))
+
+    def has_object_permission(self, request, view, obj):
+        return resolver_for(request).has_permission(obj.tieba_id, getattr(view, 'tieba_permission', POSTS))
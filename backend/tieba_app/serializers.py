@@ -0,0 +1,48 @@
+from rest_framework import serializers
+
+from media_app.serializers import AssetImageField, AssetImagesMixin, AssetListSerializer
+
+from .models import Tieba, TiebaAnnouncement, TiebaCategory
+
+
+class TiebaListSerializer(AssetImagesMixin, serializers.ModelSerializer):
+    """贴吧列表序列化器，avatar_image 为头像的各规格（见 media_app）"""
+    avatar_image = AssetImageField(source='avatar')
+
+    class Meta:
+        model = Tieba
+        fields = ['id', 'name', 'description', 'avatar', 'avatar_image', 'category',
+                  'member_count', 'post_count', 'created_at']
+        list_serializer_class = AssetListSerializer
+
+
+class TiebaHeaderSerializer(TiebaListSerializer):
+    """贴吧页头部中的贴吧，多一张横幅"""
+    banner_image = AssetImageField(source='banner')
+
+    class Meta(TiebaListSerializer.Meta):
+        fields = TiebaListSerializer.Meta.fields + ['banner', 'banner_image']
+
+
+class TiebaCategorySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = TiebaCategory
+        fields = ['id', 'name', 'icon']
+
+
+class TiebaAnnouncementSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = TiebaAnnouncement
+        fields = ['id', 'title', 'content', 'announcement_type', 'is_pinned', 'created_at', 'expires_at']
+
+
+def header_data(header):
+    """贴吧头部数据（见 tieba_app.cache.get_tieba_header）的序列化结果"""
+    return {
+        # 头像、横幅的图片数据随头部一起缓存，不再单独查询
+        'tieba': TiebaHeaderSerializer(header['tieba'], context={'image_assets': header['images']}).data,
+        'category': TiebaCategorySerializer(header['category']).data if header['category'] else None,
+        'announcements': TiebaAnnouncementSerializer(header['announcements'], many=True).data,
+    }
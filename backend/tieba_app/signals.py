@@ -0,0 +1,69 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from tieba_project import counters
+
+from . import cache, permissions
+from .models import Tieba, TiebaAdmin, TiebaAnnouncement, TiebaCategory, TiebaMember
+
+
+@receiver(post_save, sender=TiebaMember)
+def member_joined(sender, instance, created, **kwargs):
+    if created:
+        counters.incr(Tieba, instance.tieba_id, 'member_count')
+
+
+@receiver(post_delete, sender=TiebaMember)
+def member_left(sender, instance, **kwargs):
+    counters.decr(Tieba, instance.tieba_id, 'member_count')
+
+
+@receiver([post_save, post_delete], sender=TiebaMember)
+@receiver([post_save, post_delete], sender=TiebaAdmin)
+def access_changed(sender, instance, **kwargs):
+    # 同 tieba_changed：提交后再失效，避免并发请求把旧身份表写回新版本
+    transaction.on_commit(partial(permissions.invalidate_user, instance.user_id))
+
+
+@receiver(pre_save, sender=Tieba)
+def remember_owner(sender, instance, update_fields=None, **kwargs):
+    # 转让贴吧时原创建者的权限也要失效；只保存其他字段（头像、简介等）时不用查
+    instance._previous_owner_id = None
+    if instance.pk and (update_fields is None or {'owner', 'owner_id'} & set(update_fields)):
+        instance._previous_owner_id = (Tieba.objects.filter(pk=instance.pk)
+                                       .values_list('owner_id', flat=True).first())
+
+
+@receiver(post_save, sender=Tieba)
+def tieba_saved(sender, instance, created, **kwargs):
+    # 提交后再失效：提交前失效的话，并发请求可能读到旧行并以新版本号写回缓存
+    transaction.on_commit(partial(cache.invalidate_tieba, instance.pk))
+    # 创建者的身份表只在新建和转让时变化
+    previous = getattr(instance, '_previous_owner_id', None)
+    if created:
+        owners = {instance.owner_id}
+    elif previous is not None and previous != instance.owner_id:
+        owners = {previous, instance.owner_id}
+    else:
+        owners = set()
+    for user_id in owners:
+        transaction.on_commit(partial(permissions.invalidate_user, user_id))
+
+
+@receiver(post_delete, sender=Tieba)
+def tieba_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(cache.invalidate_tieba, instance.pk))
+    transaction.on_commit(partial(permissions.invalidate_user, instance.owner_id))
+
+
+@receiver([post_save, post_delete], sender=TiebaCategory)
+def category_changed(sender, instance, **kwargs):
+    transaction.on_commit(cache.invalidate_categories)
+
+
+@receiver([post_save, post_delete], sender=TiebaAnnouncement)
+def announcement_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(cache.invalidate_tieba, instance.tieba_id))
@@ -0,0 +1,103 @@
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user_app.models import User
+
+from . import cache, permissions
+from .models import Tieba, TiebaAdmin, TiebaAnnouncement
+
+
+class TiebaHeaderCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        cache.tieba_cache.clear_local()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.tieba = Tieba.objects.create(name='tieba', owner=self.owner)
+
+    def test_cached_instances_are_not_shared(self):
+        first = cache.get_tieba(self.tieba.pk)
+        first.name = 'changed by a request'
+        self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'tieba')
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'tieba')
+        with transaction.atomic():
+            Tieba.objects.filter(pk=self.tieba.pk).update(name='renamed')
+            Tieba.objects.get(pk=self.tieba.pk).save()
+            # 提交前其他请求读到的仍是旧版本，不会把旧行写进新版本的缓存
+            self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'tieba')
+        self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'renamed')
+
+    def test_lost_version_does_not_revive_old_entries(self):
+        cache.get_tieba(self.tieba.pk)
+        group = cache.tieba_group(self.tieba.pk)
+        cache.tieba_cache.invalidate(group)
+        Tieba.objects.filter(pk=self.tieba.pk).update(name='renamed')
+        self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'renamed')
+        # 版本号被淘汰后，重新生成的版本号不能回到已有缓存条目的版本
+        caches['default'].delete(cache.tieba_cache._version_key(group))
+        cache.tieba_cache.clear_local()
+        Tieba.objects.filter(pk=self.tieba.pk).update(name='renamed again')
+        self.assertEqual(cache.get_tieba(self.tieba.pk).name, 'renamed again')
+
+    def test_rollback_keeps_cache(self):
+        cache.get_active_announcements(self.tieba.pk)
+        version = cache.tieba_cache.version(cache.tieba_group(self.tieba.pk))
+        try:
+            with transaction.atomic():
+                TiebaAnnouncement.objects.create(tieba=self.tieba, author=self.owner, title='t', content='c')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(cache.tieba_cache.version(cache.tieba_group(self.tieba.pk)), version)
+
+
+class PermissionCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        cache.tieba_cache.clear_local()
+        permissions.access_cache.clear_local()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pass')
+        self.tieba = Tieba.objects.create(name='tieba', owner=self.owner)
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(permissions.get_access_map(self.admin.pk), {})
+        with transaction.atomic():
+            TiebaAdmin.objects.create(tieba=self.tieba, user=self.admin, can_manage_comments=False, can_manage_members=False)
+            # 提交前重建的仍是旧身份表，提交后的失效会把它作废
+            self.assertEqual(permissions.get_access_map(self.admin.pk), {})
+        self.assertEqual(permissions.get_access_map(self.admin.pk)[self.tieba.pk].admin_permissions,
+                         frozenset([permissions.POSTS]))
+
+    def test_owner_map_invalidated_only_on_transfer(self):
+        group = permissions.user_group(self.owner.pk)
+        version = permissions.access_cache.version(group)
+        tieba = Tieba.objects.get(pk=self.tieba.pk)
+        tieba.description = 'edited'
+        with CaptureQueriesContext(connection) as queries:
+            tieba.save(update_fields=['description'])
+        self.assertEqual(len(queries), 1)
+        tieba.save()
+        self.assertEqual(permissions.access_cache.version(group), version)
+
+        tieba.owner = self.admin
+        tieba.save()
+        self.assertEqual(permissions.access_cache.version(group), version + 1)
+        self.assertIn(self.tieba.pk, permissions.get_access_map(self.admin.pk))
+
+    def test_async_detail_has_viewer(self):
+        TiebaAdmin.objects.create(tieba=self.tieba, user=self.admin, can_manage_comments=False, can_manage_members=False)
+        url = reverse('tieba-detail', args=[self.tieba.pk])
+        async_url = reverse('tieba-detail-async', args=[self.tieba.pk])
+        headers = {'HTTP_AUTHORIZATION': 'Bearer %s' % AccessToken.for_user(self.admin)}
+        viewer = self.client.get(url, **headers).json()['viewer']
+        self.assertEqual(viewer['permissions'], ['posts'])
+        self.assertEqual(self.client.get(async_url, **headers).json()['viewer'], viewer)
+        self.assertNotIn('viewer', self.client.get(async_url).json())
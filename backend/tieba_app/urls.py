@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('<int:tieba_id>/', views.TiebaDetailView.as_view(), name='tieba-detail'),
+    path('<int:tieba_id>/async/', views.tieba_detail_async, name='tieba-detail-async'),
+    path('<int:tieba_id>/images/', views.TiebaImageView.as_view(), name='tieba-images'),
+    path('category/<int:category_id>/', views.CategoryTiebaListView.as_view(), name='category-tieba-list'),
+]
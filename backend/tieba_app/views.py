@@ -0,0 +1,101 @@
+import asyncio
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from media_app import pipeline
+from post_app.models import Post
+from post_app.pagination import PostCursorPagination
+from post_app.serializers import PostListSerializer
+from tieba_project.async_views import async_get, bearer_user_id, error, ok
+
+from . import cache
+from .permissions import SETTINGS, HasTiebaPermission, aresolver, resolver_for
+from .models import Tieba
+from .pagination import TiebaCursorPagination
+from .serializers import TiebaHeaderSerializer, TiebaListSerializer, header_data
+
+
+class CategoryTiebaListView(generics.ListAPIView):
+    """分类下的贴吧列表（按成员数倒序，游标分页；成员数变化时翻页可能重复或遗漏，见 pagination.py）"""
+    serializer_class = TiebaListSerializer
+    pagination_class = TiebaCursorPagination
+
+    def get_queryset(self):
+        return Tieba.objects.filter(category_id=self.kwargs['category_id'], status=1)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            # 整页一次判断，不逐个贴吧查询
+            results = response.data['results']
+            flags = resolver_for(request).can_moderate_many([item['id'] for item in results])
+            for item in results:
+                item['can_moderate'] = flags[item['id']]
+        return response
+
+
+def _first_posts(tieba_id):
+    return Post.objects.filter(tieba_id=tieba_id, status=1).select_related('author')
+
+
+class TiebaDetailView(APIView):
+    """贴吧首页：头部（贴吧、分类、公告）+ 第一页帖子"""
+
+    def get(self, request, tieba_id):
+        header = cache.get_tieba_header(tieba_id)
+        if header is None:
+            raise Http404
+        page = PostCursorPagination().get_page(_first_posts(tieba_id))
+        data = header_data(header)
+        data['posts'] = {'next': page.next_cursor, 'results': PostListSerializer(page.items, many=True).data}
+        if request.user.is_authenticated:
+            data['viewer'] = resolver_for(request).viewer(tieba_id)
+        return Response(data)
+
+
+@async_get
+async def tieba_detail_async(request, tieba_id):
+    """TiebaDetailView 的异步版本：头部、第一页帖子和当前用户的身份并发读取（令牌只验签）"""
+    user_id = bearer_user_id(request)
+    header, page, resolver = await asyncio.gather(
+        cache.aget_tieba_header(tieba_id),
+        PostCursorPagination().aget_page(_first_posts(tieba_id)),
+        aresolver(user_id),
+    )
+    if header is None:
+        return error('未找到。', 404)
+    data = header_data(header)
+    data['posts'] = {'next': page.next_cursor, 'results': PostListSerializer(page.items, many=True).data}
+    if user_id is not None:
+        data['viewer'] = resolver.viewer(tieba_id)
+    return ok(data)
+
+
+class TiebaImageView(APIView):
+    """上传贴吧头像、横幅（multipart，字段名 avatar / banner，可只传一个），需要贴吧设置权限"""
+    permission_classes = [HasTiebaPermission]
+    tieba_permission = SETTINGS
+    parser_classes = [MultiPartParser]
+    fields = ('avatar', 'banner')
+
+    def put(self, request, tieba_id):
+        tieba = get_object_or_404(Tieba, pk=tieba_id, status=1)
+        uploads = {name: request.FILES[name] for name in self.fields if name in request.FILES}
+        if not uploads:
+            return Response({'detail': '缺少 avatar 或 banner 文件'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                for name, upload in uploads.items():
+                    pipeline.attach(tieba, name, upload, save=False)
+                # 保存触发信号，提交后贴吧头部缓存失效
+                tieba.save(update_fields=list(uploads))
+        except ValidationError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TiebaHeaderSerializer(tieba, context={'request': request}).data)
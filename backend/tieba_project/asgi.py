@@ -0,0 +1,22 @@
+"""
+ASGI config for tieba_project project.
+
+HTTP 请求仍由 Django 处理，/ws/push/ 上的 WebSocket 连接用于实时推送
+（见 tieba_project/websocket.py），例如：
+    uvicorn tieba_project.asgi:application
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tieba_project.settings')
+# ASGI 下默认不使用持久连接（见 tieba_project/database.py）
+os.environ.setdefault('DJANGO_ASGI', '1')
+
+# 先初始化 Django，再导入依赖模型和配置的模块
+django_application = get_asgi_application()
+
+from tieba_project.websocket import Router  # noqa: E402
+
+application = Router(django_application)
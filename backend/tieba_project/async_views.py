@@ -0,0 +1,74 @@
+"""
+异步视图的公共工具
+
+DRF 3.14 的视图不支持 async，热点只读接口另写一份 Django 原生异步视图，
+挂在对应同步接口路径后加 async/ 的地址上，返回结构与同步版本一致。
+异步视图在 ASGI 下运行（见 tieba_project/asgi.py），使用异步ORM和异步
+缓存接口，互不依赖的查询用 asyncio.gather 并发执行。
+
+注意：QueryCountMiddleware 只支持同步，DEBUG 下它会让整条中间件链按
+同步方式适配；压测异步视图时请关闭 DEBUG。
+"""
+
+import functools
+
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def user_id_from_token(token):
+    """校验 JWT access token 并取出用户ID（只验签，不查库），无效时返回 None"""
+    try:
+        return AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+
+def bearer_user_id(request):
+    """从 Authorization: Bearer <token> 请求头取出用户ID"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme not in api_settings.AUTH_HEADER_TYPES or not token:
+        return None
+    return user_id_from_token(token)
+
+
+def async_get(view):
+    """只允许 GET 的异步视图（Django 4.2 的 require_GET 还不支持协程）"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def ok(data):
+    return JsonResponse(data, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+async def keyset_page(paginator, request, queryset, serializer_class):
+    """
+    按请求参数取一页数据并序列化，返回与同步分页一致的
+    {'next', 'previous', 'results'}；游标无效时抛出 ValueError
+    """
+    paginator.request = request
+    page_size = paginator.page_size
+    try:
+        page_size = max(1, min(int(request.GET[paginator.page_size_query_param]), paginator.max_page_size))
+    except (KeyError, ValueError):
+        pass
+    page = await paginator.aget_page(queryset, cursor=request.GET.get(paginator.cursor_query_param),
+                                     page_size=page_size)
+    paginator.page = page
+    return {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': serializer_class(page.items, many=True).data,
+    }
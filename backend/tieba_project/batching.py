@@ -0,0 +1,118 @@
+"""
+进程内批量缓冲
+
+把高频的小写入先攒在内存里，攒够 max_pending 条或每隔 interval 秒
+一次性写入数据库。写入前先把缓冲区整体换出，写入失败再合并回去，
+所以每条数据只会被成功写入一次；进程正常退出时会再刷一次。
+
+攒满时如果调用方正处在事务中（例如模型信号），不在这个事务里写入，
+而是等它提交后再刷新；调用方回滚时由定时线程稍后刷新。
+"""
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_buffers = weakref.WeakSet()
+
+
+class BatchBuffer:
+    """批量缓冲基类，子类实现 empty() / merge() / write()"""
+
+    def __init__(self, name, interval=5.0, max_pending=1000):
+        self.name = name
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = self.empty()
+        self._size = 0
+        self._timer = None
+        self._flush_scheduled = False
+        _buffers.add(self)
+
+    def empty(self):
+        """返回一个空的缓冲区"""
+        raise NotImplementedError
+
+    def merge(self, pending, item):
+        """把一条数据并入缓冲区"""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """把换出的缓冲区写入存储"""
+        raise NotImplementedError
+
+    def written(self, batch):
+        """批次写入成功后调用（例如发出信号），默认什么也不做"""
+
+    def add(self, item):
+        with self._lock:
+            self.merge(self._pending, item)
+            self._size += 1
+            full = self._size >= self.max_pending
+            self._ensure_timer()
+        if not full:
+            return
+        if transaction.get_connection().in_atomic_block:
+            # 不在调用方的事务里写整个进程的缓冲：调用方回滚会连带丢掉其他请求的数据
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                transaction.on_commit(self.flush)
+            return
+        self.flush()
+
+    def flush(self):
+        """立即写入当前缓冲的全部数据，返回写入的条数"""
+        with self._lock:
+            batch, size = self._pending, self._size
+            self._pending, self._size = self.empty(), 0
+            self._flush_scheduled = False
+        if not size:
+            return 0
+        try:
+            self.write(batch)
+        except Exception:
+            logger.exception('批量写入失败，数据已放回缓冲区: %s', self.name)
+            with self._lock:
+                self.restore(batch)
+                self._size += size
+            return 0
+        # 写入已经提交，之后的任何错误都不能再把批次放回缓冲区，否则会重复写入
+        try:
+            self.written(batch)
+        except Exception:
+            logger.exception('批量写入后的处理失败: %s', self.name)
+        return size
+
+    def restore(self, batch):
+        """写入失败时把批次合并回缓冲区，默认逐条 merge"""
+        for item in self.iter_items(batch):
+            self.merge(self._pending, item)
+
+    def iter_items(self, batch):
+        return iter(batch)
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run, name='flush-%s' % self.name, daemon=True)
+            self._timer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+            # 刷新线程自己的数据库连接用完即关，避免长期占用
+            connections.close_all()
+
+
+@atexit.register
+def flush_all():
+    """刷新本进程所有缓冲区"""
+    for buffer in list(_buffers):
+        buffer.flush()
@@ -0,0 +1,161 @@
+"""
+接口基准测试
+
+每个场景（Scenario）是一组无参调用，通常是用测试客户端请求某个接口，
+也可以直接执行一段ORM代码作为对照组。run_scenario 依次执行这些调用，
+记录每次的耗时和SQL条数，再单独跑几轮 tracemalloc 统计内存峰值
+（tracemalloc 本身会拖慢执行，不和计时混在一起）。
+
+结果与 JSON 基线比较：p95 变慢超过阈值，或SQL条数增加，视为性能回退。
+
+run_concurrent 用于在固定并发下比较同步/异步版本的接口。
+"""
+
+import asyncio
+import json
+import math
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.conf import settings
+
+from .querycount import QueryRecorder
+
+Scenario = namedtuple('Scenario', ['name', 'build', 'description'])
+
+_scenarios = []
+
+
+def _config(key, default):
+    return getattr(settings, 'BENCHMARK', {}).get(key, default)
+
+
+def scenario(name, description=''):
+    """注册场景的装饰器；被装饰的函数接收上下文，返回调用列表"""
+    def decorator(build):
+        _scenarios.append(Scenario(name, build, description))
+        return build
+    return decorator
+
+
+def registered():
+    return list(_scenarios)
+
+
+def percentile(values, p):
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_scenario(calls, iterations, warmup=5, memory_rounds=5):
+    """
+    执行一个场景，返回统计结果字典
+    调用返回值若带 status_code 且 >= 400，计入 errors
+    """
+    if not calls:
+        return None
+    for i in range(warmup):
+        calls[i % len(calls)]()
+
+    latencies, query_counts, errors = [], [], 0
+    for i in range(iterations):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            result = calls[i % len(calls)]()
+            latencies.append((time.perf_counter() - start) * 1000)
+        query_counts.append(recorder.count)
+        if getattr(result, 'status_code', 200) >= 400:
+            errors += 1
+
+    tracemalloc.start()
+    try:
+        peak = 0
+        for i in range(min(memory_rounds, len(calls))):
+            tracemalloc.reset_peak()
+            calls[i]()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'n': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_queries': round(sum(query_counts) / len(query_counts), 2),
+        'max_queries': max(query_counts),
+        'peak_kb': round(peak / 1024, 1),
+        'errors': errors,
+    }
+
+
+async def run_concurrent(call, total, concurrency):
+    """
+    以固定并发数执行 total 次异步调用 call(i)，返回延迟百分位和吞吐量
+    （用于比较同步/异步视图在并发下的表现，不统计SQL条数）
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            result = await call(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if getattr(result, 'status_code', 200) >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        'n': total,
+        'concurrency': concurrency,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'rps': round(total / elapsed, 1),
+        'errors': errors,
+    }
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, meta=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta or {}, 'scenarios': results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare(results, baseline, threshold=None, min_delta_ms=None):
+    """
+    与基线比较，返回回退描述列表（空列表表示没有回退）
+    min_delta_ms 用来忽略亚毫秒级的抖动
+    """
+    threshold = _config('THRESHOLD', 0.2) if threshold is None else threshold
+    min_delta_ms = _config('MIN_DELTA_MS', 1.0) if min_delta_ms is None else min_delta_ms
+    regressions = []
+    for name, current in results.items():
+        old = (baseline or {}).get('scenarios', {}).get(name)
+        if current['errors']:
+            regressions.append('%s: %d 次请求失败' % (name, current['errors']))
+        if not old:
+            continue
+        limit = old['p95_ms'] * (1 + threshold)
+        if current['p95_ms'] > limit and current['p95_ms'] - old['p95_ms'] > min_delta_ms:
+            regressions.append('%s: p95 %.2fms -> %.2fms（超过阈值 %d%%）'
+                               % (name, old['p95_ms'], current['p95_ms'], threshold * 100))
+        if current['max_queries'] > old['max_queries']:
+            regressions.append('%s: SQL条数 %d -> %d' % (name, old['max_queries'], current['max_queries']))
+    return regressions
@@ -0,0 +1,122 @@
+"""
+计数器写回（write-behind）
+
+浏览数、点赞数这类统计字段如果每次事件都 UPDATE 一次，最热的几行会被
+反复加锁。这里先在进程内把增量按 (模型, 主键, 字段) 累加，定时用
+F() 表达式批量写回：增量相同的行合并成一条 "UPDATE ... WHERE id IN (...)"。
+
+增量在写入前被整体换出，写入成功后才丢弃，不会重复累加；进程正常退出
+（包括 gunicorn 平滑重启 worker）时会把剩余增量写回。进程被强制杀死时
+最多丢失一个刷新周期内的增量。
+
+增量在调用方事务提交后才进入缓冲，事务回滚时这次增量随之作废。
+
+配置见 settings.COUNTER_BUFFER，ENABLED 为 False 时每次调用直接写库（同样发出
+counters_flushed）。
+"""
+
+import logging
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+from .batching import BatchBuffer
+
+logger = logging.getLogger(__name__)
+
+# 每批增量写回数据库（事务提交）后发出，deltas 为 {(模型标签, 主键): {字段: 增量}}
+counters_flushed = Signal()
+
+
+class CounterBuffer(BatchBuffer):
+    """按 (模型, 主键) 累加各字段增量"""
+
+    def empty(self):
+        return defaultdict(Counter)
+
+    def merge(self, pending, item):
+        label, pk, field, amount = item
+        pending[(label, pk)][field] += amount
+
+    def iter_items(self, batch):
+        for (label, pk), deltas in batch.items():
+            for field, amount in deltas.items():
+                yield label, pk, field, amount
+
+    def get(self, label, pk, field):
+        with self._lock:
+            deltas = self._pending.get((label, pk))
+            return deltas[field] if deltas else 0
+
+    def write(self, batch):
+        # 增量完全相同的行合并成一条 UPDATE
+        groups = defaultdict(list)
+        for (label, pk), deltas in batch.items():
+            deltas = tuple(sorted((f, n) for f, n in deltas.items() if n))
+            if deltas:
+                groups[(label, deltas)].append(pk)
+        with transaction.atomic():
+            for (label, deltas), pks in groups.items():
+                model = apps.get_model(label)
+                model._base_manager.filter(pk__in=pks).update(
+                    **{field: F(field) + amount for field, amount in deltas})
+
+    def written(self, batch):
+        # 增量已经提交，接收者出错只记日志
+        for receiver, result in counters_flushed.send_robust(sender=self.__class__, deltas=batch):
+            if isinstance(result, Exception):
+                logger.error('counters_flushed 接收者出错: %r', receiver, exc_info=result)
+
+
+def _config(key, default):
+    return getattr(settings, 'COUNTER_BUFFER', {}).get(key, default)
+
+
+_buffer = CounterBuffer('counters',
+                        interval=_config('INTERVAL', 5.0),
+                        max_pending=_config('MAX_PENDING', 1000))
+
+
+def incr(model, pk, field, amount=1):
+    """给 model 主键为 pk 的行的 field 字段加 amount"""
+    if not amount:
+        return
+    if not _config('ENABLED', True):
+        # 和缓冲写回一样发出 counters_flushed，热度等派生数据才会跟着更新
+        write_now([(model, pk, field, amount)])
+        return
+    # 调用方（通常是模型信号）回滚时增量不能留在缓冲里；不在事务中时立即执行
+    transaction.on_commit(partial(_buffer.add, (model._meta.label, pk, field, amount)))
+
+
+def decr(model, pk, field, amount=1):
+    incr(model, pk, field, -amount)
+
+
+def write_now(increments):
+    """
+    立即写入一批增量 [(model, pk, field, amount), ...]，不经过缓冲，
+    在调用方的事务中执行（后台任务用，保证增量和任务状态一起提交或回滚）
+    """
+    batch = _buffer.empty()
+    for model, pk, field, amount in increments:
+        _buffer.merge(batch, (model._meta.label, pk, field, amount))
+    if batch:
+        _buffer.write(batch)
+        # 和增量在同一事务中：接收者出错时整个事务回滚，由调用方重试
+        counters_flushed.send(sender=CounterBuffer, deltas=batch)
+
+
+def pending(model, pk, field):
+    """本进程中尚未写回的增量，读取时加到数据库的值上即可得到近实时的计数"""
+    return _buffer.get(model._meta.label, pk, field)
+
+
+def flush():
+    """立即写回本进程缓冲的所有增量"""
+    return _buffer.flush()
@@ -0,0 +1,119 @@
+"""
+数据库配置（按环境变量选择后端）
+
+    DATABASE_ENGINE           sqlite（默认）/ mysql / postgresql
+    DATABASE_NAME             库名；SQLite 为文件路径，默认 BASE_DIR/db.sqlite3
+    DATABASE_USER / DATABASE_PASSWORD / DATABASE_HOST / DATABASE_PORT
+    DATABASE_CONN_MAX_AGE     持久连接秒数，WSGI 默认 60，ASGI 默认 0；0 表示每个请求结束后关闭
+    DATABASE_HEALTH_CHECKS    复用持久连接前先检查是否可用，默认 1
+    DATABASE_PRAGMAS          SQLite 的 PRAGMA，如 "journal_mode=wal,synchronous=normal"；
+                              不设置时用 SQLITE_PRAGMAS，设为空字符串则不执行任何 PRAGMA；
+                              其中的 busy_timeout（毫秒）换算成 OPTIONS['timeout']
+    DATABASE_POOL_SIZE        大于 0 时 MySQL/PostgreSQL 改用连接池后端
+                              （django-db-connection-pool），此时不再使用 CONN_MAX_AGE
+    DATABASE_POOL_OVERFLOW    连接池高峰时允许额外创建的连接数，默认等于 POOL_SIZE
+    DATABASE_DISABLE_SERVER_SIDE_CURSORS
+                              PostgreSQL 经 PgBouncer 事务池连接时设为 1
+
+ASGI 下每个请求的同步代码可能跑在不同的线程里，持久连接得不到复用，
+反而会在线程池里攒下大量空闲连接，Django 文档建议 ASGI 下关闭持久连接。
+asgi.py 在加载配置前设置 DJANGO_ASGI=1，此时 CONN_MAX_AGE 默认为 0；
+需要复用连接时用连接池（DATABASE_POOL_SIZE）或 PgBouncer。
+"""
+
+import importlib.util
+
+from django.core.exceptions import ImproperlyConfigured
+
+# 写锁等待秒数；只通过连接参数 timeout 设置，PRAGMA busy_timeout 会覆盖它
+SQLITE_TIMEOUT = 20
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',        # 读写不互相阻塞
+    'synchronous': 'normal',      # WAL 下断电最多丢最后一个事务，不会损坏数据库
+    'cache_size': -65536,         # 页缓存 64MB
+    'temp_store': 'memory',
+    'mmap_size': 268435456,       # 256MB 内存映射读
+}
+
+ENGINES = {
+    'sqlite': 'tieba_project.db_backends.sqlite3',
+    'mysql': 'django.db.backends.mysql',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+POOL_ENGINES = {
+    'mysql': 'dj_db_conn_pool.backends.mysql',
+    'postgresql': 'dj_db_conn_pool.backends.postgresql',
+}
+
+
+def _flag(env, key, default):
+    return env.get(key, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_pragmas(value):
+    """"a=b,c=d" -> {'a': 'b', 'c': 'd'}；None 表示使用默认值"""
+    if value is None:
+        return dict(SQLITE_PRAGMAS)
+    pragmas = {}
+    for item in value.split(','):
+        name, _, setting = item.partition('=')
+        if name.strip():
+            pragmas[name.strip().lower()] = setting.strip()
+    return pragmas
+
+
+def database_config(env, base_dir):
+    """根据环境变量生成 DATABASES['default']"""
+    vendor = env.get('DATABASE_ENGINE', 'sqlite').lower()
+    if vendor in ('sqlite3', 'postgres'):
+        vendor = {'sqlite3': 'sqlite', 'postgres': 'postgresql'}[vendor]
+    if vendor not in ENGINES:
+        raise ImproperlyConfigured('不支持的 DATABASE_ENGINE: %s' % vendor)
+
+    conn_max_age = 0 if _flag(env, 'DJANGO_ASGI', False) else 60
+    config = {
+        'ENGINE': ENGINES[vendor],
+        'CONN_MAX_AGE': int(env.get('DATABASE_CONN_MAX_AGE', conn_max_age)),
+        'CONN_HEALTH_CHECKS': _flag(env, 'DATABASE_HEALTH_CHECKS', True),
+    }
+    if vendor == 'sqlite':
+        config['NAME'] = env.get('DATABASE_NAME') or base_dir / 'db.sqlite3'
+        pragmas = parse_pragmas(env.get('DATABASE_PRAGMAS'))
+        busy_timeout = pragmas.pop('busy_timeout', None)
+        timeout = int(busy_timeout) / 1000 if busy_timeout else SQLITE_TIMEOUT
+        config['OPTIONS'] = {'timeout': timeout, 'pragmas': pragmas}
+    else:
+        config.update({
+            'NAME': env.get('DATABASE_NAME', 'tieba'),
+            'USER': env.get('DATABASE_USER', 'root' if vendor == 'mysql' else 'postgres'),
+            'PASSWORD': env.get('DATABASE_PASSWORD', ''),
+            'HOST': env.get('DATABASE_HOST', '127.0.0.1'),
+            'PORT': env.get('DATABASE_PORT', '3306' if vendor == 'mysql' else '5432'),
+        })
+        if vendor == 'mysql':
+            config['OPTIONS'] = {
+                'charset': 'utf8mb4',
+                'isolation_level': 'read committed',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            }
+        else:
+            config['OPTIONS'] = {'connect_timeout': 5}
+            config['DISABLE_SERVER_SIDE_CURSORS'] = _flag(env, 'DATABASE_DISABLE_SERVER_SIDE_CURSORS', False)
+
+    pool_size = int(env.get('DATABASE_POOL_SIZE', 0))
+    if pool_size > 0:
+        if vendor not in POOL_ENGINES:
+            raise ImproperlyConfigured('SQLite 不支持连接池，请去掉 DATABASE_POOL_SIZE')
+        if importlib.util.find_spec('dj_db_conn_pool') is None:
+            raise ImproperlyConfigured('DATABASE_POOL_SIZE 需要安装 django-db-connection-pool')
+        config['ENGINE'] = POOL_ENGINES[vendor]
+        config['CONN_MAX_AGE'] = 0  # 连接的复用交给连接池
+        config['POOL_OPTIONS'] = {
+            'POOL_SIZE': pool_size,
+            'MAX_OVERFLOW': int(env.get('DATABASE_POOL_OVERFLOW', pool_size)),
+            'RECYCLE': 300,        # 连接最长使用秒数，避免被服务端 wait_timeout 断开
+            'PRE_PING': True,
+        }
+    return config
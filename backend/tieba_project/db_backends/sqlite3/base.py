@@ -0,0 +1,35 @@
+"""
+SQLite 后端：每个新连接执行 OPTIONS['pragmas'] 中的 PRAGMA
+
+Django 4.2 的 SQLite 后端没有 init_command，WAL、synchronous、mmap 等
+设置只能在建立连接后执行。配合 CONN_MAX_AGE 持久连接，每个连接只执行一次。
+"""
+
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_RE = re.compile(r'^[a-z_]+$')
+VALUE_RE = re.compile(r'^-?[\w]+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)  # sqlite3.connect 不接受这个参数
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        self.apply_pragmas(conn)
+        return conn
+
+    def apply_pragmas(self, conn=None):
+        """执行配置的 PRAGMA（seed_data 等临时修改后也用它恢复）"""
+        conn = conn or self.connection
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            if not PRAGMA_RE.match(name) or not VALUE_RE.match(str(value)):
+                raise ImproperlyConfigured('无效的 PRAGMA: %s = %s' % (name, value))
+            conn.execute('PRAGMA %s = %s' % (name, value))
@@ -0,0 +1,104 @@
+"""
+受权限控制的文件下载
+
+权限在 Django 里校验，文件传输尽量不占用 worker：
+- DOWNLOADS['OFFLOAD'] = 'x-accel'：返回 X-Accel-Redirect，由 Nginx 从
+  internal location（ACCEL_PREFIX 对应 MEDIA_ROOT）直接发送文件
+- DOWNLOADS['OFFLOAD'] = 'x-sendfile'：返回 X-Sendfile（Apache mod_xsendfile、Lighttpd）
+- 未配置时由 Django 流式发送，支持单段 Range 请求（断点续传、视频拖动），
+  每次只读 BLOCK_SIZE 字节，不把文件读进内存
+Range 和 If-Range 在前两种方式下交给前端服务器处理。
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _config(key, default):
+    return getattr(settings, 'DOWNLOADS', {}).get(key, default)
+
+
+def parse_range(header, size):
+    """
+    解析单段 Range 请求头，返回 (start, end)（闭区间）；
+    没有或不支持（多段、格式错误）时返回 None，按整个文件返回；
+    范围无法满足时抛出 ValueError
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        first = int(first) if first else None
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if first is None:
+        # bytes=-500：最后 500 字节
+        if last is None:
+            return None
+        if last == 0:
+            raise ValueError('unsatisfiable range')
+        start, end = max(0, size - last), size - 1
+    else:
+        start, end = first, size - 1 if last is None else min(last, size - 1)
+    if start >= size or start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve(request, name, file_name, etag=None, as_attachment=True):
+    """发送 default_storage 中的文件 name，下载时的文件名为 file_name"""
+    content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    offload = _config('OFFLOAD', None)
+
+    if offload == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(_config('ACCEL_PREFIX', '/protected-media/') + name)
+    elif offload == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = default_storage.path(name)
+    else:
+        path = default_storage.path(name)
+        size = os.path.getsize(path)
+        if_range = request.headers.get('If-Range')
+        byte_range = None
+        if not if_range or (etag and if_range == '"%s"' % etag):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */%d' % size
+                return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_iter_range(path, start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(as_attachment, file_name)
+    if etag:
+        response['ETag'] = '"%s"' % etag
+    return response
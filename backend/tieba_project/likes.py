@@ -0,0 +1,224 @@
+"""
+点赞服务："我是否赞过" 批量判断 + 幂等的点赞/取消
+
+帖子页要对一页 30 个帖子或 50 条评论标出当前用户是否赞过，点赞表又是
+最大的表。判断分两步：
+1. 每个用户一份布隆过滤器（他赞过的全部目标ID），放在共享缓存里。
+   过滤器说"没有"就一定没有；大多数用户在一页里一个也没赞过，直接返回，
+   不查库
+2. 过滤器说"可能有"的ID，用一条 "user_id = ? AND 目标 IN (...)" 查询确认，
+   走 (目标, 用户) 唯一索引
+
+点赞提交后把新ID直接加进共享缓存里的过滤器（短锁内读-改-写），不重扫
+点赞表；过滤器按容量建，加满了、缓存里没有或拿不到锁时才让该用户的
+VersionedCache 版本号加一，下次读取时重建。本地缓存时间设为 0，每次都读
+共享缓存，避免其他进程用旧过滤器把刚点过的赞判断成"没赞"。取消点赞不需要
+改动：过滤器里多出来的ID只会多一次确认查询，不会判断错。
+点赞太多（超过 MAX_ITEMS）的用户不建过滤器，直接查库。
+
+点赞/取消是幂等的：重复点赞、重复取消都不改变计数。计数由模型信号交给
+tieba_project.counters 写回，这里保证并发请求中只有真正插入或删除了
+一行的那个请求触发信号。
+"""
+
+import hashlib
+import math
+from functools import partial
+
+from django.conf import settings
+from django.db import models, transaction
+
+from . import counters
+from .cache import VersionedCache
+
+
+def _config(key, default):
+    return getattr(settings, 'LIKES', {}).get(key, default)
+
+
+class BloomFilter:
+    """
+    定长位数组的布隆过滤器（双重哈希），可以序列化成 bytes 放进缓存
+    capacity 为按误判率设计的容量，count 为已加入的数量
+    """
+
+    def __init__(self, size_bits, hash_count, bits=None, capacity=0, count=0):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray((size_bits + 7) // 8)
+        self.capacity = capacity
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        capacity = max(capacity, 1)
+        size_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count, capacity=capacity)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def dumps(self):
+        return (self.size_bits, self.hash_count, bytes(self.bits), self.capacity, self.count)
+
+    @classmethod
+    def loads(cls, data):
+        # 旧格式没有容量信息，视为已满，第一次加入时重建
+        return cls(*data)
+
+
+# 点赞太多、不建过滤器的用户
+_TOO_MANY = 'too_many'
+
+_cache = VersionedCache('likes', local_ttl=0)
+
+
+class LikeService:
+    """
+    某一类点赞（如 PostLike）的服务
+    model 为点赞模型，target 为指向被赞对象的外键名，
+    被赞对象模型上的 like_count 由模型信号维护
+    """
+
+    def __init__(self, model, target):
+        self.model = model
+        self.target = target
+        self.target_field = '%s_id' % target
+        self.name = model._meta.label_lower
+
+    def _group(self, user_id):
+        return '%s:%s' % (self.name, user_id)
+
+    def _liked_query(self, user_id):
+        return (self.model.objects.filter(user_id=user_id)
+                .values_list(self.target_field, flat=True)[:_config('MAX_ITEMS', 20000) + 1])
+
+    def _build(self, user_id):
+        return self._bloom_data(list(self._liked_query(user_id)))
+
+    async def _abuild(self, user_id):
+        return self._bloom_data([target_id async for target_id in self._liked_query(user_id)])
+
+    def _bloom_data(self, ids):
+        if len(ids) > _config('MAX_ITEMS', 20000):
+            return _TOO_MANY
+        # 预留余量：新点赞直接加进过滤器，加满后才重建
+        bloom = BloomFilter.for_capacity(len(ids) * 2 + 64, _config('ERROR_RATE', 0.01))
+        for target_id in ids:
+            bloom.add(target_id)
+        return bloom.dumps()
+
+    def _bloom(self, user_id):
+        data = _cache.get_or_load(self._group(user_id), 'bloom', lambda: self._build(user_id),
+                                  timeout=_config('TIMEOUT', 3600))
+        return None if data == _TOO_MANY else BloomFilter.loads(data)
+
+    async def _abloom(self, user_id):
+        data = await _cache.aget_or_load(self._group(user_id), 'bloom', lambda: self._abuild(user_id),
+                                         timeout=_config('TIMEOUT', 3600))
+        return None if data == _TOO_MANY else BloomFilter.loads(data)
+
+    def _confirm_query(self, user_id, bloom, target_ids):
+        """过滤器筛过后需要查库确认的查询，不用查时返回 None"""
+        if bloom is not None:
+            target_ids = {target_id for target_id in target_ids if target_id in bloom}
+            if not target_ids:
+                return None
+        return (self.model.objects
+                .filter(user_id=user_id, **{'%s__in' % self.target_field: target_ids})
+                .values_list(self.target_field, flat=True))
+
+    def liked_ids(self, user_id, target_ids):
+        """target_ids 中该用户赞过的ID集合；未登录用户（user_id 为空）直接返回空集"""
+        target_ids = set(target_ids)
+        if not user_id or not target_ids:
+            return set()
+        query = self._confirm_query(user_id, self._bloom(user_id), target_ids)
+        return set(query) if query is not None else set()
+
+    async def aliked_ids(self, user_id, target_ids):
+        """liked_ids 的异步版本"""
+        target_ids = set(target_ids)
+        if not user_id or not target_ids:
+            return set()
+        query = self._confirm_query(user_id, await self._abloom(user_id), target_ids)
+        return {target_id async for target_id in query} if query is not None else set()
+
+    def liked_map(self, user_id, target_ids):
+        """{目标ID: 是否赞过}"""
+        liked = self.liked_ids(user_id, target_ids)
+        return {target_id: target_id in liked for target_id in target_ids}
+
+    def _changed(self, user_id, target_id):
+        transaction.on_commit(partial(self._add, user_id, target_id))
+
+    def _add(self, user_id, target_id):
+        """把新点赞加进缓存中的过滤器；没有缓存、已满或并发修改时改为失效重建"""
+        group = self._group(user_id)
+        key = _cache.key(group, 'bloom')
+        shared = _cache.shared
+        if not shared.add(key + ':lock', 1, timeout=5):
+            _cache.invalidate(group)
+            return
+        try:
+            data = shared.get(key)
+            if data == _TOO_MANY:
+                return
+            bloom = BloomFilter.loads(data) if data is not None else None
+            if bloom is None or bloom.full:
+                # 没有缓存时同样失效：正在重建的请求可能读的是提交前的点赞表
+                _cache.invalidate(group)
+                return
+            bloom.add(target_id)
+            shared.set(key, bloom.dumps(), timeout=_config('TIMEOUT', 3600))
+        finally:
+            shared.delete(key + ':lock')
+
+    def _lookup(self, target):
+        """target 可以是被赞对象或它的ID；传对象时新建的点赞行直接带上它，信号中不用再查"""
+        if isinstance(target, models.Model):
+            return {self.target: target}
+        return {self.target_field: target}
+
+    def like(self, user_id, target):
+        """点赞，已赞过时什么也不做；返回本次是否新增（调用方需先确认被赞对象存在）"""
+        # 并发重复点赞时 get_or_create 捕获唯一约束冲突，只有一个请求得到 created=True
+        like, created = self.model.objects.get_or_create(user_id=user_id, **self._lookup(target))
+        if created:
+            self._changed(user_id, getattr(like, self.target_field))
+        return created
+
+    def unlike(self, user_id, target):
+        """取消点赞，没赞过时什么也不做；返回本次是否删除"""
+        with transaction.atomic():
+            # 先锁行：并发取消时只有一个请求能删到这一行并触发计数减一
+            like = (self.model.objects.select_for_update()
+                    .filter(user_id=user_id, **self._lookup(target)).first())
+            if like is None:
+                return False
+            like.delete()
+        return True
+
+    def set_liked(self, user_id, target, liked):
+        """把点赞状态设为 liked（幂等），返回本次是否有变化"""
+        return self.like(user_id, target) if liked else self.unlike(user_id, target)
+
+    def like_count(self, target):
+        """被赞对象的近实时点赞数（数据库值 + 本进程未写回的增量）"""
+        return target.like_count + counters.pending(type(target), target.pk, 'like_count')
@@ -0,0 +1,195 @@
+"""
+键集（游标）分页
+
+按照 ordering 中的字段做 "WHERE (a, b) < (x, y)" 式的比较代替 OFFSET，
+每一页都只是一次索引范围扫描，翻到多深的页代价都一样。
+ordering 的最后一个字段必须唯一（通常是 id），且所有字段不能为 NULL。
+"""
+
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'previous_cursor'])
+
+
+def encode_cursor(values, reverse=False):
+    """把排序键编码成URL安全的游标字符串"""
+    payload = {'v': [_dump_value(v) for v in values]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回 (values, reverse)；格式错误时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['v']
+        if not isinstance(values, list):
+            raise ValueError(cursor)
+        return values, bool(payload.get('r'))
+    except (TypeError, KeyError, UnicodeError, json.JSONDecodeError, binascii.Error) as exc:
+        raise ValueError(cursor) from exc
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    通用键集分页
+
+    子类只需要声明 ordering，例如 ('-last_reply_at', '-id')。
+    除了DRF视图，也可以直接调用 get_page() 在服务层使用。
+    """
+    ordering = ('-id',)
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '无效的分页游标'
+
+    def get_page(self, queryset, cursor=None, page_size=None):
+        """取一页数据，返回 KeysetPage(items, next_cursor, previous_cursor)"""
+        queryset, values, reverse, page_size = self._prepare(queryset, cursor, page_size)
+        return self._build_page(list(queryset[:page_size + 1]), values, reverse, page_size)
+
+    async def aget_page(self, queryset, cursor=None, page_size=None):
+        """get_page 的异步版本（异步ORM）"""
+        queryset, values, reverse, page_size = self._prepare(queryset, cursor, page_size)
+        rows = [row async for row in queryset[:page_size + 1]]
+        return self._build_page(rows, values, reverse, page_size)
+
+    def _prepare(self, queryset, cursor, page_size):
+        page_size = page_size or self.page_size
+        values, reverse = (None, False)
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise ValueError(cursor)
+
+        ordering = self._reversed_ordering() if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset.model, ordering, values))
+        return queryset, values, reverse, page_size
+
+    def _build_page(self, rows, values, reverse, page_size):
+        has_more = len(rows) > page_size
+        items = rows[:page_size]
+        if reverse:
+            items.reverse()
+
+        next_cursor = previous_cursor = None
+        if items:
+            # 正向翻页时，带了游标说明前面还有数据；反向翻页同理
+            has_next = has_more if not reverse else True
+            has_previous = has_more if reverse else values is not None
+            if has_next:
+                next_cursor = encode_cursor(self._position(items[-1]))
+            if has_previous:
+                previous_cursor = encode_cursor(self._position(items[0]), reverse=True)
+        return KeysetPage(items, next_cursor, previous_cursor)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page = self.get_page(queryset,
+                                 cursor=request.query_params.get(self.cursor_query_param),
+                                 page_size=self.get_page_size(request))
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        self.page = page
+        return page.items
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        return self._build_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._build_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def _build_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _reversed_ordering(self):
+        return [f[1:] if f.startswith('-') else '-' + f for f in self.ordering]
+
+    def _position(self, instance):
+        return [getattr(instance, f.lstrip('-')) for f in self.ordering]
+
+    def _keyset_filter(self, model, ordering, values):
+        """
+        展开成 a <= x AND ((a < x) OR (a = x AND b < y) OR ...)，
+        降序字段用 lt，升序字段用 gt
+
+        前面冗余的 a <= x 是给查询规划器看的：只有 OR 时SQLite
+        只能用索引的等值前缀，深页要从头扫过前面所有行；
+        有了这个范围条件才能直接定位到游标位置。
+        """
+        values = [self._to_python(model, f.lstrip('-'), v) for f, v in zip(ordering, values)]
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            clause = Q(**{'%s__%s' % (name, lookup): values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values[:i]):
+                clause &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= clause
+        if len(ordering) > 1:
+            first = ordering[0]
+            lookup = 'lte' if first.startswith('-') else 'gte'
+            condition = Q(**{'%s__%s' % (first.lstrip('-'), lookup): values[0]}) & condition
+        return condition
+
+    def _to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError as exc:
+            raise ValueError(value) from exc
@@ -0,0 +1,204 @@
+"""
+实时推送的发布/订阅
+
+每个进程只有一个 Hub：WebSocket 连接在 Hub 上登记自己的队列，Hub 负责把
+频道上的消息分发到本进程内所有订阅了该频道的连接。这样上千个空闲连接
+共享同一个后端订阅，而不是每个连接各占一个 Redis 连接。
+
+- InProcessPubSub：publish 直接分发到本进程的连接，只能送达和发布方在
+  同一个 ASGI 进程里的客户端，只适用于开发和测试（单个 ASGI 进程）。
+  run_outbox 是独立的进程，后台任务（评论通知等）发出的推送也到不了
+- RedisPubSub：生产部署使用（多个 ASGI worker、后台任务进程、多机），
+  publish 走 Redis PUBLISH，每个进程用一个 redis.asyncio 订阅读取消息后
+  再在本地分发
+
+publish() 是同步的，可以在视图、信号、批量刷新线程中直接调用；
+连接所在的事件循环通过 call_soon_threadsafe 接收消息。
+
+频道命名：user:<用户ID> 为个人频道，broadcast 为全站广播。
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = 'broadcast'
+
+
+def user_channel(user_id):
+    return 'user:%s' % user_id
+
+
+def _config(key, default):
+    return getattr(settings, 'REALTIME', {}).get(key, default)
+
+
+class Subscription:
+    """一个连接的订阅：若干频道 + 一个消息队列"""
+
+    def __init__(self, channels, queue, loop):
+        self.channels = tuple(channels)
+        self.queue = queue
+        self.loop = loop
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 客户端读得太慢时丢弃最旧的一条，客户端可以通过接口补齐
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+
+
+class BasePubSub:
+    """本进程内的订阅登记和分发，子类实现 publish() 以及后端订阅的增减"""
+    # publish 能否送达其他进程里的连接
+    cross_process = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    async def subscribe(self, channels, queue_size=None):
+        subscription = Subscription(channels, asyncio.Queue(queue_size or _config('QUEUE_SIZE', 100)),
+                                    asyncio.get_running_loop())
+        added = []
+        with self._lock:
+            for channel in subscription.channels:
+                if not self._channels[channel]:
+                    added.append(channel)
+                self._channels[channel].add(subscription)
+        if added:
+            await self._backend_subscribe(added)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        removed = []
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+                    removed.append(channel)
+        if removed:
+            await self._backend_unsubscribe(removed)
+
+    def connection_count(self):
+        with self._lock:
+            return len({s for subscribers in self._channels.values() for s in subscribers})
+
+    def dispatch(self, channel, message):
+        """把消息分发给本进程内订阅了该频道的连接"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    async def _backend_subscribe(self, channels):
+        pass
+
+    async def _backend_unsubscribe(self, channels):
+        pass
+
+
+class InProcessPubSub(BasePubSub):
+    """进程内实现：其他进程（别的 ASGI worker、run_outbox、管理命令）发布的消息收不到"""
+
+    def publish(self, channel, message):
+        return self.dispatch(channel, message)
+
+
+class RedisPubSub(BasePubSub):
+    """Redis 实现：每个进程一个发布连接、一个订阅连接"""
+
+    cross_process = True
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or _config('REDIS_URL', 'redis://127.0.0.1:6379/2')
+        self._publisher = None
+        self._pubsub = None
+        self._reader = None
+
+    def publish(self, channel, message):
+        import redis
+
+        if self._publisher is None:
+            self._publisher = redis.Redis.from_url(self.url)
+        self._publisher.publish(channel, json.dumps(message, ensure_ascii=False, default=str))
+
+    async def _backend_subscribe(self, channels):
+        if self._pubsub is None:
+            import redis.asyncio
+
+            self._pubsub = redis.asyncio.Redis.from_url(self.url).pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(*channels)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def _backend_unsubscribe(self, channels):
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(*channels)
+
+    async def _read(self):
+        while True:
+            try:
+                item = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('读取 Redis 订阅消息失败')
+                await asyncio.sleep(1.0)
+                continue
+            if item is None:
+                if not self._channels:
+                    self._reader = None
+                    return
+                continue
+            channel = item['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self.dispatch(channel, json.loads(item['data']))
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_pubsub():
+    """本进程的 Hub（按 REALTIME['BACKEND'] 创建）"""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = import_string(_config('BACKEND', 'tieba_project.pubsub.InProcessPubSub'))()
+    return _hub
+
+
+def publish(channel, message):
+    """发布消息；推送是尽力而为，失败只记录日志，不影响业务写入"""
+    try:
+        get_pubsub().publish(channel, message)
+    except Exception:
+        logger.exception('推送消息失败: %s', channel)
+
+
+def publish_to_user(user_id, message):
+    publish(user_channel(user_id), message)
@@ -0,0 +1,133 @@
+"""
+SQL 查询计数与 N+1 检测
+
+QueryRecorder 通过 connection.execute_wrapper 记录一段代码执行的每条
+SQL 及耗时，并把参数不同、结构相同的语句归为同一"形状"：同一形状
+出现 N1_THRESHOLD 次以上就视为疑似 N+1（典型如序列化时逐行访问
+comment.author）。
+
+- QueryCountMiddleware：DEBUG 下在响应头中返回 X-Query-Count /
+  X-Query-Time-Ms / X-Query-Repeated，并把疑似 N+1 写入日志；
+  QUERY_BUDGET_ENFORCE 为 True 时（测试环境）超出 QUERY_BUDGETS
+  中按 URL 名配置的预算直接抛出 QueryBudgetExceeded
+- assert_max_queries：测试中限定一段代码的查询次数
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """接口查询次数超出预算"""
+
+
+def query_shape(sql):
+    """去掉参数差异后的SQL结构"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """记录所有数据库连接上执行的SQL"""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self._stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        for alias in self.aliases:
+            cm = connections[alias].execute_wrapper(self)
+            cm.__enter__()
+            self._stack.append(cm)
+        return self
+
+    def __exit__(self, *exc_info):
+        while self._stack:
+            self._stack.pop().__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, threshold=None):
+        """疑似 N+1 的语句形状，返回 [(形状, 次数)]"""
+        threshold = threshold or getattr(settings, 'N1_THRESHOLD', 5)
+        shapes = Counter(query_shape(sql) for sql, _ in self.queries)
+        return [(shape, n) for shape, n in shapes.most_common() if n >= threshold]
+
+    def report(self):
+        lines = ['%d 条查询，共 %.1f ms' % (self.count, self.total_time * 1000)]
+        for shape, n in self.repeated():
+            lines.append('  重复 %d 次: %s' % (n, shape[:200]))
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_max_queries(limit, using=None):
+    """测试辅助：代码块内的查询次数不得超过 limit"""
+    with QueryRecorder(using) as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise QueryBudgetExceeded('查询次数 %d 超出预算 %d\n%s' % (recorder.count, limit, recorder.report()))
+
+
+def budget_for(url_name):
+    """按URL名称查找查询预算，未配置时返回 None"""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+class QueryCountMiddleware:
+    """统计每个请求的查询次数和耗时，检测 N+1，并在测试中执行查询预算"""
+
+    def __init__(self, get_response):
+        self.enforce = getattr(settings, 'QUERY_BUDGET_ENFORCE', False)
+        if not (settings.DEBUG or self.enforce):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        repeated = recorder.repeated()
+        url_name = getattr(request.resolver_match, 'view_name', None)
+        if repeated:
+            logger.warning('疑似 N+1 查询 %s %s\n%s', request.method, request.path, recorder.report())
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = '%.1f' % (recorder.total_time * 1000)
+            response['X-Query-Repeated'] = str(sum(n for _, n in repeated))
+        response.query_recorder = recorder
+
+        budget = budget_for(url_name)
+        if self.enforce and budget is not None and recorder.count > budget:
+            raise QueryBudgetExceeded('%s 查询次数 %d 超出预算 %d\n%s'
+                                      % (url_name, recorder.count, budget, recorder.report()))
+        return response
@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from .database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -35,9 +37,14 @@ INSTALLED_APPS = [
     'tieba_app',
     'post_app',
     'comment_app',
+    'message_app',
+    'search_app',
+    'media_app',
+    'outbox_app',
 ]
 
 MIDDLEWARE = [
+    'tieba_project.querycount.QueryCountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,13 +74,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'tieba_project.wsgi.application'
+ASGI_APPLICATION = 'tieba_project.asgi.application'
 
-# Database
+# Database（由环境变量选择 SQLite / MySQL / PostgreSQL，见 tieba_project/database.py）
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(os.environ, BASE_DIR),
 }
 
 # Password validation
@@ -142,6 +147,170 @@ AUTH_USER_MODEL = 'user_app.User'
 # Email configuration (for password reset)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# 统计字段写回配置（见 tieba_project/counters.py）
+COUNTER_BUFFER = {
+    'ENABLED': True,
+    'INTERVAL': 5.0,       # 刷新间隔（秒）
+    'MAX_PENDING': 1000,   # 攒够多少次增量立即刷新
+}
+
+# 帖子浏览记录采集配置（见 post_app/view_tracking.py）
+POST_VIEW_TRACKING = {
+    'DEDUPE_WINDOW': 1800,  # 同一访客重复浏览的去重窗口（秒）
+    'SAMPLE_RATE': 1.0,     # 匿名浏览写入历史的抽样比例
+    'BATCH_SIZE': 500,
+    'INTERVAL': 5.0,
+    'RETENTION_DAYS': 30,   # 超过天数的浏览历史压缩为每日汇总
+    # 反向代理的地址或网段（如 ['127.0.0.1', '10.0.0.0/8']），只有来自这些地址的
+    # 请求才信任 X-Forwarded-For；为空时访客IP一律取 REMOTE_ADDR
+    'TRUSTED_PROXIES': [],
+}
+
+# 帖子热度排行配置（见 post_app/hot_ranking.py）
+HOT_RANKING = {
+    'LIKE_WEIGHT': 3.0,
+    'COMMENT_WEIGHT': 5.0,
+    'VIEW_WEIGHT': 0.1,
+    'TIME_SCALE': 45000,    # 晚发该秒数的帖子相当于互动量多十倍
+    'WINDOW_DAYS': 7,       # 超过天数的帖子退出热门
+}
+
+# 首页动态配置（见 post_app/timeline.py）
+TIMELINE = {
+    'INBOX_SIZE': 800,                # 每人收件箱保留条数
+    'FANOUT_FOLLOWER_LIMIT': 5000,    # 粉丝数超过该值的作者改为读时拉取
+    'FANOUT_MEMBER_LIMIT': 10000,     # 成员数超过该值的贴吧改为读时拉取
+    'CHUNK_SIZE': 1000,
+}
+
+# 通知聚合（见 user_app/notifications.py）
+NOTIFICATIONS = {
+    'ENABLED': True,        # False 时每个事件立即写库（测试中使用）
+    'WINDOW': 86400,        # 同一目标的同类事件在该时间窗口内合并（秒）
+    'SAMPLE_ACTORS': 3,     # 每条通知保留的触发者样本数
+    'INTERVAL': 2.0,
+    'MAX_PENDING': 500,
+}
+
+# 实时推送（见 tieba_project/pubsub.py 和 tieba_project/websocket.py）
+REALTIME = {
+    # InProcessPubSub 只能推送给同一个 ASGI 进程里的连接，仅用于开发和测试；
+    # 多个 worker 或单独运行 run_outbox 时必须改为 tieba_project.pubsub.RedisPubSub
+    'BACKEND': 'tieba_project.pubsub.InProcessPubSub',
+    'REDIS_URL': 'redis://127.0.0.1:6379/2',
+    'QUEUE_SIZE': 100,      # 每个连接最多积压的推送条数
+}
+
+# SQL 查询预算（见 tieba_project/querycount.py），按 URL 名称配置；
+# 按最坏情况计：登录用户（JWT 认证查一次用户）、读缓存全部未命中
+# （点赞过滤器、权限表、贴吧头部各自重建），见 test_query_budgets.py；
+# 带头像的列表整页图片两次查询（原图、各规格）
+QUERY_BUDGETS = {
+    'tieba-post-list': 4,
+    'tieba-hot-posts': 3,
+    'timeline': 8,
+    'category-tieba-list': 5,
+    'tieba-detail': 8,
+    'notification-unread': 1,
+    'post-comment-list': 4,
+    'floor-reply-list': 3,
+    'message-inbox': 7,
+    'notification-list': 3,
+    'follower-list': 5,
+    'following-list': 5,
+}
+QUERY_BUDGET_ENFORCE = False  # 测试环境设为 True，超出预算直接报错
+N1_THRESHOLD = 5              # 同一结构的SQL重复多少次视为疑似 N+1
+
+# 两级读缓存配置（见 tieba_project/cache.py）
+READ_CACHE = {
+    'ALIAS': 'default',   # 共享缓存别名，测试中可指向 LocMemCache
+    'TIMEOUT': 300,       # 共享缓存过期时间（秒）
+    'LOCAL_SIZE': 1024,   # 进程内 LRU 条目数
+    'LOCAL_TTL': 5.0,     # 进程内条目过期时间（秒），也是跨进程失效的最大延迟
+}
+
+# 接口基准测试（见 tieba_project/benchmark.py 和 bench_endpoints 命令）
+BENCHMARK = {
+    'BASELINE': BASE_DIR / 'bench_baseline.json',
+    'ITERATIONS': 200,     # 每个场景的请求次数
+    'THRESHOLD': 0.2,      # p95 变慢超过 20% 视为回退
+    'MIN_DELTA_MS': 1.0,   # 小于该差值的变化视为抖动
+    # bench_matrix 命令的数据库组合：名称 -> 环境变量（见 tieba_project/database.py）
+    # SQLite 组合未指定 DATABASE_NAME 时使用临时文件，自动建表并生成数据
+    'MATRIX': {
+        'sqlite-wal': {'DATABASE_ENGINE': 'sqlite'},
+        'sqlite-rollback': {'DATABASE_ENGINE': 'sqlite',
+                            'DATABASE_PRAGMAS': 'journal_mode=delete,synchronous=full'},
+        # 'mysql': {'DATABASE_ENGINE': 'mysql', 'DATABASE_NAME': 'tieba_bench'},
+        # 'postgresql-pool': {'DATABASE_ENGINE': 'postgresql', 'DATABASE_POOL_SIZE': '10'},
+    },
+}
+
+# 图片处理流水线（见 media_app/pipeline.py）
+IMAGE_PIPELINE = {
+    # 规格名: (宽, 高, 是否裁剪)；高为 0 表示按宽等比缩放，不放大小图
+    'VARIANTS': {
+        'thumb': (160, 160, True),
+        'small': (480, 0, False),
+        'large': (1280, 0, False),
+    },
+    'FORMAT': 'WEBP',   # Pillow 不支持 WebP 时自动改用 JPEG
+    'QUALITY': 82,
+    'WORKERS': 2,       # Web 进程内生成规格的线程数
+    'INLINE': False,    # 测试环境设为 True，上传后同步生成
+}
+
+# 点赞服务（见 tieba_project/likes.py）
+LIKES = {
+    'ERROR_RATE': 0.01,   # 布隆过滤器误判率（误判只会多一次确认查询）
+    'MAX_ITEMS': 20000,   # 赞过的数量超过该值的用户不建过滤器，直接查库
+    'TIMEOUT': 3600,      # 过滤器在共享缓存中的过期时间（秒）
+}
+
+# 事务性 outbox 与后台任务（见 outbox_app/outbox.py，执行：manage.py run_outbox）
+OUTBOX = {
+    'WORKERS': 2,            # run_outbox 子进程数
+    'BATCH_SIZE': 100,       # 每次交给一个子进程的任务数（同类任务合并执行）
+    'POLL_INTERVAL': 1.0,    # 没有到期任务时的轮询间隔（秒）
+    'LEASE': 300,            # 领取后超过该秒数未完成，任务可被重新领取
+    'MAX_ATTEMPTS': 8,       # 超过该次数仍失败的任务放弃
+    'RETRY_BASE': 5,         # 第 n 次失败后等待 RETRY_BASE * 2^(n-1) 秒
+    'RETRY_MAX': 3600,
+    'KEEP_DONE': 7 * 86400,  # 已完成任务保留秒数
+    'PRUNE_INTERVAL': 3600,
+    'INLINE': False,         # 测试环境设为 True，事务提交后在当前进程执行
+}
+
+# 评论 @提及（见 comment_app/mentions.py）
+MENTIONS = {
+    'MAX_PER_COMMENT': 10,   # 每条评论最多解析的被@用户数
+    'CACHE_SIZE': 10000,     # 进程内 用户名->用户ID 缓存条数
+    'CACHE_TTL': 300,        # 缓存秒数（新注册、改名的用户最多延迟这么久才能被@到）
+}
+
+# 私信附件分片上传（见 message_app/uploads.py）
+UPLOADS = {
+    'CHUNK_SIZE': 8 << 20,            # 默认分片大小
+    'MIN_CHUNK_SIZE': 256 << 10,
+    'MAX_CHUNK_SIZE': 64 << 20,
+    'MAX_SIZE': 4 << 30,              # 单个附件上限
+    'TEMP_DIR': 'uploads/partial',    # 相对 MEDIA_ROOT，须与正式文件在同一文件系统（完成时原地改名）
+    'EXPIRES': 24 * 3600,             # 未完成的上传会话保留秒数
+    'FREE_SPACE_RESERVE': 512 << 20,  # 创建会话时要求剩余磁盘空间比文件大出的字节数
+    'THUMBNAIL_MAX_SIZE': 32 << 20,   # 超过此大小的图片附件不生成缩略图
+}
+
+# 受保护文件下载（见 tieba_project/downloads.py）
+DOWNLOADS = {
+    # None：Django 流式发送（支持 Range）；'x-accel'：Nginx；'x-sendfile'：Apache/Lighttpd
+    'OFFLOAD': None,
+    'ACCEL_PREFIX': '/protected-media/',  # Nginx 中指向 MEDIA_ROOT 的 internal location
+}
+
+# 全文搜索后端：auto（SQLite且支持FTS5时用FTS5，否则用倒排表）/ fts5 / table
+SEARCH_BACKEND = 'auto'
+
 # Redis configuration (for caching)
 CACHES = {
     'default': {
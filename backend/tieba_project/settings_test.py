@@ -0,0 +1,29 @@
+"""
+测试配置：python manage.py test --settings=tieba_project.settings_test
+
+不依赖 Redis；缓冲、后台任务和图片处理都改为同步执行，测试里写入后
+立即可以断言结果。SQLite 测试库用文件而不是内存库，多线程测试中各线程的
+连接才能看到同一个库。
+"""
+
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['default']['TEST'] = {'NAME': str(Path(tempfile.gettempdir()) / 'tieba_test.sqlite3')}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+COUNTER_BUFFER = {'ENABLED': False}
+
+# 超出 QUERY_BUDGETS 的请求直接报错（见 test_query_budgets.py）
+QUERY_BUDGET_ENFORCE = True
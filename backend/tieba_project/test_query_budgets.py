@@ -0,0 +1,148 @@
+"""
+接口查询预算：settings_test 打开 QUERY_BUDGET_ENFORCE，QueryCountMiddleware
+在超出 QUERY_BUDGETS 时直接抛出 QueryBudgetExceeded。
+
+每个配了预算的接口分别以匿名、登录身份，在缓存为空和缓存已热两种状态下
+请求一遍；数据里每页都有多个作者、回复、点赞，N+1 会被放大到超出预算。
+"""
+
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PIL import Image
+
+from comment_app.models import Comment, CommentLike
+from media_app import pipeline
+from message_app import conversations
+from post_app.models import Post, PostLike, TimelineEntry
+from tieba_app import cache as tieba_cache
+from tieba_app import permissions
+from tieba_app.models import Tieba, TiebaAdmin, TiebaAnnouncement, TiebaCategory, TiebaMember
+from tieba_project import likes
+from user_app import graph, notifications
+from user_app.models import FollowRelation, User
+
+from .querycount import QueryBudgetExceeded, assert_max_queries
+
+USERS = 6
+POSTS = 8
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def clear_caches():
+    caches['default'].clear()
+    for versioned in (tieba_cache.tieba_cache, permissions.access_cache, graph.graph_cache, likes._cache):
+        versioned.local.clear()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user('user%d' % i, 'user%d@example.com' % i, 'pass') for i in range(USERS)]
+        for i, user in enumerate(cls.users):
+            pipeline.attach(user, 'avatar', image((i, 0, 0)))
+        owner = cls.users[0]
+        cls.category = TiebaCategory.objects.create(name='category')
+        cls.tiebas = [Tieba.objects.create(name='tieba%d' % i, category=cls.category, owner=owner) for i in range(3)]
+        cls.tieba = cls.tiebas[0]
+        for i, tieba in enumerate(cls.tiebas):
+            pipeline.attach(tieba, 'avatar', image((0, i, 0)))
+        pipeline.attach(cls.tieba, 'banner', image((0, 0, 1)))
+        for user in cls.users:
+            TiebaMember.objects.create(tieba=cls.tieba, user=user)
+        TiebaAdmin.objects.create(tieba=cls.tieba, user=cls.users[1])
+        TiebaAnnouncement.objects.create(tieba=cls.tieba, author=owner, title='notice', content='notice')
+
+        cls.posts = [Post.objects.create(tieba=cls.tieba, author=cls.users[i % USERS], title='post%d' % i,
+                                         content='content') for i in range(POSTS)]
+        cls.post = cls.posts[-1]
+        for i, user in enumerate(cls.users):
+            floor = Comment.objects.create(post=cls.post, author=user, content='floor %d' % i)
+            PostLike.objects.create(post=cls.posts[i], user=cls.users[0])
+            CommentLike.objects.create(comment=floor, user=cls.users[0])
+        cls.floor = Comment.objects.filter(post=cls.post, parent=None).first()
+        reply = cls.floor
+        for user in cls.users[1:]:
+            reply = Comment.objects.create(post=cls.post, author=user, parent=reply, content='reply')
+
+        for follower in cls.users[1:]:
+            FollowRelation.objects.create(follower=follower, following=owner)
+            FollowRelation.objects.create(follower=owner, following=follower)
+        TimelineEntry.objects.bulk_create([TimelineEntry(owner=owner, post=post) for post in cls.posts])
+
+        for i, user in enumerate(cls.users[1:]):
+            notifications.notify(owner.pk, 'post_like', 'post:%d' % cls.posts[i].pk, user.pk, 'liked')
+            conversations.send_message(user.pk, owner.pk, 'hello %d' % i)
+        notifications.flush()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def requests(self):
+        """[(URL名, URL)]，覆盖 QUERY_BUDGETS 中的每个接口"""
+        owner = self.users[0]
+        return [
+            ('tieba-post-list', reverse('tieba-post-list', args=[self.tieba.pk])),
+            ('tieba-hot-posts', reverse('tieba-hot-posts', args=[self.tieba.pk])),
+            ('timeline', reverse('timeline')),
+            ('category-tieba-list', reverse('category-tieba-list', args=[self.category.pk])),
+            ('tieba-detail', reverse('tieba-detail', args=[self.tieba.pk])),
+            ('notification-unread', reverse('notification-unread')),
+            ('post-comment-list', reverse('post-comment-list', args=[self.post.pk])),
+            ('floor-reply-list', reverse('floor-reply-list', args=[self.floor.pk])),
+            ('message-inbox', reverse('message-inbox')),
+            ('notification-list', reverse('notification-list')),
+            ('follower-list', reverse('follower-list', args=[owner.pk])),
+            ('following-list', reverse('following-list', args=[owner.pk])),
+        ]
+
+    def get(self, url, user=None):
+        headers = {'HTTP_AUTHORIZATION': 'Bearer %s' % AccessToken.for_user(user)} if user else {}
+        return self.client.get(url, **headers)
+
+    def test_every_budget_is_exercised(self):
+        self.assertEqual({name for name, _ in self.requests()}, set(settings.QUERY_BUDGETS))
+
+    def test_endpoints_stay_within_budget(self):
+        self.assertTrue(settings.QUERY_BUDGET_ENFORCE)
+        owner = self.users[0]
+        for name, url in self.requests():
+            for user in (None, owner):
+                clear_caches()
+                for state in ('cold', 'warm'):
+                    with self.subTest(name=name, user=user and user.username, cache=state):
+                        response = self.get(url, user)
+                        # 需要登录的接口匿名请求返回 401，同样受预算约束
+                        self.assertIn(response.status_code, (200, 401))
+                        self.assertLessEqual(response.query_recorder.count, settings.QUERY_BUDGETS[name])
+
+    def test_over_budget_raises(self):
+        with self.settings(QUERY_BUDGETS={'tieba-post-list': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.get(reverse('tieba-post-list', args=[self.tieba.pk]))
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(1):
+            list(User.objects.all())
+        with self.assertRaises(QueryBudgetExceeded):
+            with assert_max_queries(1):
+                list(User.objects.all())
+                list(Post.objects.all())
@@ -0,0 +1,145 @@
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from . import counters
+from .batching import BatchBuffer
+from .cache import LocalLRU
+from .counters import CounterBuffer, counters_flushed
+from .database import SQLITE_TIMEOUT, database_config
+from .websocket import Router
+
+
+class ListBuffer(BatchBuffer):
+
+    def __init__(self, *args, **kwargs):
+        self.items = []
+        super().__init__(*args, **kwargs)
+
+    def empty(self):
+        return []
+
+    def merge(self, pending, item):
+        pending.append(item)
+
+    def write(self, batch):
+        self.items.extend(batch)
+
+
+class BatchBufferTests(TransactionTestCase):
+
+    def test_full_buffer_flushes_inline_outside_transaction(self):
+        buffer = ListBuffer('test', interval=3600, max_pending=2)
+        buffer.add(1)
+        buffer.add(2)
+        self.assertEqual(buffer.items, [1, 2])
+
+    def test_full_buffer_waits_for_commit(self):
+        buffer = ListBuffer('test', interval=3600, max_pending=2)
+        with transaction.atomic():
+            buffer.add(1)
+            buffer.add(2)
+            self.assertEqual(buffer.items, [])
+        self.assertEqual(buffer.items, [1, 2])
+
+    def test_rollback_keeps_pending_items(self):
+        buffer = ListBuffer('test', interval=3600, max_pending=2)
+        try:
+            with transaction.atomic():
+                buffer.add(1)
+                buffer.add(2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(buffer.items, [])
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(buffer.items, [1, 2])
+
+
+class CounterBufferTests(TransactionTestCase):
+
+    def test_failing_receiver_does_not_reapply_deltas(self):
+        user = get_user_model().objects.create_user('counter', 'counter@example.com', 'pass')
+        buffer = CounterBuffer('test-counters', interval=3600, max_pending=1000)
+
+        def broken(sender, deltas, **kwargs):
+            raise RuntimeError('receiver failed')
+
+        counters_flushed.connect(broken)
+        try:
+            buffer.add((user._meta.label, user.pk, 'post_count', 3))
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(buffer.flush(), 0)
+        finally:
+            counters_flushed.disconnect(broken)
+        user.refresh_from_db()
+        self.assertEqual(user.post_count, 3)
+
+    @override_settings(COUNTER_BUFFER={'ENABLED': True})
+    def test_rolled_back_delta_is_dropped(self):
+        user = get_user_model().objects.create_user('counter', 'counter@example.com', 'pass')
+        try:
+            with transaction.atomic():
+                counters.incr(get_user_model(), user.pk, 'post_count')
+                self.assertEqual(counters.pending(get_user_model(), user.pk, 'post_count'), 0)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(counters.pending(get_user_model(), user.pk, 'post_count'), 0)
+        with transaction.atomic():
+            counters.incr(get_user_model(), user.pk, 'post_count')
+        self.assertEqual(counters.pending(get_user_model(), user.pk, 'post_count'), 1)
+        counters.flush()
+        user.refresh_from_db()
+        self.assertEqual(user.post_count, 1)
+
+
+class LifespanTests(SimpleTestCase):
+
+    def test_router_completes_lifespan_without_django(self):
+        async def http_application(scope, receive, send):
+            raise AssertionError('lifespan 不应转给 Django')
+
+        incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(Router(http_application)({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+class DatabaseConfigTests(SimpleTestCase):
+
+    def test_no_persistent_connections_under_asgi(self):
+        self.assertEqual(database_config({}, settings.BASE_DIR)['CONN_MAX_AGE'], 60)
+        self.assertEqual(database_config({'DJANGO_ASGI': '1'}, settings.BASE_DIR)['CONN_MAX_AGE'], 0)
+        env = {'DJANGO_ASGI': '1', 'DATABASE_CONN_MAX_AGE': '30'}
+        self.assertEqual(database_config(env, settings.BASE_DIR)['CONN_MAX_AGE'], 30)
+
+    def test_sqlite_lock_wait_has_one_source(self):
+        options = database_config({}, settings.BASE_DIR)['OPTIONS']
+        self.assertEqual(options['timeout'], SQLITE_TIMEOUT)
+        self.assertNotIn('busy_timeout', options['pragmas'])
+        options = database_config({'DATABASE_PRAGMAS': 'journal_mode=wal,busy_timeout=3000'}, settings.BASE_DIR)['OPTIONS']
+        self.assertEqual(options, {'timeout': 3, 'pragmas': {'journal_mode': 'wal'}})
+
+
+class LocalCopyTests(TransactionTestCase):
+
+    def test_copies_keep_prefetched_rows(self):
+        User = get_user_model()
+        User.objects.create_user('cached', 'cached@example.com', 'pass')
+        local = LocalLRU(copy_values=True)
+        local.set('users', list(User.objects.prefetch_related('notifications')))
+        first, second = local.get('users'), local.get('users')
+        self.assertIsNot(first[0], second[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(list(first[0].notifications.all()), [])
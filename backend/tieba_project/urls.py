@@ -11,6 +11,8 @@ urlpatterns = [
     path('api/tieba/', include('tieba_app.urls')),
     path('api/posts/', include('post_app.urls')),
     path('api/comments/', include('comment_app.urls')),
+    path('api/messages/', include('message_app.urls')),
+    path('api/search/', include('search_app.urls')),
 ]
 
 # Serve media files in development
@@ -0,0 +1,95 @@
+"""
+实时推送 WebSocket（原生 ASGI 应用，不依赖 Channels）
+
+连接地址 /ws/push/?token=<JWT access token>。浏览器无法给 WebSocket 设置
+请求头，所以令牌放在查询参数里；只校验签名和过期时间，不查数据库，
+空闲连接除了一个队列之外不占用其他资源。
+
+连接后订阅个人频道和全站广播频道，服务端推送 JSON 文本帧：
+    {"type": "private_message", ...}
+    {"type": "notification", ...}
+    {"type": "system_message", ...}
+客户端发送 "ping" 时回复 "pong"，其他消息忽略。
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from .async_views import user_id_from_token
+from .pubsub import BROADCAST, get_pubsub, user_channel
+
+PATH = '/ws/push/'
+CLOSE_UNAUTHORIZED = 4401
+
+
+def authenticate(scope):
+    """从查询参数中的 JWT 取出用户ID，无效时返回 None"""
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    return user_id_from_token(token) if token else None
+
+
+async def push_application(scope, receive, send):
+    """推送连接的 ASGI 应用"""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    user_id = authenticate(scope)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    await send({'type': 'websocket.accept'})
+
+    hub = get_pubsub()
+    subscription = await hub.subscribe([user_channel(user_id), BROADCAST])
+    receiving = asyncio.ensure_future(receive())
+    sending = asyncio.ensure_future(subscription.queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, sending}, return_when=asyncio.FIRST_COMPLETED)
+            if receiving in done:
+                event = receiving.result()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event.get('text') == 'ping':
+                    await send({'type': 'websocket.send', 'text': 'pong'})
+                receiving = asyncio.ensure_future(receive())
+            if sending in done:
+                message = sending.result()
+                await send({'type': 'websocket.send',
+                            'text': json.dumps(message, ensure_ascii=False, default=str)})
+                sending = asyncio.ensure_future(subscription.queue.get())
+    finally:
+        receiving.cancel()
+        sending.cancel()
+        await hub.unsubscribe(subscription)
+
+
+async def lifespan(receive, send):
+    """
+    服务器启动/关闭事件（ASGI lifespan）：Django 的 ASGIHandler 不处理这类连接，
+    这里直接完成握手；推送没有需要在启动时初始化的资源
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+class Router:
+    """按协议分流：HTTP 交给 Django，推送路径上的 WebSocket 交给 push_application，lifespan 自行应答"""
+
+    def __init__(self, http_application):
+        self.http_application = http_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        if scope['type'] == 'websocket':
+            if scope['path'] == PATH:
+                return await push_application(scope, receive, send)
+            await receive()
+            return await send({'type': 'websocket.close', 'code': 4404})
+        return await self.http_application(scope, receive, send)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class UserAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'user_app'
+    verbose_name = '用户'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,136 @@
+"""
+关注关系服务
+
+- 关注/取关在一个事务里同时插入（删除）关系行和更新双方的
+  follower_count / following_count，计数不经过写回缓冲，始终与关系表一致；
+  重复关注、重复取关都是幂等的
+- 粉丝/关注列表按 (following, created_at, id) / (follower, created_at, id)
+  索引做游标分页；没有游标的第一页结果放进两级缓存，关注变化时失效
+- "是否关注"批量判断用一条 IN 查询，走 (follower, following) 唯一索引；
+  关注数不多的用户直接缓存整个关注ID集合，判断不查库
+- 互相关注、共同关注、"我关注的人里谁关注了他"都是一条半连接（EXISTS / IN
+  子查询）查询，不把任何一方的全部关系读进内存
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Greatest
+
+from tieba_project.cache import VersionedCache
+
+from .models import FollowRelation, User
+
+graph_cache = VersionedCache('graph')
+
+# 关注数不超过该值时缓存完整的关注ID集合
+FOLLOWING_SET_LIMIT = 2000
+
+
+def user_group(user_id):
+    return 'u%s' % user_id
+
+
+def _invalidate(*user_ids):
+    for user_id in user_ids:
+        graph_cache.invalidate(user_group(user_id))
+
+
+def follow(follower_id, following_id):
+    """关注，已关注时什么也不做；返回本次是否新增"""
+    if follower_id == following_id:
+        raise ValueError('不能关注自己')
+    try:
+        with transaction.atomic():
+            FollowRelation.objects.create(follower_id=follower_id, following_id=following_id)
+            User.objects.filter(pk=follower_id).update(following_count=F('following_count') + 1)
+            User.objects.filter(pk=following_id).update(follower_count=F('follower_count') + 1)
+            transaction.on_commit(lambda: _invalidate(follower_id, following_id))
+    except IntegrityError:
+        # 已经关注过（并发重复请求时唯一约束冲突），整个事务回滚，计数不变
+        return False
+    return True
+
+
+def unfollow(follower_id, following_id):
+    """取消关注，没关注时什么也不做；返回本次是否删除"""
+    with transaction.atomic():
+        deleted, _ = FollowRelation.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+        if not deleted:
+            return False
+        User.objects.filter(pk=follower_id).update(following_count=Greatest(F('following_count') - 1, 0))
+        User.objects.filter(pk=following_id).update(follower_count=Greatest(F('follower_count') - 1, 0))
+        transaction.on_commit(lambda: _invalidate(follower_id, following_id))
+    return True
+
+
+def followers(user_id):
+    """粉丝关系（按关注时间倒序分页用）"""
+    return FollowRelation.objects.filter(following_id=user_id)
+
+
+def following(user_id):
+    """关注关系（按关注时间倒序分页用）"""
+    return FollowRelation.objects.filter(follower_id=user_id)
+
+
+def first_page(user_id, side, loader):
+    """粉丝/关注列表第一页的缓存，loader() 返回翻页链接和这一页的关系ID（不含用户资料）"""
+    return graph_cache.get_or_load(user_group(user_id), '%s_page' % side, loader)
+
+
+def _following_set(user_id):
+    def load():
+        ids = list(following(user_id).values_list('following_id', flat=True)[:FOLLOWING_SET_LIMIT + 1])
+        return None if len(ids) > FOLLOWING_SET_LIMIT else frozenset(ids)
+    return graph_cache.get_or_load(user_group(user_id), 'following_ids', load)
+
+
+def following_ids(user_id, candidate_ids):
+    """candidate_ids 中 user_id 关注了的ID集合"""
+    candidate_ids = set(candidate_ids)
+    if not user_id or not candidate_ids:
+        return set()
+    cached = _following_set(user_id)
+    if cached is not None:
+        return candidate_ids & cached
+    return set(following(user_id).filter(following_id__in=candidate_ids)
+               .values_list('following_id', flat=True))
+
+
+def follower_ids(user_id, candidate_ids):
+    """candidate_ids 中关注了 user_id 的ID集合"""
+    candidate_ids = set(candidate_ids)
+    if not user_id or not candidate_ids:
+        return set()
+    return set(followers(user_id).filter(follower_id__in=candidate_ids)
+               .values_list('follower_id', flat=True))
+
+
+def relationships(user_id, other_ids):
+    """批量查询关系 {对方ID: {'following': 我是否关注他, 'followed_by': 他是否关注我}}"""
+    outgoing = following_ids(user_id, other_ids)
+    incoming = follower_ids(user_id, other_ids)
+    return {other_id: {'following': other_id in outgoing, 'followed_by': other_id in incoming}
+            for other_id in other_ids}
+
+
+def is_following(follower_id, following_id):
+    return following_id in following_ids(follower_id, [following_id])
+
+
+def mutual(user_id):
+    """与 user_id 互相关注的关系行（user_id 关注对方的那一行，following 为对方）"""
+    return following(user_id).filter(
+        Exists(FollowRelation.objects.filter(follower_id=OuterRef('following_id'), following_id=user_id)))
+
+
+def common_following(user_id, other_id):
+    """两人共同关注的人（user_id 一侧的关系行）"""
+    return following(user_id).filter(
+        following_id__in=following(other_id).values('following_id'))
+
+
+def known_followers(viewer_id, user_id):
+    """user_id 的粉丝中 viewer_id 关注了的人（"你关注的 xx 也关注了他"）"""
+    return followers(user_id).filter(
+        follower_id__in=following(viewer_id).values('following_id'))
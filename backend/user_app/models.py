@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 class User(AbstractUser):
     """自定义用户模型"""
@@ -17,6 +18,7 @@ class User(AbstractUser):
     comment_count = models.IntegerField(default=0)
     follower_count = models.IntegerField(default=0)
     following_count = models.IntegerField(default=0)
+    unread_notification_count = models.IntegerField(default=0)  # 随通知写入/已读维护
     
     # 状态字段
     is_verified = models.BooleanField(default=False)
@@ -62,6 +64,11 @@ class FollowRelation(models.Model):
         unique_together = ('follower', 'following')
         verbose_name = '关注关系'
         verbose_name_plural = '关注关系'
+        indexes = [
+            # 粉丝列表 / 关注列表按关注时间倒序的游标分页
+            models.Index(fields=['following', 'created_at', 'id']),
+            models.Index(fields=['follower', 'created_at', 'id']),
+        ]
 
 class UserNotification(models.Model):
     """用户通知"""
@@ -69,6 +76,7 @@ class UserNotification(models.Model):
         ('post_like', '帖子点赞'),
         ('post_comment', '帖子评论'),
         ('comment_reply', '评论回复'),
+        ('comment_mention', '评论提及'),
         ('follow', '关注'),
         ('system', '系统通知'),
     ]
@@ -81,8 +89,19 @@ class UserNotification(models.Model):
     related_url = models.URLField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # 聚合：同一窗口内对同一目标的同类事件合并成一条通知
+    target_key = models.CharField(max_length=64, blank=True)  # 例如 "post:123"
+    actor_count = models.IntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)  # 最近几个触发者的用户ID
+    updated_at = models.DateTimeField(default=timezone.now)  # 最近一次事件的时间
+    
     class Meta:
         db_table = 'user_notification'
         verbose_name = '用户通知'
         verbose_name_plural = '用户通知'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+            # 查找窗口内可合并的未读通知
+            models.Index(fields=['user', 'target_key', 'notification_type', 'is_read']),
+        ]
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+通知聚合（fan-in）
+
+热门帖子被点赞几万次时，不再给作者写几万条通知：同一用户、同一目标
+（target_key，例如 "post:123"）的同类事件，在 WINDOW 秒内合并到同一条
+未读通知上，只累加 actor_count 并保留最近 SAMPLE_ACTORS 个触发者，
+前端显示为 "A、B 等 N 人赞了你的帖子"。
+
+事件先进入进程内缓冲（tieba_project.batching），同一键的事件在内存中
+先合并，刷新时一次查出所有可合并的通知：能合并的批量更新，其余的
+bulk_create。多个进程同时刷新时按接收者的用户行加锁串行，同一目标
+只会有一条未读的聚合通知。
+
+未读数保存在 User.unread_notification_count，新建通知、标记已读时在
+同一事务中维护，读取未读数不再 COUNT(*)。
+
+事件在调用方事务提交后才进入缓冲：点赞、关注被回滚时不会留下通知。
+
+配置见 settings.NOTIFICATIONS，ENABLED 为 False 时每个事件立即写库。
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from tieba_project import pubsub
+from tieba_project.batching import BatchBuffer
+
+from .models import User, UserNotification
+
+
+def _config(key, default):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(key, default)
+
+
+def _add_actor(actors, actor_id, limit):
+    """把触发者放到样本末尾（去重），只保留最近 limit 个"""
+    if actor_id in actors:
+        actors.remove(actor_id)
+    actors.append(actor_id)
+    del actors[:-limit]
+
+
+class NotificationBuffer(BatchBuffer):
+    """按 (用户, 类型, 目标) 合并事件"""
+
+    def empty(self):
+        return {}
+
+    def merge(self, pending, item):
+        key = (item['user_id'], item['notification_type'], item['target_key'])
+        event = pending.get(key)
+        if event is None:
+            pending[key] = dict(item, actors=[], count=0)
+            event = pending[key]
+        else:
+            event.update(title=item['title'], content=item['content'], at=item['at'])
+        _add_actor(event['actors'], item['actor_id'], _config('SAMPLE_ACTORS', 3))
+        event['count'] += item.get('count', 1)
+
+    def iter_items(self, batch):
+        for event in batch.values():
+            for i, actor_id in enumerate(event['actors']):
+                # 失败回滚时把累计次数挂在最后一个样本上
+                count = event['count'] - len(event['actors']) + 1 if i == len(event['actors']) - 1 else 1
+                yield dict(event, actor_id=actor_id, count=count)
+
+    def write(self, batch):
+        write_events(batch.values())
+
+
+def write_events(events):
+    """把合并后的事件写入数据库"""
+    events = list(events)
+    if not events:
+        return
+    limit = _config('SAMPLE_ACTORS', 3)
+    cutoff = timezone.now() - timedelta(seconds=_config('WINDOW', 86400))
+    condition = Q()
+    for event in events:
+        condition |= Q(user_id=event['user_id'], target_key=event['target_key'],
+                       notification_type=event['notification_type'])
+
+    with transaction.atomic():
+        # 先按ID顺序锁住接收者的用户行：并发写入同一用户的通知时串行执行，后提交的
+        # 一方能查到先提交的未读通知并合并进去，不会为同一目标各建一条
+        list(User.objects.select_for_update()
+             .filter(pk__in={event['user_id'] for event in events})
+             .order_by('pk').values_list('pk', flat=True))
+        open_rows = {
+            (n.user_id, n.notification_type, n.target_key): n
+            for n in (UserNotification.objects
+                      .select_for_update()
+                      .filter(condition, is_read=False, created_at__gte=cutoff)
+                      .order_by('id'))
+        }
+        updated, created = [], []
+        for event in events:
+            row = open_rows.get((event['user_id'], event['notification_type'], event['target_key']))
+            if row is None:
+                created.append(UserNotification(
+                    user_id=event['user_id'], notification_type=event['notification_type'],
+                    target_key=event['target_key'], title=event['title'], content=event['content'],
+                    related_url=event['related_url'], actor_count=event['count'],
+                    sample_actors=event['actors'], updated_at=event['at'],
+                ))
+                continue
+            for actor_id in event['actors']:
+                _add_actor(row.sample_actors, actor_id, limit)
+            row.actor_count += event['count']
+            row.title, row.content, row.updated_at = event['title'], event['content'], event['at']
+            updated.append(row)
+
+        if updated:
+            UserNotification.objects.bulk_update(
+                updated, ['actor_count', 'sample_actors', 'title', 'content', 'updated_at'])
+        if created:
+            UserNotification.objects.bulk_create(created)
+            # 新增的未读通知数相同的用户合并成一条 UPDATE
+            groups = defaultdict(list)
+            for user_id, n in Counter(n.user_id for n in created).items():
+                groups[n].append(user_id)
+            for n, user_ids in groups.items():
+                User.objects.filter(pk__in=user_ids).update(
+                    unread_notification_count=F('unread_notification_count') + n)
+        transaction.on_commit(lambda: _push(created, updated))
+
+
+def _push(created, updated):
+    """把新建/合并后的通知推送给在线用户，新建的通知未读数加一"""
+    for notification, delta in [(n, 1) for n in created] + [(n, 0) for n in updated]:
+        pubsub.publish_to_user(notification.user_id, {
+            'type': 'notification',
+            'id': notification.pk,
+            'notification_type': notification.notification_type,
+            'target_key': notification.target_key,
+            'title': notification.title,
+            'actor_count': notification.actor_count,
+            'sample_actors': notification.sample_actors,
+            'unread_delta': delta,
+        })
+
+
+_buffer = NotificationBuffer('notifications',
+                             interval=_config('INTERVAL', 2.0),
+                             max_pending=_config('MAX_PENDING', 500))
+
+
+def _event(user_id, notification_type, target_key, actor_id, title, content='', related_url='', at=None):
+    return {
+        'user_id': user_id, 'notification_type': notification_type, 'target_key': target_key,
+        'actor_id': actor_id, 'title': title, 'content': content, 'related_url': related_url,
+        'at': at or timezone.now(),
+    }
+
+
+def notify(user_id, notification_type, target_key, actor_id, title, content='', related_url=''):
+    """记录一次通知事件；自己触发的事件不通知"""
+    if user_id is None or user_id == actor_id:
+        return
+    item = _event(user_id, notification_type, target_key, actor_id, title, content, related_url)
+    if not _config('ENABLED', True):
+        buffer = {}
+        _buffer.merge(buffer, item)
+        write_events(buffer.values())
+        return
+    # 模型信号里调用时要等事务提交；不在事务中时立即执行
+    transaction.on_commit(partial(_buffer.add, item))
+
+
+def notify_now(events):
+    """
+    立即写入一批通知事件（每个事件是 notify() 的关键字参数），不经过缓冲，
+    在调用方的事务中执行（后台任务用）
+    """
+    batch = {}
+    for event in events:
+        if event['user_id'] is not None and event['user_id'] != event['actor_id']:
+            _buffer.merge(batch, _event(**event))
+    write_events(batch.values())
+
+
+def flush():
+    """立即写入缓冲中的通知事件"""
+    return _buffer.flush()
+
+
+def unread_count(user_id):
+    return (User.objects.filter(pk=user_id)
+            .values_list('unread_notification_count', flat=True)
+            .first()) or 0
+
+
+def mark_read(user_id, notification_ids):
+    """标记指定通知为已读，返回标记的条数"""
+    with transaction.atomic():
+        marked = (UserNotification.objects
+                  .filter(user_id=user_id, pk__in=notification_ids, is_read=False)
+                  .update(is_read=True))
+        if marked:
+            User.objects.filter(pk=user_id).update(
+                unread_notification_count=Greatest(F('unread_notification_count') - marked, 0))
+            transaction.on_commit(lambda: pubsub.publish_to_user(user_id, {
+                'type': 'unread', 'scope': 'notifications', 'delta': -marked}))
+    return marked
+
+
+def mark_all_read(user_id):
+    with transaction.atomic():
+        marked = UserNotification.objects.filter(user_id=user_id, is_read=False).update(is_read=True)
+        User.objects.filter(pk=user_id).update(unread_notification_count=0)
+        if marked:
+            transaction.on_commit(lambda: pubsub.publish_to_user(user_id, {
+                'type': 'unread', 'scope': 'notifications', 'delta': -marked}))
+    return marked
@@ -0,0 +1,11 @@
+from tieba_project.pagination import KeysetPagination
+
+
+class RecentFirstPagination(KeysetPagination):
+    """按创建时间倒序的游标分页（通知、粉丝/关注列表）"""
+    ordering = ('-created_at', '-id')
+
+
+class NotificationPagination(KeysetPagination):
+    """通知按最近一次事件时间倒序，配合 (user, updated_at, id) 索引"""
+    ordering = ('-updated_at', '-id')
@@ -0,0 +1,40 @@
+from rest_framework import serializers
+
+from media_app.serializers import AssetImageField, AssetImagesMixin, AssetListSerializer
+
+from .models import User, UserNotification
+
+
+class UserBriefSerializer(AssetImagesMixin, serializers.ModelSerializer):
+    """用户简要信息，avatar_image 为头像的各规格（见 media_app）"""
+    avatar_image = AssetImageField(source='avatar')
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'nickname', 'avatar', 'avatar_image', 'follower_count']
+        list_serializer_class = AssetListSerializer
+
+
+class FollowRelationSerializer(serializers.Serializer):
+    """粉丝/关注列表中的一项，side 为 follower 或 following，表示列出哪一方"""
+    user = serializers.SerializerMethodField()
+    followed_at = serializers.DateTimeField(source='created_at')
+
+    class Meta:
+        list_serializer_class = AssetListSerializer
+
+    def image_names(self, items):
+        users = [getattr(item, self.context['side']) for item in items]
+        return [user.avatar.name for user in users if user.avatar]
+
+    def get_user(self, obj):
+        return UserBriefSerializer(getattr(obj, self.context['side']), context=self.context).data
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """用户通知序列化器"""
+
+    class Meta:
+        model = UserNotification
+        fields = ['id', 'notification_type', 'target_key', 'title', 'content', 'is_read', 'related_url',
+                  'actor_count', 'sample_actors', 'created_at', 'updated_at']
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import notifications
+from .models import FollowRelation
+
+
+@receiver(post_save, sender=FollowRelation)
+def user_followed(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify(instance.following_id, 'follow', 'user:%d' % instance.following_id,
+                             instance.follower_id, '你有新的粉丝')
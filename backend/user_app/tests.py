@@ -0,0 +1,104 @@
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from post_app.models import Post
+from tieba_app.models import Tieba
+
+from . import graph, notifications
+from .models import FollowRelation, User, UserNotification
+
+
+def auth(user):
+    return {'HTTP_AUTHORIZATION': 'Bearer %s' % AccessToken.for_user(user)}
+
+
+@override_settings(NOTIFICATIONS={'ENABLED': False})
+class NotificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', 'author@example.com', 'pass')
+        cls.fans = [User.objects.create_user('fan%d' % i, 'fan%d@example.com' % i, 'pass') for i in range(3)]
+        tieba = Tieba.objects.create(name='tieba', owner=cls.author)
+        cls.post = Post.objects.create(tieba=tieba, author=cls.author, title='title', content='content')
+
+    def test_events_for_one_target_share_an_open_row(self):
+        for fan in self.fans:
+            notifications.notify(self.author.pk, 'post_like', 'post:%d' % self.post.pk, fan.pk, 'liked')
+        row = UserNotification.objects.get(user=self.author)
+        self.assertEqual(row.actor_count, 3)
+        self.assertEqual(notifications.unread_count(self.author.pk), 1)
+
+    def test_like_notification_does_not_reload_the_post(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(reverse('post-like', args=[self.post.pk]), **auth(self.fans[0]))
+        self.assertEqual(response.status_code, 200)
+        post_reads = [q['sql'] for q in queries.captured_queries
+                      if q['sql'].startswith('SELECT') and 'FROM "post" ' in q['sql']]
+        self.assertEqual(len(post_reads), 1)
+        self.assertTrue(UserNotification.objects.filter(user=self.author, notification_type='post_like').exists())
+
+    def test_read_view_rejects_non_integer_ids(self):
+        url = reverse('notification-read')
+        for ids in (['1'], [1.5], [True], 'all', {'id': 1}):
+            with self.subTest(ids=ids):
+                response = self.client.post(url, {'ids': ids}, content_type='application/json', **auth(self.author))
+                self.assertEqual(response.status_code, 400)
+
+    def test_read_view_marks_given_ids(self):
+        notifications.notify(self.author.pk, 'post_like', 'post:%d' % self.post.pk, self.fans[0].pk, 'liked')
+        row = UserNotification.objects.get(user=self.author)
+        response = self.client.post(reverse('notification-read'), {'ids': [row.pk]}, content_type='application/json',
+                                    **auth(self.author))
+        self.assertEqual(response.data, {'marked': 1, 'unread': 0})
+
+
+class AsyncUnreadTests(TestCase):
+
+    def test_matches_sync_view(self):
+        user = User.objects.create_user('reader', 'reader@example.com', 'pass')
+        User.objects.filter(pk=user.pk).update(unread_notification_count=3)
+        for headers in (auth(user), {}):
+            with self.subTest(authenticated=bool(headers)):
+                sync = self.client.get(reverse('notification-unread'), **headers)
+                async_ = self.client.get(reverse('notification-unread-async'), **headers)
+                self.assertEqual(async_.status_code, sync.status_code)
+                self.assertEqual(async_.json(), sync.json())
+
+
+class BufferedNotificationTests(TestCase):
+
+    def test_rolled_back_follow_leaves_no_event(self):
+        author = User.objects.create_user('author', 'author@example.com', 'pass')
+        fan = User.objects.create_user('fan', 'fan@example.com', 'pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    FollowRelation.objects.create(follower=fan, following=author)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(notifications.flush(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            FollowRelation.objects.create(follower=fan, following=author)
+        self.assertEqual(notifications.flush(), 1)
+        self.assertEqual(UserNotification.objects.get(user=author).notification_type, 'follow')
+
+
+@override_settings(NOTIFICATIONS={'ENABLED': False})
+class FollowerPageCacheTests(TestCase):
+
+    def test_cached_first_page_shows_current_profiles(self):
+        caches['default'].clear()
+        graph.graph_cache.clear_local()
+        star = User.objects.create_user('star', 'star@example.com', 'pass')
+        fan = User.objects.create_user('fan', 'fan@example.com', 'pass')
+        FollowRelation.objects.create(follower=fan, following=star)
+        url = reverse('follower-list', args=[star.pk])
+        self.assertEqual(self.client.get(url).data['results'][0]['user']['nickname'], fan.nickname)
+        User.objects.filter(pk=fan.pk).update(nickname='renamed')
+        self.assertEqual(self.client.get(url).data['results'][0]['user']['nickname'], 'renamed')
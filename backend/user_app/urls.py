@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('notifications/', views.NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread/', views.NotificationUnreadView.as_view(), name='notification-unread'),
+    path('notifications/unread/async/', views.notification_unread_async, name='notification-unread-async'),
+    path('notifications/read/', views.NotificationReadView.as_view(), name='notification-read'),
+    path('users/<int:user_id>/followers/', views.FollowerListView.as_view(), name='follower-list'),
+    path('users/<int:user_id>/following/', views.FollowingListView.as_view(), name='following-list'),
+    path('users/<int:user_id>/mutual/', views.MutualFollowListView.as_view(), name='mutual-follow-list'),
+    path('users/<int:user_id>/followers/known/', views.KnownFollowerListView.as_view(), name='known-follower-list'),
+    path('users/<int:user_id>/follow/', views.FollowView.as_view(), name='user-follow'),
+    path('users/relationships/', views.RelationshipView.as_view(), name='user-relationships'),
+    path('users/avatar/', views.AvatarView.as_view(), name='user-avatar'),
+]
@@ -0,0 +1,191 @@
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from media_app import pipeline
+from tieba_project.async_views import async_get, bearer_user_id, error, ok
+
+from . import graph, notifications
+from .models import User, UserNotification
+from .pagination import NotificationPagination, RecentFirstPagination
+from .serializers import FollowRelationSerializer, NotificationSerializer, UserBriefSerializer
+
+
+class NotificationListView(generics.ListAPIView):
+    """当前用户的通知（同类事件已合并，按最近事件时间倒序，游标分页）"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        return UserNotification.objects.filter(user_id=self.request.user.pk)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['unread'] = self.request.user.unread_notification_count
+        return response
+
+
+class NotificationUnreadView(APIView):
+    """未读通知数（读用户表上维护的计数器）"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread': request.user.unread_notification_count})
+
+
+@async_get
+async def notification_unread_async(request):
+    """NotificationUnreadView 的异步版本：只验签令牌，一次按主键的异步查询"""
+    user_id = bearer_user_id(request)
+    if user_id is None:
+        return error('身份认证信息未提供。', 401)
+    unread = await (User.objects.filter(pk=user_id, is_active=True)
+                    .values_list('unread_notification_count', flat=True).afirst())
+    if unread is None:
+        return error('找不到该用户。', 401)
+    return ok({'unread': unread})
+
+
+class NotificationReadView(APIView):
+    """标记通知已读：传 ids 列表标记指定通知，不传则全部标为已读"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+                return Response({'detail': 'ids 必须是通知ID（整数）列表'}, status=status.HTTP_400_BAD_REQUEST)
+            marked = notifications.mark_read(request.user.pk, ids)
+        else:
+            marked = notifications.mark_all_read(request.user.pk)
+        return Response({'marked': marked, 'unread': notifications.unread_count(request.user.pk)})
+
+
+class FollowerListView(generics.ListAPIView):
+    """某个用户的粉丝列表（按关注时间倒序，第一页走缓存）"""
+    serializer_class = FollowRelationSerializer
+    pagination_class = RecentFirstPagination
+    side = 'follower'
+    cache_first_page = True
+
+    def get_queryset(self):
+        return graph.followers(self.kwargs['user_id']).select_related(self.side)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['side'] = self.side
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if self.cache_first_page and not request.query_params:
+            data = self.first_page()
+        else:
+            data = super().list(request, *args, **kwargs).data
+        if request.user.is_authenticated:
+            # 整页一次判断当前用户是否已关注（缓存中的数据不能原地修改）
+            followed = graph.following_ids(request.user.pk, [item['user']['id'] for item in data['results']])
+            data = dict(data, results=[dict(item, is_following=item['user']['id'] in followed)
+                                       for item in data['results']])
+        return Response(data)
+
+
+    def first_page(self):
+        """
+        第一页只缓存关系ID和翻页链接，用户资料（昵称、头像、粉丝数）每次按ID
+        一条查询取最新的；缓存未命中时直接用刚查出的这一页
+        """
+        loaded = []
+
+        def load():
+            loaded.extend(self.paginate_queryset(self.get_queryset()))
+            return dict(self.get_paginated_response(None).data,
+                        results=[relation.pk for relation in loaded])
+
+        cached = graph.first_page(self.kwargs['user_id'], self.side, load)
+        relations = loaded
+        if not relations and cached['results']:
+            by_id = self.get_queryset().in_bulk(cached['results'])
+            relations = [by_id[pk] for pk in cached['results'] if pk in by_id]
+        return dict(cached, results=self.get_serializer(relations, many=True).data)
+
+
+class FollowingListView(FollowerListView):
+    """某个用户关注的人（按关注时间倒序，第一页走缓存）"""
+    side = 'following'
+
+    def get_queryset(self):
+        return graph.following(self.kwargs['user_id']).select_related(self.side)
+
+
+class MutualFollowListView(FollowingListView):
+    """与某个用户互相关注的人"""
+
+    cache_first_page = False
+
+    def get_queryset(self):
+        return graph.mutual(self.kwargs['user_id']).select_related(self.side)
+
+
+class KnownFollowerListView(FollowerListView):
+    """某个用户的粉丝中当前用户关注了的人（"你关注的人也关注了他"）"""
+    permission_classes = [permissions.IsAuthenticated]
+    cache_first_page = False
+
+    def get_queryset(self):
+        return graph.known_followers(self.request.user.pk, self.kwargs['user_id']).select_related(self.side)
+
+
+class FollowView(APIView):
+    """关注（PUT）/ 取消关注（DELETE），重复请求不改变计数"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, user_id):
+        return self.set_following(request, user_id, True)
+
+    def delete(self, request, user_id):
+        return self.set_following(request, user_id, False)
+
+    def set_following(self, request, user_id, value):
+        get_object_or_404(User.objects.only('id'), pk=user_id)
+        if user_id == request.user.pk:
+            return Response({'detail': '不能关注自己'}, status=status.HTTP_400_BAD_REQUEST)
+        if value:
+            graph.follow(request.user.pk, user_id)
+        else:
+            graph.unfollow(request.user.pk, user_id)
+        follower_count = User.objects.filter(pk=user_id).values_list('follower_count', flat=True).first()
+        return Response({'following': value, 'follower_count': follower_count})
+
+
+class RelationshipView(APIView):
+    """批量查询当前用户与多个用户的关注关系：?ids=1,2,3（最多100个）"""
+    permission_classes = [permissions.IsAuthenticated]
+    max_ids = 100
+
+    def get(self, request):
+        try:
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i][:self.max_ids]
+        except ValueError:
+            return Response({'detail': 'ids 参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        relations = graph.relationships(request.user.pk, ids)
+        return Response({str(user_id): relation for user_id, relation in relations.items()})
+
+
+class AvatarView(APIView):
+    """上传头像（multipart，字段名 avatar）：按内容哈希去重存放，各规格在后台生成"""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def put(self, request):
+        upload = request.FILES.get('avatar')
+        if upload is None:
+            return Response({'detail': '缺少 avatar 文件'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pipeline.attach(request.user, 'avatar', upload)
+        except ValidationError as exc:
+            return Response({'detail': exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UserBriefSerializer(request.user, context={'request': request}).data)